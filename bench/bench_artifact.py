@@ -0,0 +1,84 @@
+# bench/bench_artifact.py
+# Peak memory and time to turn a combined extraction into loader batches:
+# json.load of the classic file vs one streaming pass over the NDJSON artifact.
+# Each variant runs in a fresh process so peak RSS is its own.
+#
+#   python -m bench.bench_artifact [--relationships 1000000]
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench.bench_graph_load import synthetic_graph
+from extract.artifact import write_combined
+
+
+def consume(path):
+    """Build every loader batch from `path`, returning (batches, seconds)."""
+    from extract.artifact import is_ndjson, iter_records
+    from graph.loader import entity_batches, record_batches, relationship_batches
+
+    start = time.perf_counter()
+    batches = 0
+    if is_ndjson(path):
+        for _ in record_batches(iter_records(path)):
+            batches += 1
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        labels = {e["id"]: e["type"] for e in data["entities"]}
+        for _ in entity_batches(data["entities"]):
+            batches += 1
+        for _ in relationship_batches(data["relationships"], labels):
+            batches += 1
+    return batches, time.perf_counter() - start
+
+
+def peak_rss_kb():
+    # ru_maxrss survives exec on Linux (it would report the parent's peak); VmHWM does not
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def measure(path):
+    out = subprocess.run([sys.executable, "-m", "bench.bench_artifact", "--consume", path],
+                         capture_output=True, text=True, check=True).stdout
+    return json.loads(out)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark classic JSON vs streamed NDJSON artifacts.")
+    parser.add_argument("--entities", type=int, default=100000)
+    parser.add_argument("--relationships", type=int, default=1000000)
+    parser.add_argument("--consume", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.consume:
+        batches, seconds = consume(args.consume)
+        print(json.dumps({"batches": batches, "seconds": seconds, "peak_mb": peak_rss_kb() / 1024}))
+        return
+
+    entities, relationships = synthetic_graph(args.entities, args.relationships)
+    combined = {"entities": entities, "relationships": relationships}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in ("combined.json", "combined.ndjson"):
+            path = os.path.join(tmp, name)
+            write_combined(combined, path)
+            result = measure(path)
+            print(f"{name:>16}: {os.path.getsize(path) / 1e6:7.1f} MB file, {result['batches']:,} batches in "
+                  f"{result['seconds']:.2f}s, peak RSS {result['peak_mb']:.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
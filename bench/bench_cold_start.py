@@ -0,0 +1,95 @@
+# bench/bench_cold_start.py
+# Startup cost of the pipeline entry points, and what the shared OpenAI client
+# saves a long-lived worker.
+#
+#   cold start  each module imported (or cli.py run) in a fresh interpreter,
+#               median wall time, plus which heavy packages it pulled in
+#   warm calls  per-request latency against the local fake OpenAI server with the
+#               pooled client (extract.clients) vs a new client per paper
+#
+#   python -m bench.bench_cold_start [--repeat 5 --papers 50]
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from extract.fake_server import FakeOpenAIServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = ["gemini", "chatgpt_extraction", "generate_graph", "graph.query", "extract.search", "cli"]
+HEAVY = ("openai", "neo4j", "numpy", "pypdf", "fitz", "pdfplumber")
+PROBE = """
+import sys, time, json
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+print(json.dumps({{"seconds": seconds, "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def import_time(module, repeat):
+    runs = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", PROBE.format(module=module, heavy=HEAVY)],
+                             cwd=ROOT, capture_output=True, text=True, check=True).stdout
+        runs.append(json.loads(out))
+    return statistics.median(r["seconds"] for r in runs), runs[0]["heavy"]
+
+
+def process_time(argv, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, *argv], cwd=ROOT, capture_output=True, check=True)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def warm_calls(papers):
+    from openai import OpenAI
+
+    from extract.clients import openai_client
+    from extract.engine import ExtractionEngine
+
+    messages = [{"role": "system", "content": "Extract."}, {"role": "user", "content": "Sertraline treats depression."}]
+    with FakeOpenAIServer() as server:
+        def per_call_ms(make_engine):
+            start = time.perf_counter()
+            for _ in range(papers):
+                make_engine().call(messages)
+            return (time.perf_counter() - start) / papers * 1000
+
+        fresh = per_call_ms(lambda: ExtractionEngine(OpenAI(base_url=server.base_url, api_key="fake", max_retries=0)))
+        openai_client(api_key="fake", base_url=server.base_url)  # create it once, as the first paper of a worker would
+        pooled = per_call_ms(lambda: ExtractionEngine(openai_client(api_key="fake", base_url=server.base_url)))
+    return fresh, pooled
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark cold start and warm-worker request cost.")
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh processes per measurement (median).")
+    parser.add_argument("--papers", type=int, default=50, help="Requests per warm-call measurement.")
+    args = parser.parse_args()
+
+    print("import in a fresh interpreter:")
+    for module in MODULES:
+        seconds, heavy = import_time(module, args.repeat)
+        print(f"{module:>20}: {seconds * 1000:7.1f} ms  loads {', '.join(heavy) or '-'}")
+    print("whole process:")
+    baseline = process_time(["-c", "pass"], args.repeat)
+    print(f"{'python -c pass':>34}: {baseline * 1000:7.1f} ms")
+    for argv in (["cli.py", "--help"], ["cli.py", "search", "--help"], ["cli.py", "extract", "--help"],
+                 ["cli.py", "load", "--help"]):
+        print(f"{' '.join(argv):>34}: {process_time(argv, args.repeat) * 1000:7.1f} ms")
+
+    fresh, pooled = warm_calls(args.papers)
+    print(f"warm worker, {args.papers} requests: new client per paper {fresh:6.2f} ms/request, "
+          f"shared client {pooled:6.2f} ms/request")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# bench/bench_dedup.py
+# Time and pairwise precision / recall of extract.dedup on a synthetic corpus:
+# base concepts of 2-4 words (per entity type), each extracted as a few surface
+# variants (plurals, hyphenation, case, reordering with "with", an extra common
+# word), plus look-alikes that must stay apart (an extra rare modifier, a
+# different dose).
+#
+#   python -m bench.bench_dedup [--entities 200000]
+
+import argparse
+import random
+import time
+from collections import Counter
+
+from extract.dedup import DEFAULT_THRESHOLD, find_duplicates
+from extract.schema import ENTITY_TYPES
+
+
+def word(rnd):
+    return "".join(rnd.choice("bcdfghklmnprstvz") + rnd.choice("aeiou") for _ in range(rnd.randint(2, 4)))
+
+
+def variant(rnd, words, common):
+    words = list(words)
+    kind = rnd.randrange(6)
+    if kind == 0 and not words[-1].endswith(("i", "u")):  # "-is" / "-us" are not plurals
+        words[-1] += "s"
+    elif kind == 1 and len(words) > 1:
+        return "-".join(words[:2]) + (" " + " ".join(words[2:]) if len(words) > 2 else "")
+    elif kind == 2:
+        return " ".join(words).title()
+    elif kind == 3 and len(words) > 1:
+        return f"{words[-1]} with {' '.join(words[:-1])}"
+    elif kind == 4:
+        return f"{' '.join(words)} {rnd.choice(common)}"  # "patients with X" -> "patients with X depression"
+    return " ".join(words)
+
+
+def synthetic_entities(n, seed=0):
+    """(entities, truth) where truth[id] is the concept the entity was generated from."""
+    rnd = random.Random(seed)
+    common = [word(rnd) for _ in range(200)]   # frequent head words ("depression", "therapy")
+    rare = [word(rnd) for _ in range(20000)]  # modifiers
+    entities, truth = [], {}
+    concept = 0
+    while len(entities) < n:
+        concept += 1
+        entity_type = rnd.choice(ENTITY_TYPES)
+        base = [rnd.choice(rare) for _ in range(rnd.randint(1, 3))] + [rnd.choice(common)]
+        for _ in range(rnd.choice([1, 1, 2, 3, 4, 6])):
+            entities.append({"id": len(entities) + 1, "text": variant(rnd, base, common), "type": entity_type})
+            truth[len(entities)] = concept
+        if rnd.random() < 0.2:  # a look-alike: same words plus a rare modifier, or another dose
+            concept += 1
+            extra = [rnd.choice(rare)] + base if rnd.random() < 0.5 else base + [str(rnd.randint(1, 400))]
+            entities.append({"id": len(entities) + 1, "text": " ".join(extra), "type": entity_type})
+            truth[len(entities)] = concept
+    return entities[:n], truth
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark near-duplicate entity merging.")
+    parser.add_argument("--entities", type=int, default=200000)
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args()
+
+    entities, truth = synthetic_entities(args.entities)
+    start = time.perf_counter()
+    mapping, stats = find_duplicates(entities, threshold=args.threshold)
+    seconds = time.perf_counter() - start
+
+    # pairwise scores over clusters: predicted pairs = members sharing a representative
+    predicted = {}
+    for e in entities:
+        predicted.setdefault(mapping.get(e["id"], e["id"]), []).append(e["id"])
+    true_pairs = sum(c * (c - 1) // 2 for c in Counter(truth[e["id"]] for e in entities).values())
+    found = correct = 0
+    for members in predicted.values():
+        found += len(members) * (len(members) - 1) // 2
+        correct += sum(c * (c - 1) // 2 for c in Counter(truth[m] for m in members).values())
+
+    print(f"{len(entities):,} entities -> {len(entities) - stats['merged']:,} in {seconds:.1f}s "
+          f"({stats['candidate_pairs']:,} candidate pairs, {stats['accepted_pairs']:,} accepted)")
+    print("  " + ", ".join(f"{k} {v:.2f}s" for k, v in stats["seconds"].items()))
+    print(f"  pairwise precision {correct / found if found else 1:.3f}, recall {correct / true_pairs:.3f} "
+          f"(all-pairs comparison would be {len(entities) * (len(entities) - 1) // 2:,} pairs)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# bench/bench_evidence_search.py
+# extract.search on a synthetic extraction: index build time, the cost of an
+# incremental update after one paper changed, and ranked query latency against
+# a linear scan over the evidence strings as baseline.
+#
+#   python -m bench.bench_evidence_search [--relationships 200000 --papers 2000]
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from itertools import accumulate
+
+from bench.bench_graph_load import synthetic_graph
+from extract.search import EvidenceIndex
+
+# query terms; they sit at ranks 200-219 of a Zipf-distributed vocabulary (each in ~0.5% of quotes)
+VOCABULARY = ("serotonin syndrome risk sertraline fluoxetine remission relapse insomnia nausea response "
+              "adolescents placebo dose weight gain anxiety depression augmentation lithium ketamine").split()
+
+
+def word(rnd):
+    return "".join(rnd.choice("bcdfghklmnprstvz") + rnd.choice("aeiou") for _ in range(rnd.randint(2, 4)))
+
+
+def synthetic_combined(n_relationships, n_papers, seed=0):
+    rnd = random.Random(seed)
+    entities, relationships = synthetic_graph(max(n_relationships // 10, 1), n_relationships, seed)
+    vocabulary = [word(rnd) for _ in range(20000)]
+    vocabulary[200:200 + len(VOCABULARY)] = VOCABULARY
+    cum_weights = list(accumulate(1 / (rank + 1) for rank in range(len(vocabulary))))
+    for rel in relationships:
+        rel["evidence"] = " ".join(rnd.choices(vocabulary, cum_weights=cum_weights, k=rnd.randint(8, 20)))
+        rel["source"] = f"paper-{rnd.randrange(n_papers)}.txt"
+        rel["chunk"] = rnd.randrange(40)
+    return {"entities": entities, "relationships": relationships}
+
+
+def per_query_ms(fn, queries):
+    start = time.perf_counter()
+    for q in queries:
+        fn(q)
+    return (time.perf_counter() - start) / len(queries) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the evidence full-text index.")
+    parser.add_argument("--relationships", type=int, default=200000)
+    parser.add_argument("--papers", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    combined = synthetic_combined(args.relationships, args.papers)
+    with tempfile.TemporaryDirectory() as tmp:
+        index = EvidenceIndex(os.path.join(tmp, "evidence.sqlite"))
+        start = time.perf_counter()
+        stats = index.update(combined, "bench")
+        print(f"build: {stats['documents']:,} documents from {stats['added']:,} papers in "
+              f"{time.perf_counter() - start:.2f}s")
+
+        changed = next(r for r in combined["relationships"] if r["source"] == "paper-0.txt")
+        changed["evidence"] += " tachycardia"
+        start = time.perf_counter()
+        stats = index.update(combined, "bench")
+        print(f"update after one paper changed: {stats['changed']} re-indexed, {stats['unchanged']:,} skipped in "
+              f"{time.perf_counter() - start:.2f}s")
+
+        rnd = random.Random(1)
+        queries = [" ".join(rnd.sample(VOCABULARY, rnd.randint(2, 3))) for _ in range(args.queries)]
+
+        def scan(q):
+            words = q.split()
+            return [r for r in combined["relationships"] if all(w in r["evidence"] for w in words)][:10]
+
+        rows = [
+            ("linear scan, all words", per_query_ms(scan, queries[:5])),
+            ("fts5, top 10", per_query_ms(lambda q: index.search(q, 10), queries)),
+            ("fts5, top 100", per_query_ms(lambda q: index.search(q, 100), queries)),
+            ("fts5, with a rare term", per_query_ms(lambda q: index.search(q + " tachycardia", 10), queries)),
+        ]
+        for name, ms in rows:
+            print(f"{name:>24}: {ms:8.2f} ms/query")
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
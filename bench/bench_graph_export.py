@@ -0,0 +1,61 @@
+# bench/bench_graph_export.py
+# Time and peak memory of graph.export (CSV files for neo4j-admin import) on
+# synthetic NDJSON artifacts of growing size. Each export runs in a fresh process
+# so peak RSS is its own; it should stay flat as the relationship count grows.
+#
+#   python -m bench.bench_graph_export [--relationships 100000 1000000]
+#
+# The neo4j-admin import itself is not timed here (it needs the Neo4j image):
+#   sh <out>/import.sh
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench.bench_artifact import peak_rss_kb
+from bench.bench_graph_load import synthetic_graph
+from extract.artifact import write_combined
+
+
+def export(path, out_dir, run_rows):
+    from extract.artifact import iter_records
+    from graph.export import export_csv
+
+    start = time.perf_counter()
+    counts = export_csv(iter_records(path), out_dir, run_rows)
+    return {**counts, "seconds": time.perf_counter() - start, "peak_rss_kb": peak_rss_kb()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the neo4j-admin CSV exporter.")
+    parser.add_argument("--relationships", type=int, nargs="+", default=[100000, 1000000])
+    parser.add_argument("--run-rows", type=int, default=200000)
+    parser.add_argument("--export", nargs=2, metavar=("ARTIFACT", "OUT_DIR"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.export:
+        print(json.dumps(export(*args.export, args.run_rows)))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.relationships:
+            path = os.path.join(tmp, f"graph-{n}.ndjson")
+            entities, relationships = synthetic_graph(max(n // 10, 1), n)
+            write_combined({"entities": entities, "relationships": relationships}, path)
+            del entities, relationships
+            out = subprocess.run([sys.executable, "-m", "bench.bench_graph_export", "--run-rows", str(args.run_rows),
+                                  "--export", path, os.path.join(tmp, f"csv-{n}")],
+                                 capture_output=True, text=True, check=True).stdout
+            result = json.loads(out)
+            print(f"{n:>10,} relationships: {result['seconds']:7.2f}s "
+                  f"({n / result['seconds']:,.0f}/s), peak RSS {result['peak_rss_kb'] / 1024:6.1f} MB "
+                  f"-> {result['nodes']:,} nodes, {result['relationships']:,} edges, "
+                  f"{result['evidence']:,} evidence")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+# bench/bench_graph_load.py
+# Compare the per-row loader generate_graph.py used to have with the batched UNWIND loader.
+#
+#   docker compose up -d neo4j
+#   NEO4J_URI=bolt://localhost:7687 python -m bench.bench_graph_load --entities 10000 --relationships 100000
+#
+# WARNING: wipes the target database between runs.
+
+import argparse
+import json
+import os
+import random
+import time
+
+from neo4j import GraphDatabase
+
+from extract.schema import ENTITY_TYPES, RELATIONSHIP_TYPES
+from graph.loader import load_graph
+
+
+def synthetic_graph(n_entities, n_relationships, seed=0):
+    rnd = random.Random(seed)
+    entities = [
+        {"id": i, "text": f"entity {i}", "type": rnd.choice(ENTITY_TYPES), "code_system": None, "code": None}
+        for i in range(1, n_entities + 1)
+    ]
+    relationships = [
+        {
+            "head": rnd.randint(1, n_entities),
+            "tail": rnd.randint(1, n_entities),
+            "type": rnd.choice(RELATIONSHIP_TYPES),
+            "evidence": f"evidence snippet {rnd.randint(1, n_relationships)}",
+        }
+        for _ in range(n_relationships)
+    ]
+    return entities, relationships
+
+
+# the pre-batching loader, kept here verbatim as the baseline
+def legacy_insert_entities(tx, entities):
+    for ent in entities:
+        label = ent["type"]
+        props = {k: v for k, v in ent.items() if k != "type"}
+
+        cy_child = f"""
+        MERGE (n:{label} {{id: $id}})
+        SET n += $props,
+            n.level = coalesce(n.level, 'child')
+        """
+        tx.run(cy_child, id=props["id"], props=props)
+
+
+def legacy_insert_relationships(tx, relationships, entities):
+    ent_dict = {e['id']: (e['type'], e['text']) for e in entities}
+    for rel in relationships:
+        head_id = rel["head"]
+        tail_id = rel["tail"]
+        rel_type = rel["type"].upper()
+        evidence = rel.get("evidence", "")
+        head_label = ent_dict[head_id][0]
+        tail_label = ent_dict[tail_id][0]
+
+        cypher = f"""
+        MATCH (a:{head_label} {{id: $head_id}}), (b:{tail_label} {{id: $tail_id}})
+        MERGE (a)-[r:{rel_type}]->(b)
+        ON CREATE SET r.evidence = $evidence
+        ON MATCH SET r.evidence =
+            CASE
+                WHEN $evidence = '' THEN r.evidence
+                WHEN r.evidence IS NULL OR r.evidence = '' THEN $evidence
+                WHEN r.evidence CONTAINS $evidence THEN r.evidence
+                ELSE r.evidence + '\n' + $evidence
+            END
+        """
+        tx.run(cypher, head_id=head_id, tail_id=tail_id, evidence=evidence)
+
+
+def reset(session):
+    session.run("MATCH (n) CALL { WITH n DETACH DELETE n } IN TRANSACTIONS OF 10000 ROWS").consume()
+
+
+def run_legacy(session, entities, relationships):
+    session.execute_write(legacy_insert_entities, entities)
+    session.execute_write(legacy_insert_relationships, relationships, entities)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-row vs batched Neo4j loading.")
+    parser.add_argument("--entities", type=int, default=10000)
+    parser.add_argument("--relationships", type=int, default=20000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--skip-legacy", action="store_true", help="Only time the batched loader.")
+    parser.add_argument("--output", help="Write results as JSON to this path.")
+    args = parser.parse_args()
+
+    uri = os.getenv("NEO4J_URI", "bolt://localhost:7687")
+    entities, relationships = synthetic_graph(args.entities, args.relationships)
+    results = {"entities": args.entities, "relationships": args.relationships, "batch_size": args.batch_size}
+
+    with GraphDatabase.driver(uri, auth=None) as driver, driver.session() as session:
+        if not args.skip_legacy:
+            reset(session)
+            start = time.perf_counter()
+            run_legacy(session, entities, relationships)
+            results["legacy_seconds"] = time.perf_counter() - start
+
+        reset(session)
+        start = time.perf_counter()
+        load_graph(session, entities, relationships, args.batch_size)
+        results["batched_seconds"] = time.perf_counter() - start
+        reset(session)
+
+    for path in ("legacy", "batched"):
+        seconds = results.get(f"{path}_seconds")
+        if seconds is not None:
+            print(f"{path:>8}: {seconds:8.2f}s  ({args.relationships / seconds:,.0f} relationships/s)")
+    if "legacy_seconds" in results:
+        print(f" speedup: {results['legacy_seconds'] / results['batched_seconds']:.1f}x")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
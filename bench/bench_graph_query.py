@@ -0,0 +1,64 @@
+# bench/bench_graph_query.py
+# Latency of graph.query lookups on a synthetic graph: index build time, then
+# neighbor / 2-hop / treatment-outcome queries uncached (GraphIndex) and cached
+# (QueryService), against a linear scan over the relationship list as baseline.
+#
+#   python -m bench.bench_graph_query [--entities 100000 --relationships 1000000]
+
+import argparse
+import random
+import time
+
+from bench.bench_graph_load import synthetic_graph
+from graph.query import GraphIndex, QueryService
+
+
+def per_call_us(fn, args_list):
+    start = time.perf_counter()
+    for args in args_list:
+        fn(*args)
+    return (time.perf_counter() - start) / len(args_list) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark in-process graph queries.")
+    parser.add_argument("--entities", type=int, default=100000)
+    parser.add_argument("--relationships", type=int, default=1000000)
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+
+    entities, relationships = synthetic_graph(args.entities, args.relationships)
+    start = time.perf_counter()
+    index = GraphIndex.from_combined({"entities": entities, "relationships": relationships})
+    print(f"index: {len(index):,} entities, {len(relationships):,} relationships built in "
+          f"{time.perf_counter() - start:.2f}s")
+
+    rnd = random.Random(1)
+    ids = [rnd.randint(1, args.entities) for _ in range(args.queries)]
+    texts = [f"entity {i}" for i in ids]
+    service = QueryService(lambda: index, manifest_path="", cache_size=args.queries)
+
+    def scan(entity_id, rel_type):
+        return {r["tail"] for r in relationships if r["head"] == entity_id and r["type"] == rel_type}
+
+    baseline = per_call_us(scan, [(i, "treats") for i in ids[:5]])
+    rows = [
+        ("neighbors (linear scan)", baseline),
+        ("neighbors by id", per_call_us(index.neighbors, [(i, "treats") for i in ids])),
+        ("neighbors by text", per_call_us(index.neighbors, [(t, "treats") for t in texts])),
+        ("neighbors, all types", per_call_us(index.neighbors, [(i, None, "both") for i in ids])),
+        ("two-hop, all types", per_call_us(index.two_hop, [(i,) for i in ids])),
+        ("treatment -> outcome paths", per_call_us(index.treatment_outcomes, [(i,) for i in ids])),
+    ]
+    per_call_us(service.neighbors, [(t, "treats") for t in texts])  # fill the cache
+    rows.append(("neighbors by text, cached", per_call_us(service.neighbors, [(t, "treats") for t in texts])))
+    per_call_us(service.two_hop, [(i,) for i in ids])
+    rows.append(("two-hop, cached", per_call_us(service.two_hop, [(i,) for i in ids])))
+
+    for name, us in rows:
+        print(f"{name:>28}: {us:10.1f} us/query")
+    print(f"cache: {service.stats()}")
+
+
+if __name__ == "__main__":
+    main()
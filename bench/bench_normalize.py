@@ -0,0 +1,86 @@
+# bench/bench_normalize.py
+# Per-entity cost of the original normalize_text (six re.sub calls with string
+# patterns) vs extract.normalize (gated precompiled passes + memoization + batch API).
+# Also checks that both produce identical output on every string used.
+#
+#   python -m bench.bench_normalize [--n 200000]
+
+import argparse
+import json
+import random
+import re
+import time
+
+from extract.normalize import CANONICAL_MAP, normalize_many, normalize_passage, normalize_text
+
+
+# the original gemini.py implementation, kept verbatim as the baseline
+def legacy_normalize_text(s):
+    if not isinstance(s, str):
+        return ""
+
+    s = s.strip().lower().replace("\n", " ")
+    s = re.sub(r'\s*\([^)]*\)', '', s).strip()
+    s = re.sub(r'[-\s]sr|[-\s]xr|sustained[-\s]release|extended[-\s]release', '', s)
+    s = re.sub(r'quick\s+', '', s)
+    s = re.sub(r'self[-\s]report', '', s)
+    s = re.sub(r'rating\s+scale', 'scale', s)
+    s = re.sub(r'hamilton\s+depression\s+scale', 'hamilton depression', s)
+    s = re.sub(r'\s+', ' ', s).strip()
+
+    return s
+
+
+def corpus_surface_forms():
+    forms = []
+    for path in ("extract/combined-final-CHATGPT.json", "validated_interactions.json"):
+        with open(path, "r", encoding="utf-8") as f:
+            forms.extend(e["text"] for e in json.load(f)["entities"])
+    forms.extend(k.upper() for k in CANONICAL_MAP)
+    forms.extend(["Hamilton Depression Rating Scale (HDRS)", "Quick Inventory of Depressive Symptomatology Self-Report",
+                  "venlafaxine XR", "bupropion sustained-release", "SSRIs", "CBT"])
+    return forms
+
+
+def fuzz_strings(n, seed=0):
+    words = ["(x)", "sr", "xr", "-sr", "sustained release", "extended-release", "quick", "self-report",
+             "rating scale", "hamilton", "depression", "Scale", "drug", "(", ")", "\n"]
+    rnd = random.Random(seed)
+    return ["".join(rnd.choice(words) + rnd.choice(["", " ", "  ", "-", "\n"]) for _ in range(rnd.randint(1, 6)))
+            for _ in range(n)]
+
+
+def per_item_us(fn, items):
+    start = time.perf_counter()
+    fn(items)
+    return (time.perf_counter() - start) / len(items) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark entity text normalization.")
+    parser.add_argument("--n", type=int, default=200000, help="Entity mentions to normalize.")
+    args = parser.parse_args()
+
+    forms = corpus_surface_forms()
+    mismatches = [s for s in forms + fuzz_strings(50000) if legacy_normalize_text(s) != normalize_passage(s)]
+    if mismatches:
+        raise SystemExit(f"normalization differs from the original on {len(mismatches)} strings, e.g. {mismatches[:3]!r}")
+
+    # Zipf-like repetition, as in a real corpus where a few surface forms dominate
+    rnd = random.Random(1)
+    weights = [1 / (rank + 1) for rank in range(len(forms))]
+    mentions = rnd.choices(forms, weights=weights, k=args.n)
+
+    results = {
+        "legacy": per_item_us(lambda xs: [legacy_normalize_text(x) for x in xs], mentions),
+        "precompiled (uncached)": per_item_us(lambda xs: [normalize_passage(x) for x in xs], mentions),
+        "memoized": per_item_us(lambda xs: [normalize_text(x) for x in xs], mentions),
+        "batch": per_item_us(normalize_many, mentions),
+    }
+    print(f"{args.n:,} mentions of {len(set(forms))} surface forms (outputs identical to the original)")
+    for name, us in results.items():
+        print(f"{name:>24}: {us:6.2f} us/entity  ({results['legacy'] / us:5.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
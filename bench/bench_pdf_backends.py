@@ -0,0 +1,52 @@
+# bench/bench_pdf_backends.py
+# Pages per second for each PDF backend on the bundled papers (single process,
+# so the numbers compare the backends rather than the pool).
+#
+#   python -m bench.bench_pdf_backends [Research-papers-txt/] [--output results.json]
+
+import argparse
+import json
+import time
+
+from extract.pdf_ingest import BACKENDS, find_pdfs, iter_pages
+
+
+def time_backend(backend, pdfs, repeat=1):
+    pages = chars = 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for pdf in pdfs:
+            for text in iter_pages(pdf, backend):
+                pages += 1
+                chars += len(text)
+    seconds = time.perf_counter() - start
+    return {"pages": pages, "chars": chars, "seconds": seconds, "pages_per_second": pages / seconds}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare PDF text extraction backends.")
+    parser.add_argument("src", nargs="?", default="Research-papers-txt")
+    parser.add_argument("--backends", nargs="*", default=list(BACKENDS))
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--output", help="Write results as JSON to this path.")
+    args = parser.parse_args()
+
+    pdfs = find_pdfs(args.src)
+    results = {}
+    for backend in args.backends:
+        try:
+            results[backend] = time_backend(backend, pdfs, args.repeat)
+        except ImportError as e:
+            print(f"{backend:>10}: not installed ({e.name})")
+            continue
+        r = results[backend]
+        print(f"{backend:>10}: {r['pages']:5d} pages in {r['seconds']:7.2f}s  "
+              f"({r['pages_per_second']:8.1f} pages/s, {r['chars']:,} chars)")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"pdfs": pdfs, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+# bench/bench_pipeline.py
+# End-to-end throughput of the pipeline scripts on a synthetic corpus, with no
+# API spend and no hand-run Neo4j:
+#
+#   gemini.py             N synthetic papers -> fake OpenAI server
+#   chatgpt_extraction.py --batch over the same papers -> fake OpenAI server
+#   generate_graph.py     a synthetic combined extraction -> Neo4j, when --neo4j-uri
+#                         is given; otherwise only its offline half (artifact ->
+#                         loader batches) is timed
+#
+# At each --scales factor the corpus is that many papers the size of
+# output_text.txt (sentences resampled from the repo's papers, so no two chunks
+# are identical), and the combined extraction is that many times the size of
+# extract/combined-final-CHATGPT.json. Every script runs in its own process (wall
+# time includes start-up and imports; peak RSS is its own) against a fresh fake
+# server with the given latency / error rates. Results, including each run's
+# trace summary (extract.trace), go to one JSON file per commit:
+#
+#   python -m bench.bench_pipeline [--scales 10 100 1000] [--latency 0.05 --fail-rate 0.02]
+#   python -m bench.bench_pipeline --compare bench-results/pipeline-abc123.json bench-results/pipeline-def456.json
+#
+# WARNING: with --neo4j-uri, generate_graph.py wipes the target database.
+
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import runpy
+import subprocess
+import sys
+import tempfile
+import time
+import traceback
+
+from bench.bench_artifact import peak_rss_kb
+from bench.bench_graph_load import synthetic_graph
+from extract.artifact import write_combined
+from extract.fake_server import FakeOpenAIServer
+from extract.trace import load_trace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PAPERS = [os.path.join(ROOT, p) for p in ("output_text.txt", "output2_text.txt", "output3_text.txt")]
+REFERENCE_PAPER = os.path.join(ROOT, "output_text.txt")
+REFERENCE_EXTRACTION = os.path.join(ROOT, "extract", "combined-final-CHATGPT.json")
+PAGE_BREAK = chr(12)
+_SENTENCE = re.compile(r"(?<=[.!?])\s+")
+
+
+def synthetic_papers(out_dir, count, seed=0) -> list:
+    """`count` papers the size of output_text.txt, resampled sentence by sentence from the repo's papers."""
+    sentences = []
+    for path in PAPERS:
+        with open(path, "r", encoding="utf-8") as f:
+            sentences.extend(s for s in _SENTENCE.split(f.read().replace(PAGE_BREAK, " ")) if s.strip())
+    size = os.path.getsize(REFERENCE_PAPER)
+    rnd = random.Random(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    for n in range(count):
+        parts, length, page = [], 0, 0
+        while length < size:
+            sentence = rnd.choice(sentences)
+            parts.append(sentence)
+            length += len(sentence) + 1
+            page += len(sentence) + 1
+            if page > 3000:  # ~a page of text
+                parts.append("\n" + PAGE_BREAK if rnd.random() < 0.5 else "\n")
+                page = 0
+        path = os.path.join(out_dir, f"paper_{n:04d}.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(" ".join(parts))
+        paths.append(path)
+    return paths
+
+
+def synthetic_extraction(path, scale, papers, seed=0):
+    """A combined extraction `scale` times the size of the reference one, spread over `papers` sources."""
+    with open(REFERENCE_EXTRACTION, "r", encoding="utf-8") as f:
+        reference = json.load(f)
+    entities, relationships = synthetic_graph(len(reference["entities"]) * scale,
+                                              len(reference["relationships"]) * scale, seed)
+    for n, ent in enumerate(entities):
+        ent["sources"] = [f"paper_{n % papers:04d}.txt"]
+    for n, rel in enumerate(relationships):
+        rel["source"] = f"paper_{n % papers:04d}.txt"
+        rel["chunk"] = n % 8 + 1
+    write_combined({"entities": entities, "relationships": relationships}, path)
+    return len(entities), len(relationships)
+
+
+def run_child(result_path, argv):
+    """Run one script as __main__ in this process, then record its wall time and peak RSS."""
+    sys.argv = argv
+    start = time.perf_counter()
+    code = 0
+    try:
+        runpy.run_path(argv[0], run_name="__main__")
+    except SystemExit as e:
+        code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    except Exception:
+        traceback.print_exc()
+        code = 1
+    with open(result_path, "w", encoding="utf-8") as f:
+        json.dump({"seconds": time.perf_counter() - start, "peak_mb": peak_rss_kb() / 1024, "exit": code}, f)
+
+
+def measure(argv, cwd, env, trace_path):
+    """Run a pipeline script in a fresh process; returns its result dict (plus span totals from its trace)."""
+    result_path = os.path.join(cwd, "result.json")
+    log_path = trace_path[:-len(".trace.jsonl")] + ".log"
+    with open(log_path, "w", encoding="utf-8") as log:
+        subprocess.run([sys.executable, "-m", "bench.bench_pipeline", "--child", result_path, *argv],
+                       cwd=cwd, env={**env, "TRACE_FILE": trace_path}, stdout=log, stderr=subprocess.STDOUT)
+    with open(result_path, "r", encoding="utf-8") as f:
+        result = json.load(f)
+    result["log"] = log_path
+    if os.path.exists(trace_path):
+        result["spans"] = {name: {"count": s.count, "seconds": round(s.seconds, 4), "errors": s.errors,
+                                  **{k: round(v, 6) for k, v in s.counters.items()}}
+                           for name, s in load_trace(trace_path).items()}
+    return result
+
+
+def run_extractor(name, argv, papers, work, env, args):
+    with FakeOpenAIServer(latency=args.latency, fail_rate=args.fail_rate,
+                          rate_limit_rate=args.rate_limit_rate, seed=0) as server:
+        run_env = {**env, "OPENAI_BASE_URL": server.base_url, "OPENAI_API_KEY": "fake"}
+        result = measure(argv, work, run_env, os.path.join(work, f"{name}.trace.jsonl"))
+        stats = dict(server.stats)
+    chunks = result.get("spans", {}).get("chunk_text", {}).get("chunks", 0)
+    result.update({
+        "requests": stats["requests"],
+        "failed_requests": stats["failed"] + stats["rate_limited"],
+        "calls_per_paper": stats["requests"] / papers,
+        "chunks": chunks,
+        "papers_per_s": papers / result["seconds"],
+        "chunks_per_s": chunks / result["seconds"],
+    })
+    return result
+
+
+def run_scale(scale, args, env):
+    runs = []
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = synthetic_papers(os.path.join(tmp, "papers"), scale)
+        manifest = os.path.join(tmp, "papers.txt")
+        with open(manifest, "w", encoding="utf-8") as f:
+            f.write("\n".join(paths) + "\n")
+        common = ["--no-cache", "--concurrency", str(args.concurrency)]
+
+        if "gemini" in args.scripts:
+            argv = [os.path.join(ROOT, "gemini.py"), *paths, "-o", os.path.join(tmp, "gemini.ndjson"), *common]
+            runs.append({"script": "gemini.py", **run_extractor("gemini", argv, scale, tmp, env, args)})
+        if "chatgpt" in args.scripts:
+            argv = [os.path.join(ROOT, "chatgpt_extraction.py"), "--batch", manifest,
+                    "-o", os.path.join(tmp, "chatgpt.json"), "--text-dir", os.path.join(tmp, "texts"), *common]
+            runs.append({"script": "chatgpt_extraction.py", **run_extractor("chatgpt", argv, scale, tmp, env, args)})
+        if "graph" in args.scripts:
+            combined = os.path.join(tmp, "combined.ndjson")
+            n_entities, n_relationships = synthetic_extraction(combined, scale, scale)
+            if args.neo4j_uri:
+                argv = [os.path.join(ROOT, "generate_graph.py"), "--input", combined,
+                        "--manifest", os.path.join(tmp, "graph_manifest.json")]
+                result = measure(argv, tmp, {**env, "NEO4J_URI": args.neo4j_uri},
+                                 os.path.join(tmp, "graph.trace.jsonl"))
+                script = "generate_graph.py"
+            else:
+                # no database: the streaming read + batch building generate_graph.py does before writing
+                argv = [os.path.join(ROOT, "bench", "bench_artifact.py"), "--consume", combined]
+                result = measure(argv, tmp, env, os.path.join(tmp, "graph.trace.jsonl"))
+                script = "generate_graph.py (offline: artifact -> loader batches)"
+            result.update({"entities": n_entities, "relationships": n_relationships,
+                           "rows_per_s": (n_entities + n_relationships) / result["seconds"]})
+            runs.append({"script": script, **result})
+
+        for run in runs:
+            run["scale"] = scale
+            run["papers"] = scale
+            if run["exit"] != 0:
+                with open(run["log"], "r", encoding="utf-8") as f:
+                    print(f"{run['script']} exited with {run['exit']} at {scale}x:\n{f.read()[-2000:]}")
+            run.pop("log")
+    return runs
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def print_runs(runs):
+    print(f"  {'script':<22} {'scale':>6} {'seconds':>9} {'peak MB':>8} {'calls/paper':>11} "
+          f"{'papers/s':>9} {'chunks/s':>9} {'rows/s':>10}")
+    for run in runs:
+        print(f"  {run['script'][:22]:<22} {run['scale']:>5}x {run['seconds']:>9.2f} {run['peak_mb']:>8.0f} "
+              f"{run.get('calls_per_paper', 0):>11.1f} {run.get('papers_per_s', 0):>9.1f} "
+              f"{run.get('chunks_per_s', 0):>9.1f} {run.get('rows_per_s', 0):>10,.0f}")
+
+
+def compare(before_path, after_path):
+    with open(before_path, "r", encoding="utf-8") as f:
+        before = json.load(f)
+    with open(after_path, "r", encoding="utf-8") as f:
+        after = json.load(f)
+    old = {(r["script"], r["scale"]): r for r in before["runs"]}
+    print(f"{before['commit']} -> {after['commit']}")
+    print(f"  {'script':<22} {'scale':>6} {'seconds':>20} {'peak MB':>14} {'calls/paper':>14} {'change':>8}")
+    for run in after["runs"]:
+        b = old.get((run["script"], run["scale"]))
+        if b is None:
+            continue
+        change = f"{100 * (run['seconds'] / b['seconds'] - 1):+.0f}%" if b["seconds"] else ""
+        print(f"  {run['script'][:22]:<22} {run['scale']:>5}x {b['seconds']:>9.2f}->{run['seconds']:<9.2f} "
+              f"{b['peak_mb']:>6.0f}->{run['peak_mb']:<6.0f} "
+              f"{b.get('calls_per_paper', 0):>6.1f}->{run.get('calls_per_paper', 0):<6.1f} {change:>8}")
+
+
+def main():
+    # child mode: everything after the result path belongs to the script being measured
+    if sys.argv[1:2] == ["--child"]:
+        run_child(sys.argv[2], sys.argv[3:])
+        return
+
+    parser = argparse.ArgumentParser(description="Time the pipeline scripts end to end on a synthetic corpus.")
+    parser.add_argument("--scales", type=int, nargs="+", default=[10, 100, 1000],
+                        help="Corpus sizes, in multiples of output_text.txt / combined-final-CHATGPT.json.")
+    parser.add_argument("--scripts", nargs="+", default=["gemini", "chatgpt", "graph"],
+                        choices=["gemini", "chatgpt", "graph"])
+    parser.add_argument("--latency", type=float, default=0.0, help="Fake server seconds per request.")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Fraction of HTTP 500 answers.")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of HTTP 429 answers.")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--neo4j-uri", default=None,
+                        help="Run generate_graph.py against this database (wiped!) instead of the offline half only.")
+    parser.add_argument("-o", "--output", default=None,
+                        help="Results file (default: bench-results/pipeline-<commit>.json).")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="Compare two results files.")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [ROOT, os.getenv("PYTHONPATH")]))}
+    runs = []
+    for scale in args.scales:
+        print(f"{scale}x ...", flush=True)
+        runs.extend(run_scale(scale, args, env))
+
+    commit = git_commit()
+    output = args.output or os.path.join("bench-results", f"pipeline-{commit}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({
+            "commit": commit,
+            "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "config": {k: getattr(args, k) for k in ("scales", "scripts", "latency", "fail_rate",
+                                                     "rate_limit_rate", "concurrency")}
+                      | {"neo4j": bool(args.neo4j_uri)},
+            "runs": runs,
+        }, f, indent=2)
+    print_runs(runs)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
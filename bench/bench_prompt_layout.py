@@ -0,0 +1,107 @@
+# bench/bench_prompt_layout.py
+# Token accounting for three request layouts over the same corpus, against the
+# fake server (which reports a repeated system message + schema as a cached
+# prefix, like provider prompt caching):
+#
+#   inline   the instructions repeated inside every user message (gemini.py before)
+#   prefix   the instructions as a stable system message, chunk in the user message
+#   packed   prefix + up to --pack small chunks per request
+#
+# The corpus is the repo's paper texts plus --abstracts short documents cut from
+# them, so packing has something to pack.
+#
+#   python -m bench.bench_prompt_layout [--abstracts 40 --pack 8]
+
+import argparse
+import os
+import tempfile
+
+from openai import OpenAI
+
+from extract.chunking import DEFAULT_CHUNK_TOKENS, DEFAULT_OVERLAP_TOKENS, iter_chunks, iter_file_pages
+from extract.engine import ChunkJob, ExtractionEngine
+from extract.fake_server import FakeOpenAIServer
+from extract.packing import chunk_messages, pack, section_id, section_text, system_prefix
+from extract.prompt import EXTRACT_INSTRUCTIONS
+from extract.schema import response_format
+from extract.tokens import TokenLedger, compare
+
+PAPERS = ["output_text.txt", "output2_text.txt", "output3_text.txt"]
+
+
+def write_abstracts(out_dir, count, words=250):
+    """Cut `count` short documents out of the paper texts."""
+    text = " ".join(open(p, "r", encoding="utf-8").read() for p in PAPERS).split()
+    paths = []
+    for n in range(count):
+        start = (n * 997) % max(1, len(text) - words)
+        path = os.path.join(out_dir, f"abstract_{n:03d}.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(" ".join(text[start:start + words]))
+        paths.append(path)
+    return paths
+
+
+def corpus_chunks(paths):
+    for i, path in enumerate(paths, 1):
+        for j, chunk in enumerate(iter_chunks(iter_file_pages(path), DEFAULT_CHUNK_TOKENS, DEFAULT_OVERLAP_TOKENS), 1):
+            yield i, j, os.path.basename(path), chunk
+
+
+def jobs(layout, paths, max_parts):
+    if layout == "inline":
+        for i, j, source, chunk in corpus_chunks(paths):
+            content = f"""
+    {EXTRACT_INSTRUCTIONS}
+    Text section {j} of file {i}:
+    {chunk}
+
+    """
+            yield ChunkJob(i, j, [{"role": "user", "content": content}], {"parts": [(source, len(chunk))]})
+    elif layout == "prefix":
+        for i, j, source, chunk in corpus_chunks(paths):
+            messages = chunk_messages(EXTRACT_INSTRUCTIONS, f"Text section {j} of file {i}:\n\n{chunk}")
+            yield ChunkJob(i, j, messages, {"parts": [(source, len(chunk))]})
+    else:
+        prefix = system_prefix(EXTRACT_INSTRUCTIONS, packed=True)
+        for group in pack(corpus_chunks(paths), DEFAULT_CHUNK_TOKENS, max_parts):
+            messages = chunk_messages(prefix, section_text((section_id(i, j), c) for i, j, _, c in group))
+            yield ChunkJob(group[0][0], group[0][1], messages, {"parts": [(s, len(c)) for _, _, s, c in group]})
+
+
+def run(layout, paths, max_parts, concurrency):
+    with FakeOpenAIServer() as server:
+        client = OpenAI(base_url=server.base_url, api_key="fake", max_retries=0)
+        engine = ExtractionEngine(client, max_concurrency=concurrency,
+                                  response_format=response_format(packed=layout == "packed"))
+        ledger = TokenLedger(layout)
+        for result in engine.imap(jobs(layout, paths, max_parts)):
+            if result.error is None:
+                ledger.add(result.usage, result.job.meta["parts"], result.cached)
+    return ledger
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare prompt / completion tokens across request layouts.")
+    parser.add_argument("--abstracts", type=int, default=40)
+    parser.add_argument("--pack", type=int, default=8)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--per-paper", action="store_true", help="Show every paper, not just the totals.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = PAPERS + write_abstracts(tmp, args.abstracts)
+        ledgers = {layout: run(layout, paths, args.pack, args.concurrency) for layout in ("inline", "prefix", "packed")}
+
+    for layout, ledger in ledgers.items():
+        t = ledger.totals()
+        print(f"{layout:>7}: {t['requests']:>4} requests, {t['prompt']:>9,.0f} prompt "
+              f"({t['prompt'] - t['cached']:>9,.0f} uncached), {t['completion']:>7,.0f} completion tokens")
+    for layout in ("prefix", "packed"):
+        print(f"\ninline -> {layout}:")
+        table = compare(ledgers["inline"], ledgers[layout]).splitlines()
+        print("\n".join(table if args.per_paper else [table[0], *table[-2:]]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+# bench/bench_response_parse.py
+# Regression check and timing for extract.response over a corpus of broken model
+# outputs (bench/fixtures/responses, built from the repo's real extraction
+# responses: fenced, prose-wrapped, truncated at max_tokens, trailing commas,
+# comments, raw newlines, one malformed object, refusals).
+#
+# Every fixture must parse to the status and object counts in expected.json
+# (exit status 1 otherwise); the legacy fence-strip + json.loads parser is timed
+# alongside and its recoveries counted.
+#
+#   python -m bench.bench_response_parse [--repeat 200]
+
+import argparse
+import json
+import os
+import sys
+import time
+
+from extract.response import JSON_BACKEND, SECTIONS, parse_response
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "responses")
+
+
+# the parser chatgpt_extraction.py and gemini.py used before, as the baseline
+def legacy_parse(output_text):
+    output_text = output_text.strip()
+    if output_text.startswith("```json"):
+        output_text = output_text[len("```json"):].strip()
+    elif output_text.startswith("```"):
+        output_text = output_text[len("```"):].strip()
+    if output_text.endswith("```"):
+        output_text = output_text[:-3].strip()
+    try:
+        return json.loads(output_text)
+    except json.JSONDecodeError:
+        return None
+
+
+def load_fixtures():
+    with open(os.path.join(FIXTURES, "expected.json"), "r", encoding="utf-8") as f:
+        expected = json.load(f)
+    texts = {}
+    for name in expected:
+        with open(os.path.join(FIXTURES, name), "r", encoding="utf-8") as f:
+            texts[name] = f.read()
+    return texts, expected
+
+
+def observed(result) -> dict:
+    counts = {section: len(items) for section, items in (result.data or {}).items() if section in SECTIONS}
+    return {"status": result.status, **counts, "dropped": result.dropped}
+
+
+def objects(data) -> int:
+    return sum(len(data.get(s) or []) for s in SECTIONS) if isinstance(data, dict) else 0
+
+
+def timed(fn, texts, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text in texts:
+            fn(text)
+    return (time.perf_counter() - start) / (repeat * len(texts))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Regression check and benchmark for the response parser.")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    texts, expected = load_fixtures()
+    failures = 0
+    print(f"{'fixture':<32} {'status':<9} {'objects':>7} {'legacy':>7} {'parse us':>9} {'legacy us':>9}")
+    for name, text in texts.items():
+        result = parse_response(text)
+        got = observed(result)
+        mark = ""
+        if got != expected[name]:
+            failures += 1
+            mark = f"  MISMATCH expected {expected[name]}"
+        print(f"{name:<32} {result.status:<9} {objects(result.data):>7} {objects(legacy_parse(text)):>7} "
+              f"{timed(parse_response, [text], args.repeat) * 1e6:>9.1f} "
+              f"{timed(legacy_parse, [text], args.repeat) * 1e6:>9.1f}{mark}")
+
+    recovered = sum(objects(parse_response(t).data) for t in texts.values())
+    legacy = sum(objects(legacy_parse(t)) for t in texts.values())
+    print(f"\nbackend {JSON_BACKEND}: {recovered} objects recovered vs {legacy} with the legacy parser; "
+          f"mean {timed(parse_response, list(texts.values()), args.repeat) * 1e6:.1f} us per response")
+    if failures:
+        print(f"{failures} fixtures regressed")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
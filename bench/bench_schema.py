@@ -0,0 +1,62 @@
+# bench/bench_schema.py
+# Time a batched load with and without the id uniqueness constraints.
+#
+#   docker compose up -d neo4j
+#   NEO4J_URI=bolt://localhost:7687 python -m bench.bench_schema --entities 50000
+#
+# WARNING: wipes the target database and its id constraints between runs.
+
+import argparse
+import json
+import os
+import time
+
+from neo4j import GraphDatabase
+
+from bench.bench_graph_load import reset, synthetic_graph
+from graph.loader import load_graph
+from graph.schema import drop_schema, ensure_schema, format_timings
+
+
+def timed_load(session, entities, relationships, batch_size):
+    start = time.perf_counter()
+    load_graph(session, entities, relationships, batch_size)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark graph loading with and without id constraints.")
+    parser.add_argument("--entities", type=int, default=50000)
+    parser.add_argument("--relationships", type=int, default=100000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--output", help="Write results as JSON to this path.")
+    args = parser.parse_args()
+
+    uri = os.getenv("NEO4J_URI", "bolt://localhost:7687")
+    entities, relationships = synthetic_graph(args.entities, args.relationships)
+    labels = {e["type"] for e in entities}
+    results = {"entities": args.entities, "relationships": args.relationships}
+
+    with GraphDatabase.driver(uri, auth=None) as driver, driver.session() as session:
+        reset(session)
+        drop_schema(session, labels)
+        results["without_constraints_seconds"] = timed_load(session, entities, relationships, args.batch_size)
+
+        reset(session)
+        timings = ensure_schema(session, labels)
+        print("Schema bootstrap:\n" + format_timings(timings))
+        results["schema_seconds"] = sum(timings.values())
+        results["with_constraints_seconds"] = timed_load(session, entities, relationships, args.batch_size)
+        reset(session)
+
+    print(f"without constraints: {results['without_constraints_seconds']:8.2f}s")
+    print(f"   with constraints: {results['with_constraints_seconds']:8.2f}s "
+          f"(+{results['schema_seconds']:.2f}s schema bootstrap)")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
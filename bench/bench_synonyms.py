@@ -0,0 +1,62 @@
+# bench/bench_synonyms.py
+# Lookup cost of the synonym index as the vocabulary grows.
+#
+#   python -m bench.bench_synonyms [--entries 50000]
+
+import argparse
+import random
+import string
+import time
+
+from extract.synonyms import SynonymIndex, default_index
+
+
+def synthetic_name(rnd):
+    stem = "".join(rnd.choice(string.ascii_lowercase) for _ in range(rnd.randint(5, 10)))
+    return stem + rnd.choice(["ine", "pram", "zole", "done", "mab", "xetine", "pine"])
+
+
+def typo(rnd, term):
+    i = rnd.randrange(len(term))
+    return term[:i] + rnd.choice(string.ascii_lowercase) + term[i + 1:]
+
+
+def time_lookups(index, queries):
+    index._resolved.clear()  # measure real lookups, not the memo
+    start = time.perf_counter()
+    for text, system, code in queries:
+        index.resolve(text, system, code)
+    return (time.perf_counter() - start) / len(queries) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark synonym index lookups.")
+    parser.add_argument("--entries", type=int, default=50000, help="Synthetic vocabulary entries.")
+    parser.add_argument("--queries", type=int, default=20000)
+    args = parser.parse_args()
+
+    rnd = random.Random(0)
+    index = SynonymIndex.from_tsv(default_index.__wrapped__.__defaults__[0])
+    names = []
+    start = time.perf_counter()
+    for i in range(args.entries):
+        name = synthetic_name(rnd)
+        names.append(name)
+        index.add(name, [name + " hydrochloride", "brand" + name[:6]], "RXNORM", str(10_000_000 + i))
+    build = time.perf_counter() - start
+    print(f"built {len(index):,} terms in {build:.2f}s")
+
+    sample = rnd.sample(range(len(names)), min(args.queries, len(names)))
+    cases = {
+        "exact name": [(names[i], None, None) for i in sample],
+        "salt form": [(names[i] + " hydrochloride", None, None) for i in sample],
+        "code only": [("unlisted surface form", "RXNORM", str(10_000_000 + i)) for i in sample],
+        "typo (fuzzy)": [(typo(rnd, names[i]), None, None) for i in sample],
+        "unknown term": [(synthetic_name(rnd) + "q", None, None) for _ in sample],
+    }
+    for name, queries in cases.items():
+        print(f"{name:>14}: {time_lookups(index, queries):8.1f} us/lookup")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,151 +2,256 @@ import os
 import json
 import argparse
 
-from openai import OpenAI
-from pypdf import PdfReader  # pip install pypdf
+from extract.artifact import write_combined
+from extract.cache import add_cache_arguments, cache_from_args
+from extract.dedup import DEFAULT_THRESHOLD, dedup, summary as dedup_summary
+from extract.chunking import DEFAULT_CHUNK_TOKENS, DEFAULT_OVERLAP_TOKENS, iter_chunks, iter_file_pages, token_budget
+from extract.engine import ChunkJob, ExtractionEngine
+from extract.interactions import DEFAULT_PROPERTIES, add_rule_interactions, default_rules
+from extract.journal import ChunkJournal, job_key, journal_path_for, merge_records
+from extract.pdf_ingest import DEFAULT_BACKEND, convert_many, find_pdfs, iter_pages
+from extract.response import ParseStats, parse_response
+from extract.search import add_search_arguments, index_from_args
+from extract.schema import ExtractionValidator, entity_type_lines, output_example, relationship_type_lines, response_format
+from extract.synonyms import DEFAULT_VOCABULARY, default_index
+from extract.tokens import TokenLedger
+from extract.trace import set_trace_file, summary, traced, traced_iter
 
-# System Prompt
-SYSTEM_PROMPT = """
-You are a "Maximum Yield" Medical Extraction Engine.
+# System Prompt (type lists and output structure come from extract.schema)
+SYSTEM_INSTRUCTIONS = f"""
+You are a Medical Extraction Engine.
 
-Your goal is to extract a Knowledge Graph with the HIGHEST POSSIBLE number of valid interactions.
-You must adopt a "Zero-Filter" policy regarding interaction significance: if there is a theoretical, mechanistic, or protocol-based reason why two things interact, YOU MUST LIST IT.
-
-Output a SINGLE JSON object.
+Your goal is to extract a Knowledge Graph of the entities, relationships and interactions stated in the text.
 
 =========================================================
-1) ENTITIES (STRICT SCHEMA)
+1) ENTITIES
 =========================================================
-Extract entities into a list of objects with unique integer IDs.
-Include ALL:
-- "medication": (e.g., "fluoxetine", "sertraline")
-- "treatment_type": (e.g., "CBT", "ECT", "rTMS", "EMDR", "Psychodynamic Therapy")
-- "medical_condition", "outcome", "measure", "patient_group"
-
-Format:
-[
-  { "id": 1, "text": "fluoxetine", "type": "medication" },
-  { "id": 2, "text": "CBT", "type": "treatment_type" }
-]
+Extract entities with unique integer IDs. Include ALL of these types:
+{entity_type_lines(examples=False)}
+Non-drug therapies are treatment_type (e.g., "CBT", "ECT", "rTMS", "EMDR", "Psychodynamic Therapy").
 
 =========================================================
 2) RELATIONSHIPS
 =========================================================
-Standard explicit relationships found in the text.
-Format: { "head": 1, "tail": 2, "type": "treats", "evidence": "..." }
+Standard explicit relationships found in the text, with the supporting quote as evidence:
+{relationship_type_lines()}
 
 =========================================================
-3) INTERACTIONS (MAXIMALIST MODE)
+3) INTERACTIONS (TEXT-GROUNDED ONLY)
 =========================================================
-**INSTRUCTION:** Cross-reference EVERY entity of type "medication" and "treatment_type" against every other one.
-You must output an interaction for ANY of the following categories. Do not omit "minor" or "theoretical" risks.
-
-**CATEGORY A: PHARMACOLOGIC CLASHES (The usual stuff)**
-- **Serotonin/Norepinephrine:** Any two drugs affecting these neurotransmitters.
-- **Seizure Threshold:** Bupropion, TCAs, Clozapine, Tramadol, etc.
-- **Metabolic:** CYP450 inhibitors + substrates.
-- **Sedation:** Any two agents with sedative properties.
-
-**CATEGORY B: THERAPEUTIC FRICTION (Therapy-Therapy & Drug-Therapy)**
-- **Interference with Learning:** Sedatives (Benzos/Z-drugs) + Psychotherapy (CBT/Exposure). *Mechanism: Impaired emotional learning/habituation.*
-- **Conflicting Modalities:** Directive therapies (CBT) + Non-directive therapies (Psychoanalysis) concurrently. *Mechanism: Conflicting patient instructions.*
-- **Somatic Overload:** Multiple brain stimulation therapies (ECT + rTMS + DBS) concurrently. *Mechanism: Excessive neural stimulation/unknown safety profile.*
-- **Protocol Clashes:** Therapies requiring alert states vs. sedating medications.
-
-**CATEGORY C: PHYSIOLOGICAL BURDEN**
-- **Cardiovascular:** Stimulants + Cardiovascular active drugs.
-- **Anticholinergic Load:** Any cumulative anticholinergic burden (TCAs + Antipsychotics + Antihistamines).
-
-**OUTPUT RULES:**
-- **Goal:** 20-40 interactions for complex texts.
-- **Format:**
-  {
-    "id": <int>,
-    "entity_ids": [<int>, <int>],
-    "interaction_type": "use_with_caution" (or "contraindicated"),
-    "note": "Short explanation of the clash.",
-    "evidence": "Standard clinical knowledge regarding [mechanism] OR quote."
-  }
-
-**CRITICAL:**
-If two entities exist in the text, and there is ANY widely known medical reason to pause before combining them, LIST IT.
+Only list an interaction between two entities when the text itself describes it
+(a reported adverse effect of the combination, a warning, a contraindication, an augmentation finding).
+Do NOT cross-reference entity pairs from general knowledge: pharmacologic, therapy-friction and
+physiological interactions are computed from a drug property table after extraction.
+If the text reports none, return an empty list.
+"""
+
+# for endpoints without structured outputs (--no-schema) the structure is spelled out
+SYSTEM_PROMPT = SYSTEM_INSTRUCTIONS + f"""
+Output a SINGLE JSON object:
+{output_example(interactions=True, codes=False)}
 """
 
-# Make sure OPENAI_API_KEY is set in your environment
-client = OpenAI()
+
+# Make sure OPENAI_API_KEY is set in your environment.
+def make_engine(args) -> ExtractionEngine:
+    # no client here: the shared one (extract.clients) is created on the first request, so
+    # importing this module is cheap and a long-lived worker reuses one connection pool
+    return ExtractionEngine(model="gpt-4o-mini", temperature=0.1,  # or "gpt-4o" if you want more power
+                            max_concurrency=max(1, args.concurrency),
+                            cache=cache_from_args(args), refresh=args.refresh,
+                            response_format=None if args.no_schema else response_format(interactions=True, codes=False))
+
+
+def make_validator() -> ExtractionValidator:
+    return ExtractionValidator(interactions=True, codes=False)
+
+
+def system_prompt(engine) -> str:
+    return SYSTEM_INSTRUCTIONS if engine.response_format is not None else SYSTEM_PROMPT
 
 # PDF -> plain text
+@traced("pdf_to_text")
 def pdf_to_text(pdf_path: str) -> str:
     """Extract text from a PDF file using pypdf."""
-    reader = PdfReader(pdf_path)
-    pages = []
-    for page in reader.pages:
-        text = page.extract_text() or ""
-        pages.append(text)
-    return "\n\n".join(pages)
+    return "\n\n".join(iter_pages(pdf_path, "pypdf"))
 
 # Call chat.completions and parse JSON
-def extract_from_paper_text(paper_text: str) -> dict | None:
+def extract_from_paper_text(paper_text: str, engine: ExtractionEngine) -> dict | None:
     """
     Single call:
       input: paper_text
       output: { "entities": [...], "relationships": [...], "interactions": [...] }
     """
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",   # or "gpt-4o" if you want more power
-        messages=[
-            {"role": "system", "content": SYSTEM_PROMPT},
-            {"role": "user", "content": paper_text},
-        ],
-        temperature=0.1,
-    )
+    output_text, usage, _, cached = engine.call([
+        {"role": "system", "content": system_prompt(engine)},
+        {"role": "user", "content": paper_text},
+    ])
+    ledger = TokenLedger()
+    ledger.add(usage, [("paper", 1)], cached)
 
-    output_text = response.choices[0].message.content.strip()
+    parsed = parse_response(output_text)
+    if parsed.data is None:
+        print("LLM did not return valid JSON. Raw output:")
+        print(output_text)
+    elif parsed.status == "salvaged":
+        print(f"Response was incomplete; salvaged {parsed.salvaged} ({parsed.dropped} partial objects dropped)")
+    if parsed.data is None:
+        return None
 
-    # strip ```json or ``` fences if present
-    if output_text.startswith("```json"):
-        output_text = output_text[len("```json"):].strip()
-    elif output_text.startswith("```"):
-        output_text = output_text[len("```"):].strip()
+    validator = make_validator()
+    data = validator(parsed.data)
+    if validator.dropped:
+        print(validator.summary())
+    print("Token usage (this run's requests):")
+    print(ledger.report())
+    return data
 
-    if output_text.endswith("```"):
-        output_text = output_text[:-3].strip()
 
-    try:
-        validated_json = json.loads(output_text)
-    except json.JSONDecodeError:
-        print("LLM did not return valid JSON. Raw output:")
-        print(output_text)
-        validated_json = None
+# Batch mode: a directory or manifest of papers -> one merged graph.
+#
+#   map:    PDFs are converted to text on a process pool (extract.pdf_ingest),
+#           then every paper is split into chunks that fit the context window
+#           and the chunks are extracted concurrently by the engine
+#   reduce: per-chunk results are merged paper by paper, in corpus order, into
+#           one canonical ID space (extract.canonical, as in gemini.py)
+#
+# Every parsed chunk is appended to a journal (extract.journal); a restarted run
+# replays journaled chunks instead of re-sending them, then compacts the journal.
 
-    return validated_json
+def read_manifest(path) -> list:
+    """One paper path per line (blank lines and # comments ignored), relative to the manifest."""
+    base = os.path.dirname(os.path.abspath(path))
+    papers = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                papers.append(os.path.normpath(os.path.join(base, line)))
+    return papers
 
 
-def main():
-    parser = argparse.ArgumentParser(
-        description="Extract entities, relationships, and interactions from a medical PDF."
-    )
-    parser.add_argument("pdf_path", help="Path to the input PDF file.")
-    parser.add_argument(
-        "-o",
-        "--output",
-        help="Path to write JSON output (default: validated_interactions.json).",
-        default="validated_interactions.json",
-    )
-    args = parser.parse_args()
+def list_papers(spec) -> list:
+    papers = find_pdfs(spec) if os.path.isdir(spec) else read_manifest(spec)
+    return list(dict.fromkeys(papers))  # keep the first occurrence of repeated entries
+
+
+def batch_root(spec) -> str:
+    """What paper sources are relative to: the batch directory, or the manifest's directory."""
+    return spec if os.path.isdir(spec) else os.path.dirname(os.path.abspath(spec))
+
+
+def paper_source(path, root) -> str:
+    """
+    The paper's path relative to the batch root ("2023/main.pdf"), so same-named papers
+    in different subdirectories stay apart; papers at the top level keep their file name.
+    """
+    return os.path.relpath(path, root).replace(os.sep, "/")
+
+
+def paper_texts(papers, root, text_dir, workers=None):
+    """(source, text path or None, error) per paper; PDFs are converted, .txt files used as-is."""
+    pdfs = [p for p in papers if p.lower().endswith(".pdf")]
+    converted = {r.pdf_path: r for r in convert_many(pdfs, text_dir, DEFAULT_BACKEND, workers)}
+    for path in papers:
+        if path in converted:
+            result = converted[path]
+            yield paper_source(path, root), result.txt_path if result.error is None else None, result.error
+        elif os.path.exists(path):
+            yield paper_source(path, root), path, None
+        else:
+            yield paper_source(path, root), None, "file not found"
+
+
+def run_batch(args, engine: ExtractionEngine):
+    papers = list_papers(args.batch)
+    journal = ChunkJournal(args.journal or journal_path_for(args.output))
+    print(f"{len(papers)} papers, {len(journal)} chunks already in {journal.path}")
+
+    prompt = system_prompt(engine)
+    chunk_tokens = token_budget(prompt, target=args.chunk_tokens)
+    texts = []
+    for source, txt_path, error in paper_texts(papers, batch_root(args.batch), args.text_dir, args.workers):
+        if txt_path is None:
+            print(f"Skipping {source}: {error}")
+        else:
+            texts.append((source, txt_path))
 
-    if not os.path.exists(args.pdf_path):
-        raise FileNotFoundError(f"PDF not found: {args.pdf_path}")
+    def build_jobs():
+        for i, (source, txt_path) in enumerate(texts, 1):
+            chunks = traced_iter("chunk_text", iter_chunks(iter_file_pages(txt_path), chunk_tokens, args.overlap_tokens),
+                                 counter="chunks", paper=source)
+            for j, chunk in enumerate(chunks, 1):
+                messages = [
+                    {"role": "system", "content": prompt},
+                    {"role": "user", "content": f"Paper {source}, section {j}:\n\n{chunk}"},
+                ]
+                yield ChunkJob(i, j, messages, {"source": source})
 
+    # map: only chunks missing from the journal are sent; results arrive in (paper, chunk) order
+    validator = make_validator()
+    completed_keys, failed = [], set()
+    stats = ParseStats()
+    ledger = TokenLedger()
+    for job, record, result in journal.resume(engine, build_jobs()):
+        source, j = job.meta["source"], job.chunk_index
+        if record is None:
+            if result.error is None:
+                ledger.add(result.usage, [(source, 1)], result.cached)
+            parsed = stats.add(parse_response(result.content)) if result.error is None else None
+            if parsed is None or parsed.data is None:
+                print(f"Error in {source}, chunk {j}: {result.error or parsed.error}")
+                failed.add(source)
+                continue
+            record = {"key": job_key(engine, job), "source": source, "file": job.file_index,
+                      "chunk": j, "data": validator(parsed.data)}
+            if parsed.status != "ok":
+                record["parse"] = parsed.status
+            journal.append(record)
+        completed_keys.append(record["key"])
+
+    # reduce: replay the compacted journal in corpus order, so IDs are the same on every run
+    records = journal.compact(completed_keys)
+    journal.close()
+    merged = merge_records(records, default_index(args.vocabulary))
+    if args.dedup is not None:
+        merged, dedup_stats = dedup(merged, args.dedup)
+        print(dedup_summary(dedup_stats))
+    if not args.no_rule_interactions:
+        add_rule_interactions(merged, default_rules(args.properties))
+    write_combined(merged, args.output)
+    index_from_args(args, merged, args.output)
+    print(f"Journal: {journal.replayed} chunks replayed, {journal.appended} extracted")
+    print(stats.summary())
+    print(validator.summary())
+    print("Token usage (this run's requests):")
+    print(ledger.report())
+    print("Stage timings:")
+    print(summary())
+    print(f"Wrote {len(merged['entities'])} entities, {len(merged['relationships'])} relationships, "
+          f"{len(merged.get('interactions', []))} interactions from {len(texts) - len(failed)} papers to {args.output}")
+    if failed:
+        print(f"{len(failed)} papers incomplete; rerun the same command to resume: {', '.join(sorted(failed)[:5])}")
+
+
+
+def extract_single(args, engine: ExtractionEngine):
     print(f"Reading PDF: {args.pdf_path}")
     paper_text = pdf_to_text(args.pdf_path)
 
     print("Calling OpenAI API to extract entities/relationships/interactions...")
-    result = extract_from_paper_text(paper_text)
+    result = extract_from_paper_text(paper_text, engine)
 
     if result is None:
+        print("Stage timings:")
+        print(summary())
         print("No valid JSON returned; nothing to save.")
         return
+    if not args.no_rule_interactions:
+        add_rule_interactions(result, default_rules(args.properties))
+    index_from_args(args, result, args.output, default_source=os.path.basename(args.pdf_path))
+    print("Stage timings:")
+    print(summary())
 
     json_str = json.dumps(result, indent=2, ensure_ascii=False)
 
@@ -157,5 +262,65 @@ def main():
     else:
         print(json_str)
 
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Extract entities, relationships, and interactions from a medical PDF."
+    )
+    parser.add_argument("pdf_path", nargs="?", help="Path to the input PDF file.")
+    parser.add_argument(
+        "-o",
+        "--output",
+        help="Path to write JSON output (default: validated_interactions.json).",
+        default="validated_interactions.json",
+    )
+    parser.add_argument("--no-rule-interactions", action="store_true",
+                        help="Only keep interactions the model reports from the text.")
+    parser.add_argument("--properties", default=DEFAULT_PROPERTIES,
+                        help="Drug / therapy property table for computed interactions (TSV).")
+    parser.add_argument("--no-schema", action="store_true",
+                        help="Describe the output format in the prompt instead of sending a JSON schema "
+                             "(for endpoints without structured outputs).")
+    batch = parser.add_argument_group("batch mode")
+    batch.add_argument("--batch", metavar="DIR_OR_MANIFEST",
+                       help="Directory of PDFs, or a manifest listing one paper (.pdf/.txt) per line.")
+    batch.add_argument("--journal", help="Per-chunk progress journal (default: <output>.journal.jsonl).")
+    batch.add_argument("--text-dir", default="texts", help="Where converted paper text is kept (default: texts/).")
+    batch.add_argument("--workers", type=int, default=None, help="PDF conversion processes (default: CPU count).")
+    batch.add_argument("--concurrency", type=int, default=int(os.getenv("EXTRACT_CONCURRENCY", "4")),
+                       help="Maximum number of in-flight completion requests.")
+    batch.add_argument("--chunk-tokens", type=int, default=DEFAULT_CHUNK_TOKENS,
+                       help="Target tokens of paper text per request (capped by the context window).")
+    batch.add_argument("--overlap-tokens", type=int, default=DEFAULT_OVERLAP_TOKENS)
+    batch.add_argument("--dedup", type=float, nargs="?", const=DEFAULT_THRESHOLD, default=None, metavar="THRESHOLD",
+                       help=f"Merge near-duplicate entities across papers (default threshold {DEFAULT_THRESHOLD}).")
+    batch.add_argument("--vocabulary", default=DEFAULT_VOCABULARY,
+                       help="Synonym vocabulary (TSV) used when merging entities across papers.")
+    parser.add_argument("--trace", default=os.getenv("TRACE_FILE"),
+                        help="Append per-stage timing spans (JSONL); compare runs with python -m extract.trace compare.")
+    add_cache_arguments(parser)
+    add_search_arguments(parser)
+    args = parser.parse_args(argv)
+    set_trace_file(args.trace)
+
+    if not args.batch:
+        if not args.pdf_path:
+            parser.error("pdf_path is required unless --batch is given")
+        if not os.path.exists(args.pdf_path):
+            raise FileNotFoundError(f"PDF not found: {args.pdf_path}")
+
+    # one engine per run; its response cache is opened here and closed when the run ends
+    engine = make_engine(args)
+    try:
+        if args.batch:
+            run_batch(args, engine)
+        else:
+            extract_single(args, engine)
+    finally:
+        if engine.cache is not None:
+            engine.cache.close()
+
+
+
 if __name__ == "__main__":
     main()
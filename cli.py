@@ -0,0 +1,52 @@
+# cli.py
+# One entry point for the pipeline scripts and tools:
+#
+#   python cli.py extract output_text.txt --concurrency 8     (gemini.py)
+#   python cli.py extract-papers --batch Research-papers/     (chatgpt_extraction.py)
+#   python cli.py load --input combined-final-CHATGPT.ndjson  (generate_graph.py)
+#   python cli.py search query "serotonin syndrome"           (python -m extract.search)
+#   python cli.py <command> --help
+#
+# Only the chosen command's module is imported, so `--help` and light commands
+# do not pay for openai / neo4j / numpy.
+
+import argparse
+import importlib
+import sys
+
+# command -> (module with a main(), description)
+COMMANDS = {
+    "extract": ("gemini", "Extract entities and relationships from text files."),
+    "extract-papers": ("chatgpt_extraction", "Extract entities, relationships and interactions from PDFs (--batch for a corpus)."),
+    "load": ("generate_graph", "Load a combined extraction into Neo4j (or export neo4j-admin files)."),
+    "query": ("graph.query", "Query the graph from a combined extraction."),
+    "search": ("extract.search", "Full-text search over evidence quotes."),
+    "dedup": ("extract.dedup", "Merge near-duplicate entities."),
+    "rollup": ("graph.rollup", "Parent condition groups and their aggregates."),
+    "export": ("graph.export", "Write neo4j-admin import CSVs."),
+    "journal": ("extract.journal", "Compact a chunk journal and rebuild the combined output."),
+    "artifact": ("extract.artifact", "Convert between .json and .ndjson extractions."),
+    "schema": ("extract.schema", "Print the structured-output JSON schema."),
+    "tokens": ("extract.tokens", "Compare token reports."),
+    "trace": ("extract.trace", "Summarize or compare trace files."),
+    "fake-server": ("extract.fake_server", "Local fake OpenAI server for offline runs."),
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="cli.py", description="Knowledge graph extraction pipeline.",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="commands:\n" + "\n".join(f"  {name:<15} {help_text}" for name, (_, help_text) in COMMANDS.items()))
+    parser.add_argument("command", choices=COMMANDS, metavar="command")
+    parser.add_argument("args", nargs=argparse.REMAINDER, help="Arguments for the command (see <command> --help).")
+    args = parser.parse_args(argv)
+
+    module = importlib.import_module(COMMANDS[args.command][0])
+    # the commands parse sys.argv themselves; their usage lines read "cli.py <command>"
+    sys.argv = [f"cli.py {args.command}", *args.args]
+    module.main()
+
+
+if __name__ == "__main__":
+    main()
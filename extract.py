@@ -1,10 +1,9 @@
-import pymupdf
-import pathlib
+from extract.pdf_ingest import iter_pages, write_pages
 
 def pdf_to_txt(pdf_path, txt_path):
-    with pymupdf.open(pdf_path) as doc:
-        text = chr(12).join([page.get_text() for page in doc]) # chr(12) is form feed for page breaks
-        pathlib.Path(txt_path).write_bytes(text.encode('utf-8'))
+    # pages are streamed to disk, separated by chr(12) (form feed for page breaks)
+    write_pages(iter_pages(pdf_path, "pymupdf"), txt_path)
 
 # Example usage:
-# pdf_to_txt("WJCC-9-9350.pdf", "output_text.txt")
\ No newline at end of file
+# pdf_to_txt("WJCC-9-9350.pdf", "output_text.txt")
+# For whole directories, see: python -m extract.pdf_ingest Research-papers-txt/ -o texts/
@@ -0,0 +1,229 @@
+# extract/artifact.py
+# Streaming NDJSON format for combined extraction output.
+#
+# One JSON object per line, tagged with its kind:
+#   {"kind": "header", "format": "kg-ndjson", "version": 1, "run": "<random id>"}
+#   {"kind": "entity", "id": 1, "text": "sertraline", "type": "medication", ..., "sources": ["a.txt"]}
+#   {"kind": "relationship", "head": 1, "tail": 2, "type": "treats", ...}
+#   {"kind": "interaction", "id": 1, "entity_ids": [1, 3], ...}
+#   {"kind": "end", "entities": ..., "relationships": ..., "interactions": ...}
+#
+# A writer that stops early (an exception in the extraction) writes
+# {"kind": "aborted", "error": ...} instead of the end line; readers raise EOFError.
+#
+# An entity may appear on several lines (once per paper that mentions it, each
+# carrying the sources added by that line); readers union the sources. Entities
+# always come before the relationships that reference them, so a reader can load
+# the graph in one pass, even while the writer is still extracting (follow=True).
+# A follower gives up with EOFError when nothing arrives for ARTIFACT_FOLLOW_TIMEOUT
+# seconds (the writer died without a trace) or when the file is truncated or
+# replaced under it (a rerun started writing the same path).
+#
+# Files ending in .json are the classic {"entities": [...], "relationships": [...]}
+# document and are read / written whole.
+#
+#   python -m extract.artifact convert combined-final-CHATGPT.json combined-final-CHATGPT.ndjson
+
+import argparse
+import json
+import os
+import time
+import uuid
+
+FORMAT = "kg-ndjson"
+VERSION = 1
+KINDS = ("entity", "relationship", "interaction")
+NDJSON_SUFFIXES = (".ndjson", ".jsonl")
+DEFAULT_FOLLOW_TIMEOUT = float(os.getenv("ARTIFACT_FOLLOW_TIMEOUT", "600"))
+SECTION = {"entity": "entities", "relationship": "relationships", "interaction": "interactions"}
+
+
+def is_ndjson(path) -> bool:
+    return str(path).lower().endswith(NDJSON_SUFFIXES)
+
+
+class ArtifactWriter:
+    """Append records as they are produced; `flush()` after each chunk makes them visible to readers."""
+
+    def __init__(self, path):
+        self.path = path
+        self.counts = dict.fromkeys(KINDS, 0)
+        self._f = open(path, "w", encoding="utf-8")
+        # the run id lets a follower tell a rerun's file from the one it was reading
+        self._line({"kind": "header", "format": FORMAT, "version": VERSION, "run": uuid.uuid4().hex})
+
+    def _line(self, obj):
+        self._f.write(json.dumps(obj, ensure_ascii=False) + "\n")
+
+    def write(self, kind, record):
+        self._line({"kind": kind, **record})
+        self.counts[kind] += 1
+
+    def flush(self):
+        self._f.flush()
+
+    def close(self, error=None):
+        """End line with the counts, or an aborted line if `error` is given; later calls do nothing."""
+        if self._f.closed:
+            return
+        if error is None:
+            self._line({"kind": "end", **{SECTION[k]: n for k, n in self.counts.items()}})
+        else:
+            self._line({"kind": "aborted", "error": str(error)})
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close(error=exc)
+
+
+def _rewritten(f, path, first_line) -> bool:
+    """True if `path` is no longer the file `f` has been reading (replaced, truncated or restarted)."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return True
+    if stat.st_ino != os.fstat(f.fileno()).st_ino or stat.st_size < f.tell():
+        return True
+    if first_line is None:
+        return False
+    # truncated and already written past our offset: the header (run id) differs
+    with open(path, "r", encoding="utf-8") as current:
+        return current.readline() != first_line
+
+
+def _follow_lines(f, path, poll, timeout):
+    """Lines of a file that is still being written; waits for complete lines."""
+    first_line = None
+    pending = ""
+    idle_since = time.monotonic()
+    waited = False
+    while True:
+        line = f.readline()
+        if line and waited and _rewritten(f, path, first_line):
+            line = ""  # a rerun wrote past our offset while we slept; do not parse its bytes
+        if line:
+            idle_since = time.monotonic()
+            waited = False
+            pending += line
+            if pending.endswith("\n"):
+                first_line = first_line or pending
+                yield pending
+                pending = ""
+            continue
+        if _rewritten(f, path, first_line):
+            raise EOFError(f"{path}: file was rewritten while following (extraction restarted?); rerun the load")
+        if timeout and time.monotonic() - idle_since > timeout:
+            raise EOFError(f"{path}: nothing written for {timeout:g}s and no end record (extraction stopped?)")
+        time.sleep(poll)
+        waited = True
+
+
+def iter_records(path, follow=False, poll=0.5, timeout=DEFAULT_FOLLOW_TIMEOUT):
+    """
+    Yield (kind, record) pairs from an NDJSON artifact, or from a classic JSON file.
+
+    With follow=True an NDJSON file is tailed until the writer's end line, so a
+    graph load can run alongside extraction. EOFError if the writer aborted, goes
+    quiet for `timeout` seconds (0: wait forever) or the file is rewritten.
+    """
+    if not is_ndjson(path):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        for kind in KINDS:
+            for record in data.get(SECTION[kind]) or []:
+                yield kind, record
+        return
+
+    started = time.monotonic()
+    while follow and not os.path.exists(path):
+        if timeout and time.monotonic() - started > timeout:
+            raise EOFError(f"{path}: not created within {timeout:g}s")
+        time.sleep(poll)  # extraction has not created the file yet
+    with open(path, "r", encoding="utf-8") as f:
+        lines = _follow_lines(f, path, poll, timeout) if follow else f
+        for line in lines:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            kind = record.pop("kind", None)
+            if kind == "header":
+                if record.get("format") != FORMAT or record.get("version", 0) > VERSION:
+                    raise ValueError(f"{path}: unsupported artifact {record}")
+            elif kind == "end":
+                return
+            elif kind == "aborted":
+                raise EOFError(f"{path}: extraction aborted: {record.get('error')}")
+            elif kind in KINDS:
+                yield kind, record
+    if follow:
+        raise EOFError(f"{path}: ended without an end record")
+
+
+def read_combined(path) -> dict:
+    """Whole artifact as {"entities", "relationships"[, "interactions"]}, entity lines merged by id."""
+    entities = {}
+    combined = {"entities": [], "relationships": [], "interactions": []}
+    for kind, record in iter_records(path):
+        if kind != "entity":
+            combined[SECTION[kind]].append(record)
+            continue
+        known = entities.get(record["id"])
+        if known is None:
+            entities[record["id"]] = known = {**record}
+            if "sources" in record:
+                known["sources"] = list(record["sources"])
+        else:
+            known.update({k: v for k, v in record.items() if k != "sources"})
+            sources = known.setdefault("sources", [])
+            sources.extend(s for s in record.get("sources") or [] if s not in sources)
+    combined["entities"] = list(entities.values())
+    if not combined["interactions"]:
+        del combined["interactions"]
+    return combined
+
+
+def write_combined(combined: dict, path):
+    """Write a combined dict as NDJSON or classic JSON, depending on the file name."""
+    if not is_ndjson(path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(combined, f, ensure_ascii=False, indent=2)
+        return
+    with ArtifactWriter(path) as writer:
+        for kind in KINDS:
+            for record in combined.get(SECTION[kind]) or []:
+                writer.write(kind, record)
+
+
+def convert(src, dst) -> dict:
+    """Convert between classic JSON and NDJSON (either direction); returns record counts."""
+    if is_ndjson(dst) and not is_ndjson(src):
+        counts = dict.fromkeys(KINDS, 0)
+        with ArtifactWriter(dst) as writer:
+            for kind, record in iter_records(src):
+                writer.write(kind, record)
+                counts[kind] += 1
+        return counts
+    combined = read_combined(src)
+    write_combined(combined, dst)
+    return {kind: len(combined.get(SECTION[kind]) or []) for kind in KINDS}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert extraction artifacts between JSON and NDJSON.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    conv = sub.add_parser("convert", help="Convert by file extension (.json <-> .ndjson/.jsonl).")
+    conv.add_argument("src")
+    conv.add_argument("dst")
+    args = parser.parse_args()
+
+    if os.path.abspath(args.src) == os.path.abspath(args.dst):
+        parser.error("src and dst must differ")
+    counts = convert(args.src, args.dst)
+    print(f"{args.src} -> {args.dst}: " + ", ".join(f"{n} {SECTION[k]}" for k, n in counts.items()))
+
+
+if __name__ == "__main__":
+    main()
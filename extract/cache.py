@@ -0,0 +1,125 @@
+# extract/cache.py
+# Content-addressed on-disk cache for LLM completion responses (SQLite)
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_CACHE_PATH = os.getenv("LLM_CACHE_PATH", ".llm_cache.sqlite")
+DEFAULT_MAX_AGE_DAYS = float(os.getenv("LLM_CACHE_MAX_AGE_DAYS", "90"))
+DEFAULT_MAX_MB = float(os.getenv("LLM_CACHE_MAX_MB", "512"))
+
+
+def cache_key(model, temperature, messages, **kwargs) -> str:
+    """sha256 over everything that can change the completion: model, temperature, prompt and chunk text."""
+    payload = json.dumps(
+        {"model": model, "temperature": temperature, "messages": messages, "kwargs": kwargs},
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Maps cache_key(...) -> completion text (+ usage).
+
+    Entries older than `max_age_days` are dropped, and once the cache grows past
+    `max_mb` the least recently used entries are evicted. Safe to share across
+    the engine's worker threads.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_age_days=DEFAULT_MAX_AGE_DAYS, max_mb=DEFAULT_MAX_MB):
+        self.path = path
+        self.max_age = max_age_days * 86400 if max_age_days else None
+        self.max_bytes = int(max_mb * 1024 * 1024) if max_mb else None
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._puts = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                content TEXT NOT NULL,
+                usage TEXT,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses(accessed_at)")
+        self._conn.commit()
+        self.evict()
+
+    def get(self, key):
+        """Return (content, usage) or None."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT content, usage, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or (self.max_age and now - row[2] > self.max_age):
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+        return row[0], json.loads(row[1]) if row[1] else None
+
+    def put(self, key, content, usage=None):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (key, content, json.dumps(usage) if usage else None, len(content.encode("utf-8")), now, now),
+            )
+            self._conn.commit()
+            self._puts += 1
+            check_size = self._puts % 100 == 0
+        if check_size:
+            self.evict()
+
+    def evict(self):
+        """Drop expired entries, then least recently used ones until under the size cap."""
+        with self._lock:
+            if self.max_age:
+                self._conn.execute("DELETE FROM responses WHERE created_at < ?", (time.time() - self.max_age,))
+            if self.max_bytes:
+                total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+                if total > self.max_bytes:
+                    excess = total - self.max_bytes
+                    freed = 0
+                    doomed = []
+                    for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY accessed_at"):
+                        if freed >= excess:
+                            break
+                        doomed.append((key,))
+                        freed += size
+                    self._conn.executemany("DELETE FROM responses WHERE key = ?", doomed)
+            self._conn.commit()
+
+    def close(self):
+        self.evict()
+        with self._lock:
+            self._conn.close()
+
+
+def add_cache_arguments(parser):
+    """--no-cache / --refresh / --cache-path, shared by the extraction scripts."""
+    parser.add_argument("--no-cache", action="store_true", help="Do not read or write the response cache.")
+    parser.add_argument("--refresh", action="store_true",
+                        help="Ignore cached responses but store fresh ones.")
+    parser.add_argument("--cache-path", default=DEFAULT_CACHE_PATH, help="SQLite response cache location.")
+
+
+def cache_from_args(args):
+    if args.no_cache:
+        return None
+    return ResponseCache(args.cache_path)
@@ -0,0 +1,118 @@
+# extract/canonical.py
+# Merge per-chunk / per-paper extraction results into one entity ID space.
+#
+# Entities are keyed by (canonical text, type) as produced by
+# extract.normalize.preprocess_entities, so the same concept extracted from
+# different chunks or papers gets one ID. IDs are handed out in the order
+# results are added, so feeding results in a fixed order gives stable IDs.
+#
+# With a `sink` (e.g. extract.artifact.ArtifactWriter.write), every new entity,
+# new (entity, paper) pairing, relationship and interaction is also emitted as
+# it is merged, so the combined output can be streamed instead of held.
+
+from extract.normalize import normalize_passage, preprocess_entities
+from extract.trace import span
+
+
+class Canonicalizer:
+    def __init__(self, index=None, sink=None):
+        self.index = index
+        self.sink = sink
+        self.entity_to_canonical_id = {}
+        self.entities = []
+        self.relationships = []
+        self.interactions = []
+        self.current_id = 1
+        self._relationship_keys = set()
+        self._interaction_keys = set()
+
+    def add(self, data: dict, source: str, chunk=None) -> list:
+        """
+        Merge one parsed extraction ({"entities", "relationships", "interactions"}).
+        Returns the relationships / interactions skipped for referencing unknown entities.
+        """
+        skipped = []
+
+        # canonicalize entities
+        local_id_to_canonical_id = {}
+        entities = data.get("entities") or []
+        with span("preprocess_entity") as s:
+            keys = preprocess_entities(entities, self.index)
+            s.add("rows", len(entities))
+        for entity, key in zip(entities, keys):
+            if key not in self.entity_to_canonical_id:
+                self.entity_to_canonical_id[key] = self.current_id
+                self.entities.append({
+                    "id": self.current_id,
+                    "text": entity["text"],
+                    "type": entity["type"],
+                    "code_system": entity.get("code_system"),
+                    "code": entity.get("code"),
+                    "sources": [source]
+                })
+                self.current_id += 1
+                self._emit("entity", {**self.entities[-1], "sources": [source]})
+            else:
+                known = self.entities[self.entity_to_canonical_id[key] - 1]
+                if source not in known["sources"]:
+                    known["sources"].append(source)
+                    self._emit("entity", {**known, "sources": [source]})
+            if entity.get("id") is not None:
+                local_id_to_canonical_id[entity["id"]] = self.entity_to_canonical_id[key]
+
+        # canonicalize relationships
+        for relationship in data.get("relationships") or []:
+            head = local_id_to_canonical_id.get(relationship.get("head"))
+            tail = local_id_to_canonical_id.get(relationship.get("tail"))
+            if not (head and tail):
+                skipped.append(relationship)
+                continue
+            evidence = normalize_passage(relationship.get("evidence"))
+            # the key includes evidence and source paper to preserve unique relationships
+            # with the same head/tail/type but different context
+            key = (head, tail, relationship.get("type"), evidence, source)
+            if key in self._relationship_keys:
+                continue
+            self._relationship_keys.add(key)
+            self.relationships.append({
+                "head": head,
+                "tail": tail,
+                "type": relationship.get("type"),
+                "evidence": evidence,
+                "source": source,
+                "chunk": chunk
+            })
+            self._emit("relationship", self.relationships[-1])
+
+        # canonicalize interactions (one per entity set, type and paper)
+        for interaction in data.get("interactions") or []:
+            ids = [local_id_to_canonical_id.get(i) for i in interaction.get("entity_ids") or []]
+            if len(ids) < 2 or not all(ids):
+                skipped.append(interaction)
+                continue
+            key = (tuple(sorted(set(ids))), interaction.get("interaction_type"), source)
+            if key in self._interaction_keys:
+                continue
+            self._interaction_keys.add(key)
+            self.interactions.append({
+                "id": len(self.interactions) + 1,
+                "entity_ids": ids,
+                "interaction_type": interaction.get("interaction_type"),
+                "note": interaction.get("note"),
+                "evidence": interaction.get("evidence"),
+                "source": source,
+                "chunk": chunk
+            })
+            self._emit("interaction", self.interactions[-1])
+
+        return skipped
+
+    def _emit(self, kind, record):
+        if self.sink is not None:
+            self.sink(kind, record)
+
+    def result(self) -> dict:
+        combined = {"entities": self.entities, "relationships": self.relationships}
+        if self.interactions:
+            combined["interactions"] = self.interactions
+        return combined
@@ -0,0 +1,172 @@
+# extract/chunking.py
+# Streaming, token-aware chunker.
+#
+# Text is read page by page (pages are separated by chr(12), the form feed our
+# PDF extractors emit), split into paragraphs and sentences, and packed greedily
+# into chunks that fit a token budget. Chunks only ever end on a sentence,
+# paragraph or page boundary, and consecutive chunks can share a few sentences
+# of overlap so relationships spanning a boundary are not lost.
+
+import os
+import re
+from collections import deque
+from functools import lru_cache
+
+PAGE_BREAK = chr(12)
+# gpt-4o-mini
+DEFAULT_CONTEXT_WINDOW = int(os.getenv("LLM_CONTEXT_WINDOW", "128000"))
+DEFAULT_MAX_OUTPUT_TOKENS = int(os.getenv("LLM_MAX_OUTPUT_TOKENS", "16000"))
+# large enough to make each call worthwhile, small enough that the model still
+# extracts thoroughly (the old 1,000-word chunks were ~1,300 tokens)
+DEFAULT_CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", "3000"))
+DEFAULT_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "150"))
+
+_PARAGRAPH_SPLIT = re.compile(r"\n\s*\n")
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+(?=[\"'(\[]?[A-Z0-9])")
+_WHITESPACE = re.compile(r"\s+")
+# what render() puts after a unit, by the boundary that follows it
+_SEPARATORS = {"sentence": " ", "paragraph": "\n\n", "page": "\n" + PAGE_BREAK + "\n"}
+
+
+@lru_cache(maxsize=1)
+def _encoder():
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Exact count with tiktoken when installed, otherwise ~4 characters per token."""
+    enc = _encoder()
+    if enc is not None:
+        return len(enc.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+def token_budget(prompt: str, context_window=DEFAULT_CONTEXT_WINDOW,
+                 max_output_tokens=DEFAULT_MAX_OUTPUT_TOKENS, target=DEFAULT_CHUNK_TOKENS) -> int:
+    """Tokens available for chunk text once the prompt and the reply are accounted for."""
+    available = context_window - count_tokens(prompt) - max_output_tokens
+    if available <= 0:
+        raise ValueError("Prompt leaves no room for chunk text in the context window")
+    return min(target, available)
+
+
+def iter_file_pages(path, encoding="utf-8", block_size=1 << 16):
+    """Yield the pages of a text file one at a time without reading the whole file."""
+    buffer = ""
+    with open(path, "r", encoding=encoding) as f:
+        for block in iter(lambda: f.read(block_size), ""):
+            buffer += block
+            *pages, buffer = buffer.split(PAGE_BREAK)
+            yield from pages
+    yield buffer
+
+
+def iter_text_pages(text: str):
+    return iter(text.split(PAGE_BREAK))
+
+
+def _split_word(word: str, max_tokens: int):
+    """A single word over budget (URLs, sequences, runs of table cells): cut into pieces that fit."""
+    while word:
+        size = len(word)
+        while size > 1 and count_tokens(word[:size]) > max_tokens:
+            size = max(1, min(size - 1, size * max_tokens // count_tokens(word[:size])))
+        yield word[:size]
+        word = word[size:]
+
+
+def _split_long(unit: str, max_tokens: int):
+    """
+    Last resort for a single sentence over budget (tables, reference lists,
+    unpunctuated text): split between words, counting tokens as pieces grow.
+    """
+    piece, piece_tokens = [], 0
+    for word in unit.split():
+        # a word's tokens include the space joining it to the previous one
+        t = count_tokens(" " + word)
+        if piece and piece_tokens + t > max_tokens:
+            yield " ".join(piece)
+            piece, piece_tokens = [], 0
+        if t > max_tokens:
+            yield from _split_word(word, max_tokens)
+            continue
+        piece.append(word)
+        piece_tokens += t
+    if piece:
+        yield " ".join(piece)
+
+
+def iter_units(pages, max_tokens):
+    """
+    Yield (text, tokens, boundary) units; boundary is "sentence", "paragraph" or "page"
+    and describes the break that follows the unit. `tokens` includes that break, so
+    the units of a chunk never add up to less than the rendered chunk.
+    """
+    separator_tokens = {boundary: count_tokens(sep) for boundary, sep in _SEPARATORS.items()}
+    # room for a sentence whatever break ends up following it
+    max_text_tokens = max(1, max_tokens - max(separator_tokens.values()))
+    for page in pages:
+        paragraphs = [p for p in _PARAGRAPH_SPLIT.split(page) if p.strip()]
+        for p_index, paragraph in enumerate(paragraphs):
+            paragraph = _WHITESPACE.sub(" ", paragraph).strip()
+            sentences = []
+            for sentence in _SENTENCE_SPLIT.split(paragraph):
+                t = count_tokens(sentence)
+                if t <= max_text_tokens:
+                    sentences.append((sentence, t))
+                else:
+                    sentences.extend((s, count_tokens(s)) for s in _split_long(sentence, max_text_tokens))
+            last_paragraph = p_index == len(paragraphs) - 1
+            for s_index, (sentence, t) in enumerate(sentences):
+                if s_index < len(sentences) - 1:
+                    boundary = "sentence"
+                else:
+                    boundary = "page" if last_paragraph else "paragraph"
+                yield sentence, t + separator_tokens[boundary], boundary
+
+
+def iter_chunks(pages, max_tokens=DEFAULT_CHUNK_TOKENS, overlap_tokens=DEFAULT_OVERLAP_TOKENS):
+    """
+    Greedily pack units into chunks of at most `max_tokens` tokens.
+
+    Only the current chunk (plus its overlap tail) is held in memory, so very
+    long documents stream through in constant memory. Paragraph units are
+    joined with blank lines and page units with a form feed, so the model still
+    sees the document's structure.
+    """
+    overlap_tokens = min(overlap_tokens, max_tokens // 2)
+    current = deque()  # (text, tokens, boundary)
+    current_tokens = 0
+    fresh = False  # does current hold anything beyond the carried-over overlap?
+
+    def render(units):
+        parts = []
+        for text, _, boundary in units:
+            parts.append(text)
+            parts.append(_SEPARATORS[boundary])
+        return "".join(parts[:-1])
+
+    for unit in iter_units(pages, max_tokens):
+        if current_tokens + unit[1] > max_tokens and fresh:
+            yield render(current)
+            # keep trailing sentences as overlap for the next chunk
+            tail, tail_tokens = deque(), 0
+            while current and tail_tokens + current[-1][1] <= overlap_tokens:
+                tail.appendleft(current.pop())
+                tail_tokens += tail[0][1]
+            current, current_tokens, fresh = tail, tail_tokens, False
+        while current and current_tokens + unit[1] > max_tokens:
+            current_tokens -= current.popleft()[1]
+        current.append(unit)
+        current_tokens += unit[1]
+        fresh = True
+
+    if fresh:
+        yield render(current)
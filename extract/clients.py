@@ -0,0 +1,40 @@
+# extract/clients.py
+# One OpenAI client per process (per key / endpoint), created on first use and
+# closed at exit.
+#
+# Importing openai costs most of a second, and each client keeps its own HTTP
+# connection pool, so scripts and long-lived workers share these instead of
+# building a client at import time: modules stay cheap to import and every
+# request reuses warm connections.
+
+import atexit
+import os
+import threading
+
+_lock = threading.Lock()
+_clients = {}
+
+
+def openai_client(api_key=None, base_url=None, max_retries=0):
+    """
+    The shared client for (api_key, base_url), defaulting to OPENAI_API_KEY /
+    OPENAI_BASE_URL. max_retries=0: retries are handled by extract.engine, so
+    429s can pause every worker at once.
+    """
+    key = (api_key or os.getenv("OPENAI_API_KEY"), base_url or os.getenv("OPENAI_BASE_URL"), max_retries)
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            from openai import OpenAI
+
+            client = _clients[key] = OpenAI(api_key=key[0], base_url=key[1], max_retries=max_retries)
+    return client
+
+
+@atexit.register
+def close_clients():
+    with _lock:
+        clients = list(_clients.values())
+        _clients.clear()
+    for client in clients:
+        client.close()
@@ -0,0 +1,393 @@
+# extract/dedup.py
+# Near-duplicate entity merging after extraction.
+#
+# Canonicalization (extract.canonical) only merges entities whose normalized
+# text is identical, so variants such as "response rate" / "response rates" or
+# "treatment-resistant patients" / "patients with treatment resistant
+# depression" survive as separate nodes. This stage finds them without
+# comparing every pair:
+#
+#   1. each entity becomes a set of stemmed word tokens (stopwords dropped);
+#      entities of one type with the same set are duplicates outright
+#   2. blocking: MinHash signatures over tokens + character trigrams, banded
+#      into LSH buckets per entity type; only entities sharing a bucket are
+#      candidates (oversized buckets pair each member with its next few)
+#   3. scoring, vectorized over all candidate pairs: IDF-weighted Jaccard of
+#      the token sets, so a differing rare word ("anxious") counts for more
+#      than a differing common one ("depression"). A pair is never merged when
+#      a word only one side has is at least as rare as a word both share (a qualifier:
+#      "anxious major depressive disorder"), when their numbers differ
+#      ("sertraline 50 mg" / "sertraline 100 mg") or when their codes conflict
+#   4. connected components of the accepted pairs, each checked against its
+#      representative (most connected entity) so chains cannot drift; members
+#      too far from it stay separate
+#
+# Merged entities keep the representative's id and text, the union of sources
+# and the other surface forms as "aliases". Relationship heads / tails and
+# interaction entity ids are rewritten, and relationships that became exact
+# duplicates or self-loops are dropped.
+#
+#   python -m extract.dedup combined-final-CHATGPT.json -o combined-dedup.json [--threshold 0.75]
+
+import argparse
+import re
+import time
+import zlib
+
+import numpy as np
+
+from extract.artifact import read_combined, write_combined
+from extract.normalize import canonical_text
+from extract.trace import span
+
+DEFAULT_THRESHOLD = 0.75
+NUM_PERM = 60
+BANDS, ROWS = 20, 3  # candidates at ~40% shingle overlap and up
+MAX_BUCKET = 200
+WINDOW = 20
+PAIR_BLOCK = 1 << 20
+
+STOPWORDS = frozenset({
+    "a", "an", "and", "at", "by", "for", "from", "in", "of", "on", "or", "the", "to", "vs", "versus", "with",
+})
+_TOKEN = re.compile(r"[a-z0-9]+")
+_DIGIT = re.compile(r"\d")
+
+
+def stem(token: str) -> str:
+    """Plural folding only: rates -> rate, therapies -> therapy (never "analysis", "nucleus")."""
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 3 and token.endswith("s") and not token.endswith(("ss", "us", "is")):
+        return token[:-1]
+    return token
+
+
+def entity_tokens(text) -> tuple:
+    """Sorted, distinct, stemmed tokens of an entity text (after canonical_text)."""
+    return tuple(sorted({stem(t) for t in _TOKEN.findall(canonical_text(text)) if t not in STOPWORDS}))
+
+
+def shingles(tokens) -> set:
+    joined = f" {' '.join(tokens)} "
+    return {*tokens, *(joined[i:i + 3] for i in range(len(joined) - 2))}
+
+
+def _ragged(ptr, rows):
+    """Positions of every element of CSR rows `rows` (concatenated), and each element's row number."""
+    lengths = ptr[rows + 1] - ptr[rows]
+    owner = np.repeat(np.arange(len(rows)), lengths)
+    offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return np.repeat(ptr[rows], lengths) + offsets, owner
+
+
+def minhash(ptr, values, num_perm=NUM_PERM, seed=1):
+    """(rows, num_perm) MinHash signatures of the CSR sets (ptr, values); every row must be non-empty."""
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, 1 << 63, num_perm, dtype=np.uint64) | np.uint64(1)
+    b = rng.integers(0, 1 << 63, num_perm, dtype=np.uint64)
+    out = np.empty((len(ptr) - 1, num_perm), dtype=np.uint32)
+    values = values.astype(np.uint64)
+    start = 0
+    budget = max(1, (1 << 23) // num_perm)  # shingles per block
+    with np.errstate(over="ignore"):
+        while start < len(ptr) - 1:
+            end = int(np.searchsorted(ptr, ptr[start] + budget, side="right")) - 1
+            end = max(end, start + 1)
+            block = values[ptr[start]:ptr[end]]
+            hashed = ((block[:, None] * a + b) >> np.uint64(32)).astype(np.uint32)  # multiply-shift hashing
+            out[start:end] = np.minimum.reduceat(hashed, ptr[start:end] - ptr[start], axis=0)
+            start = end
+    return out
+
+
+def lsh_pairs(signatures, groups, bands=BANDS, rows=ROWS, max_bucket=MAX_BUCKET, window=WINDOW):
+    """Candidate (i, j) pairs, i < j: rows of the same group sharing all `rows` values of some band."""
+    rng = np.random.default_rng(2)
+    mult = rng.integers(1, 1 << 63, rows, dtype=np.uint64) | np.uint64(1)
+    salt = groups.astype(np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+    found = []
+    with np.errstate(over="ignore"):
+        for band in range(bands):
+            cols = signatures[:, band * rows:(band + 1) * rows].astype(np.uint64)
+            keys = (cols * mult).sum(axis=1, dtype=np.uint64) ^ salt
+            order = np.argsort(keys, kind="stable")
+            sorted_keys = keys[order]
+            bounds = np.flatnonzero(np.diff(sorted_keys)) + 1
+            starts = np.concatenate([[0], bounds])
+            sizes = np.diff(np.concatenate([starts, [len(keys)]]))
+            for size in np.unique(sizes[(sizes > 1) & (sizes <= max_bucket)]):
+                run_starts = starts[sizes == size]
+                first, second = np.triu_indices(size, 1)
+                found.append((order[(run_starts[:, None] + first).ravel()],
+                              order[(run_starts[:, None] + second).ravel()]))
+            # oversized buckets: each member against the next `window` members only
+            big = sizes > max_bucket
+            if big.any():
+                positions, owner = _ragged(np.concatenate([starts, [len(keys)]]), np.flatnonzero(big))
+                ends = (starts + sizes)[np.flatnonzero(big)][owner]
+                for d in range(1, window + 1):
+                    ok = positions + d < ends
+                    found.append((order[positions[ok]], order[positions[ok] + d]))
+    if not found:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    i = np.concatenate([f[0] for f in found]).astype(np.int64)
+    j = np.concatenate([f[1] for f in found]).astype(np.int64)
+    lo, hi = np.minimum(i, j), np.maximum(i, j)
+    n = len(signatures)
+    keys = np.unique(lo * n + hi)
+    return keys // n, keys % n
+
+
+def pair_scores(left, right, ptr, tokens, weights, totals):
+    """
+    For each (left[k], right[k]) pair: the IDF-weighted Jaccard of their token
+    sets, and whether a word only one side has is rarer than some word both
+    share ("anxious major depressive disorder" vs "major depressive disorder":
+    a qualifier, not a variant).
+    """
+    scores = np.empty(len(left))
+    rare_extra = np.empty(len(left), dtype=bool)
+    vocabulary = np.int64(len(weights))
+    for start in range(0, len(left), PAIR_BLOCK):
+        l, r = left[start:start + PAIR_BLOCK], right[start:start + PAIR_BLOCK]
+        lpos, lpair = _ragged(ptr, l)
+        rpos, rpair = _ragged(ptr, r)
+        lkeys, rkeys = lpair * vocabulary + tokens[lpos], rpair * vocabulary + tokens[rpos]
+        shared = np.intersect1d(lkeys, rkeys, assume_unique=True)
+        inter = np.bincount(shared // vocabulary, weights=weights[shared % vocabulary], minlength=len(l))
+        union = totals[l] + totals[r] - inter
+        scores[start:start + len(l)] = np.divide(inter, union, out=np.zeros(len(l)), where=union > 0)
+
+        rarest_shared = np.full(len(l), np.inf)
+        np.minimum.at(rarest_shared, shared // vocabulary, weights[shared % vocabulary])
+        keys = np.concatenate([lkeys, rkeys])
+        only = keys[~np.isin(keys, shared, assume_unique=True)]
+        rarest_only = np.zeros(len(l))
+        np.maximum.at(rarest_only, only // vocabulary, weights[only % vocabulary])
+        rare_extra[start:start + len(l)] = rarest_only >= rarest_shared - 1e-9
+    return scores, rare_extra
+
+
+def _components(n, left, right):
+    """Connected-component label (smallest member index) per row."""
+    labels = np.arange(n)
+    if not len(left):
+        return labels
+    while True:
+        low = np.minimum(labels[left], labels[right])
+        before = labels.copy()
+        np.minimum.at(labels, left, low)
+        np.minimum.at(labels, right, low)
+        labels = labels[labels]
+        while not np.array_equal(labels, labels[labels]):
+            labels = labels[labels]
+        if np.array_equal(labels, before):
+            return labels
+
+
+def find_duplicates(entities, relationships=(), threshold=DEFAULT_THRESHOLD, **lsh) -> tuple:
+    """
+    ({entity id: representative id} for every entity merged into another, stats).
+    Relationships only decide which cluster member is the representative.
+    """
+    timings = {}
+    t0 = time.perf_counter()
+    n = len(entities)
+    token_sets = [entity_tokens(e.get("text")) for e in entities]
+    type_ids = {}
+    type_list = [type_ids.setdefault(e.get("type"), len(type_ids)) for e in entities]
+    types = np.array(type_list, dtype=np.int64)
+
+    # token CSR, IDF weights
+    vocab = {}
+    ptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum([len(t) for t in token_sets], out=ptr[1:])
+    tokens = np.fromiter((vocab.setdefault(t, len(vocab)) for ts in token_sets for t in ts),
+                         dtype=np.int64, count=int(ptr[-1]))
+    df = np.bincount(tokens, minlength=len(vocab))
+    weights = np.log((n + 1) / (df + 1)) + 1.0
+    totals = np.zeros(n)
+    nonempty = np.flatnonzero(np.diff(ptr) > 0)
+    totals[nonempty] = np.add.reduceat(weights[tokens], ptr[nonempty]) if len(tokens) else 0
+
+    digits = {}
+    numbers = np.fromiter((digits.setdefault(tuple(t for t in ts if _DIGIT.search(t)), len(digits))
+                           for ts in token_sets), dtype=np.int64, count=n)
+    codes = np.array([str(e.get("code")).strip().upper() if e.get("code") not in (None, "") else ""
+                      for e in entities], dtype=object)
+    timings["tokens"] = time.perf_counter() - t0
+
+    # identical token sets (per type) are duplicates without any scoring
+    t0 = time.perf_counter()
+    first_of = {}
+    same = np.fromiter((first_of.setdefault(key, k) for k, key in enumerate(zip(type_list, token_sets))),
+                       dtype=np.int64, count=n)
+    distinct = np.flatnonzero((same == np.arange(n)) & (np.diff(ptr) > 0))
+    exact = np.flatnonzero((same != np.arange(n)) & (np.diff(ptr) > 0))
+
+    # blocking over distinct token sets only
+    shingle_ids = {}
+    sets = [shingles(token_sets[k]) for k in distinct]
+    sptr = np.zeros(len(distinct) + 1, dtype=np.int64)
+    np.cumsum([len(s) for s in sets], out=sptr[1:])
+    svalues = np.fromiter((shingle_ids.setdefault(s, zlib.crc32(s.encode("utf-8"))) for ss in sets for s in ss),
+                          dtype=np.uint32, count=int(sptr[-1]))
+    signatures = minhash(sptr, svalues) if len(distinct) else np.zeros((0, NUM_PERM), dtype=np.uint32)
+    timings["minhash"] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    cand_l, cand_r = lsh_pairs(signatures, types[distinct], **lsh)
+    cand_l, cand_r = distinct[cand_l], distinct[cand_r]
+    timings["blocking"] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    scores, rare_extra = pair_scores(cand_l, cand_r, ptr, tokens, weights, totals)
+    compatible = ~rare_extra & (numbers[cand_l] == numbers[cand_r]) & (
+        (codes[cand_l] == "") | (codes[cand_r] == "") | (codes[cand_l] == codes[cand_r]))
+    accepted = (scores >= threshold) & compatible
+    left = np.concatenate([exact, cand_l[accepted]])
+    right = np.concatenate([same[exact], cand_r[accepted]])
+    timings["scoring"] = time.perf_counter() - t0
+
+    # components, then every member checked against its representative
+    t0 = time.perf_counter()
+    labels = _components(n, left, right)
+    degree = np.zeros(n, dtype=np.int64)
+    index_of = {e["id"]: k for k, e in enumerate(entities)}
+    ends = [index_of.get(end) for rel in relationships for end in (rel.get("head"), rel.get("tail"))]
+    ends = np.array([k for k in ends if k is not None], dtype=np.int64)
+    if len(ends):
+        degree += np.bincount(ends, minlength=n)
+    sources = np.fromiter((len(e.get("sources") or []) for e in entities), dtype=np.int64, count=n)
+    order = np.lexsort((np.arange(n), -sources, -degree))  # most connected first
+    _, first = np.unique(labels[order], return_index=True)
+    rep_of_label = dict(zip(labels[order][first].tolist(), order[first].tolist()))
+    reps = np.fromiter((rep_of_label[x] for x in labels.tolist()), dtype=np.int64, count=n)
+    members = np.flatnonzero(reps != np.arange(n))
+    scores, rare_extra = pair_scores(members, reps[members], ptr, tokens, weights, totals)
+    close = (scores >= threshold) & ~rare_extra
+    close |= same[members] == same[reps[members]]
+    close &= (numbers[members] == numbers[reps[members]]) & (
+        (codes[members] == "") | (codes[reps[members]] == "") | (codes[members] == codes[reps[members]]))
+    merged = members[close]
+    timings["clustering"] = time.perf_counter() - t0
+
+    mapping = {entities[k]["id"]: entities[reps[k]]["id"] for k in merged.tolist()}
+    stats = {
+        "entities": n,
+        "exact_duplicates": len(exact),
+        "candidate_pairs": len(cand_l),
+        "accepted_pairs": int(accepted.sum()),
+        "clusters": len(set(reps[merged].tolist())),
+        "merged": len(merged),
+        "kept_apart": len(members) - len(merged),
+        "seconds": timings,
+    }
+    return mapping, stats
+
+
+def apply_merges(combined: dict, mapping: dict) -> tuple:
+    """New combined dict with merged entities folded into their representatives; also returns dropped counts."""
+    entities = combined.get("entities") or []
+    by_id = {e["id"]: e for e in entities}
+    out_entities = {}
+    for ent in entities:
+        rep = mapping.get(ent["id"], ent["id"])
+        if rep not in out_entities:
+            out_entities[rep] = {**by_id[rep], "sources": list(by_id[rep].get("sources") or [])}
+        if rep == ent["id"]:
+            continue
+        target = out_entities[rep]
+        for source in ent.get("sources") or []:
+            if source not in target["sources"]:
+                target["sources"].append(source)
+        if ent.get("text") != target.get("text") and ent.get("text") not in target.setdefault("aliases", []):
+            target["aliases"].append(ent.get("text"))
+        if target.get("code") is None and ent.get("code") is not None:
+            target["code_system"], target["code"] = ent.get("code_system"), ent.get("code")
+    for ent in out_entities.values():
+        if not ent.get("sources"):
+            del ent["sources"]
+
+    dropped = {"self_loops": 0, "duplicate_relationships": 0, "duplicate_interactions": 0}
+    relationships, seen = [], set()
+    for rel in combined.get("relationships") or []:
+        head, tail = mapping.get(rel.get("head"), rel.get("head")), mapping.get(rel.get("tail"), rel.get("tail"))
+        if head == tail and rel.get("head") != rel.get("tail"):
+            dropped["self_loops"] += 1
+            continue
+        key = (head, tail, rel.get("type"), rel.get("evidence"), rel.get("source"))
+        if key in seen:
+            dropped["duplicate_relationships"] += 1
+            continue
+        seen.add(key)
+        relationships.append({**rel, "head": head, "tail": tail})
+
+    result = {"entities": list(out_entities.values()), "relationships": relationships}
+    if combined.get("interactions"):
+        interactions, seen = [], set()
+        for interaction in combined["interactions"]:
+            ids = list(dict.fromkeys(mapping.get(i, i) for i in interaction.get("entity_ids") or []))
+            key = (tuple(sorted(ids, key=str)), interaction.get("interaction_type"), interaction.get("source"))
+            if len(ids) < 2 or key in seen:
+                dropped["duplicate_interactions"] += 1
+                continue
+            seen.add(key)
+            interactions.append({**interaction, "entity_ids": ids})
+        result["interactions"] = interactions
+    return result, dropped
+
+
+def dedup(combined: dict, threshold=DEFAULT_THRESHOLD) -> tuple:
+    """(deduplicated combined dict, report dict)."""
+    with span("dedup") as s:
+        mapping, stats = find_duplicates(combined.get("entities") or [], combined.get("relationships") or [],
+                                         threshold)
+        result, dropped = apply_merges(combined, mapping)
+        s.add("rows", stats["entities"])
+        s.add("merged", stats["merged"])
+    stats.update(dropped)
+    examples = {}
+    for ent in result["entities"]:
+        if ent.get("aliases"):
+            examples[ent["text"]] = ent["aliases"]
+    stats["examples"] = dict(sorted(examples.items(), key=lambda kv: -len(kv[1]))[:10])
+    return result, stats
+
+
+def summary(stats: dict) -> str:
+    seconds = ", ".join(f"{k} {v:.2f}s" for k, v in stats["seconds"].items())
+    lines = [
+        f"Dedup: {stats['merged']} of {stats['entities']} entities merged into {stats['clusters']} clusters "
+        f"({stats['exact_duplicates']} identical token sets, {stats['accepted_pairs']} of "
+        f"{stats['candidate_pairs']} candidate pairs accepted, {stats['kept_apart']} kept apart)",
+        f"  relationships dropped: {stats['self_loops']} self-loops, {stats['duplicate_relationships']} duplicates; "
+        f"{stats['duplicate_interactions']} interactions dropped",
+        f"  {seconds}",
+    ]
+    for text, aliases in stats.get("examples", {}).items():
+        lines.append(f"  {text!r} <- {', '.join(repr(a) for a in aliases[:5])}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Merge near-duplicate entities in a combined extraction.")
+    parser.add_argument("input", help="Combined extraction (.json or .ndjson).")
+    parser.add_argument("-o", "--output", help="Where to write the result (default: print the report only).")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Minimum IDF-weighted token Jaccard to merge two entities.")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    combined = read_combined(args.input)
+    result, stats = dedup(combined, args.threshold)
+    print(summary(stats))
+    if args.output:
+        write_combined(result, args.output)
+        print(f"Wrote {len(result['entities'])} entities, {len(result['relationships'])} relationships "
+              f"to {args.output} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+# extract/engine.py
+# Concurrent chunk extraction with a bounded number of in-flight LLM requests
+
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from extract.cache import cache_key
+from extract.clients import openai_client
+from extract.tokens import cost, usage_counts
+from extract.trace import span
+
+# status codes worth retrying: rate limits, timeouts and transient server errors
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+@dataclass
+class ChunkJob:
+    """One completion request, tagged with its position in the corpus."""
+    file_index: int
+    chunk_index: int
+    messages: list
+    meta: dict = field(default_factory=dict)
+
+
+@dataclass
+class ChunkResult:
+    job: ChunkJob
+    content: str | None = None
+    error: Exception | None = None
+    attempts: int = 0
+    usage: dict | None = None
+    cached: bool = False
+
+
+def _status_code(exc):
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    return status
+
+
+def _retry_after(exc):
+    """Seconds the server asked us to wait, if it said so."""
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    value = headers.get("retry-after") or headers.get("Retry-After")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def is_retryable(exc) -> bool:
+    status = _status_code(exc)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    # connection errors and timeouts from the SDK carry no status code
+    name = type(exc).__name__
+    return name in ("APIConnectionError", "APITimeoutError", "TimeoutError", "ConnectionError")
+
+
+class ExtractionEngine:
+    """
+    Runs chat completions on a thread pool.
+
+    - at most `max_concurrency` requests are in flight at once
+    - retryable failures back off exponentially (with jitter); a 429 pauses
+      every worker, not just the one that hit it, honoring Retry-After
+    - results are yielded in job order, so callers that assign IDs while
+      merging get the same IDs on every run regardless of completion order
+    - with a ResponseCache, identical requests are answered from disk;
+      `refresh=True` skips lookups but still stores fresh answers
+    - with a `response_format` (extract.schema.response_format()), every
+      request asks for structured output matching the schema
+    """
+
+    def __init__(self, client=None, model="gpt-4o-mini", temperature=0.2,
+                 max_concurrency=4, max_retries=5, base_delay=1.0, max_delay=60.0,
+                 cache=None, refresh=False, response_format=None):
+        self._client = client
+        self.response_format = response_format
+        self.cache = cache
+        self.refresh = refresh
+        self.model = model
+        self.temperature = temperature
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+        self._paused_until = 0.0
+
+    @property
+    def client(self):
+        """The OpenAI client; without one, the shared extract.clients client, created on the first request."""
+        if self._client is None:
+            self._client = openai_client()
+        return self._client
+
+    @client.setter
+    def client(self, client):
+        self._client = client
+
+    def _wait_for_cooldown(self):
+        while True:
+            with self._lock:
+                delay = self._paused_until - time.monotonic()
+            if delay <= 0:
+                return
+            time.sleep(delay)
+
+    def _cool_down(self, seconds):
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def _backoff(self, attempt, exc):
+        delay = _retry_after(exc)
+        if delay is None:
+            delay = min(self.max_delay, self.base_delay * (2 ** attempt))
+            delay *= 0.5 + random.random() / 2
+        if _status_code(exc) == 429:
+            self._cool_down(delay)
+        return delay
+
+    def create(self, messages, **kwargs):
+        """Single completion call with retries; returns (response, attempts)."""
+        attempt = 0
+        while True:
+            self._wait_for_cooldown()
+            try:
+                response = self.client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    temperature=self.temperature,
+                    **kwargs,
+                )
+                return response, attempt + 1
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e):
+                    e.attempts = attempt + 1
+                    raise
+                time.sleep(self._backoff(attempt, e))
+                attempt += 1
+
+    def call(self, messages, **kwargs):
+        """Cached completion call; returns (content, usage, attempts, cached)."""
+        if self.response_format is not None:
+            kwargs.setdefault("response_format", self.response_format)
+        with span("completion", model=self.model) as s:
+            key = None
+            if self.cache is not None:
+                key = cache_key(self.model, self.temperature, messages, **kwargs)
+                if not self.refresh:
+                    hit = self.cache.get(key)
+                    if hit is not None:
+                        s.add("cache_hits")
+                        return hit[0], hit[1], 0, True
+            try:
+                response, attempts = self.create(messages, **kwargs)
+            except Exception as e:
+                s.add("retries", getattr(e, "attempts", 1) - 1)
+                raise
+            content = response.choices[0].message.content or ""
+            usage = getattr(response, "usage", None)
+            usage = usage.model_dump() if hasattr(usage, "model_dump") else usage
+            prompt, cached, completion = usage_counts(usage)
+            s.add("retries", attempts - 1)
+            s.add("prompt_tokens", prompt)
+            s.add("cached_tokens", cached)
+            s.add("completion_tokens", completion)
+            s.add("cost_usd", cost(self.model, usage))
+            if key is not None:
+                self.cache.put(key, content, usage)
+            return content, usage, attempts, False
+
+    def complete(self, messages, **kwargs) -> str:
+        """Single completion call with retries; returns the message text."""
+        return self.call(messages, **kwargs)[0]
+
+    def _run_job(self, job):
+        try:
+            content, usage, attempts, cached = self.call(job.messages)
+        except Exception as e:
+            return ChunkResult(job, error=e, attempts=getattr(e, "attempts", 1))
+        return ChunkResult(job, content=content, attempts=attempts, usage=usage, cached=cached)
+
+    def imap(self, jobs):
+        """
+        Yield a ChunkResult per job, in job order.
+
+        Jobs are pulled lazily and only a small window beyond the concurrency
+        cap is queued, so an arbitrarily long job stream uses bounded memory.
+        """
+        window = self.max_concurrency * 2
+        pending = deque()
+        jobs = iter(jobs)
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as pool:
+            for job in jobs:
+                pending.append(pool.submit(self._run_job, job))
+                if len(pending) >= window:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    def run(self, jobs) -> list:
+        return list(self.imap(jobs))
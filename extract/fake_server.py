@@ -0,0 +1,240 @@
+# extract/fake_server.py
+# Local OpenAI-compatible stub for exercising the extraction engine offline.
+#
+# Run standalone:
+#   python -m extract.fake_server --port 8001 --latency 0.5 --fail-rate 0.1 --rate-limit-rate 0.05
+# then point the pipeline at it:
+#   OPENAI_BASE_URL=http://127.0.0.1:8001/v1 OPENAI_API_KEY=fake python gemini.py
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# terms the stub "recognizes" so each chunk gets a slightly different answer
+KNOWN_TERMS = {
+    "sertraline": "medication",
+    "fluoxetine": "medication",
+    "escitalopram": "medication",
+    "bupropion": "medication",
+    "venlafaxine": "medication",
+    "ssris": "medication",
+    "depression": "medical_condition",
+    "major depressive disorder": "medical_condition",
+    "anxious depression": "medical_condition",
+    "anxiety": "medical_condition",
+    "cognitive behavioral therapy": "treatment_type",
+    "electroconvulsive therapy": "treatment_type",
+    "remission": "outcome",
+    "response rate": "outcome",
+    "hamilton depression rating scale": "measure",
+}
+
+
+def canned_extraction(prompt: str) -> dict:
+    """Build a small, deterministic extraction answer for a prompt."""
+    text = prompt.lower()
+    entities = []
+    for term, etype in KNOWN_TERMS.items():
+        if re.search(r"\b" + re.escape(term) + r"\b", text):
+            entities.append({"id": len(entities) + 1, "text": term, "type": etype,
+                             "code_system": None, "code": None})
+    relationships = []
+    conditions = [e for e in entities if e["type"] == "medical_condition"]
+    for e in entities:
+        if e["type"] in ("medication", "treatment_type") and conditions:
+            relationships.append({"head": e["id"], "tail": conditions[0]["id"], "type": "treats",
+                                  "evidence": f"{e['text']} treats {conditions[0]['text']}"})
+    return {"entities": entities, "relationships": relationships}
+
+
+_SECTION = re.compile(r'<section id="([^"]+)">\n(.*?)\n</section>', re.S)
+_CHUNK_HEADER = re.compile(r"Text section \d+ of file \d+:")
+
+
+def canned_answer(text: str) -> dict:
+    """
+    canned_extraction over the chunk text only (after gemini.py's "Text section"
+    header, so examples in inline instructions don't count), or one entry per
+    <section> for packed requests (extract.packing).
+    """
+    sections = _SECTION.findall(text)
+    if not sections:
+        header = None
+        for header in _CHUNK_HEADER.finditer(text):
+            pass
+        return canned_extraction(text[header.end():] if header else text)
+    return {"sections": [{"section_id": sid, **canned_extraction(body)} for sid, body in sections]}
+
+
+class FakeOpenAIServer:
+    """
+    Threaded HTTP server answering POST /v1/chat/completions.
+
+    latency:         seconds to sleep per request (simulates a slow provider)
+    fail_rate:       fraction of requests answered with HTTP 500
+    rate_limit_rate: fraction answered with HTTP 429 and a Retry-After header
+    response_text:   fixed completion text; defaults to canned_answer()
+    prefix_cache_min: like provider prompt caching, a request whose system message
+                     (+ response_format) was seen before reports that prefix as
+                     cached_tokens, in 128-token steps, once it is this long
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, fail_rate=0.0,
+                 rate_limit_rate=0.0, retry_after=0.1, response_text=None, seed=None, prefix_cache_min=1024):
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.response_text = response_text
+        self.prefix_cache_min = prefix_cache_min
+        self._prefixes = set()
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "ok": 0, "failed": 0, "rate_limited": 0, "in_flight": 0, "max_in_flight": 0}
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, body, headers=None):
+                payload = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for k, v in (headers or {}).items():
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length) or b"{}")
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    return self._send(404, {"error": {"message": "not found"}})
+                server._enter()
+                try:
+                    status, body, headers = server._answer(request)
+                finally:
+                    server._leave()
+                self._send(status, body, headers)
+
+        return Handler
+
+    def _enter(self):
+        with self.lock:
+            self.stats["requests"] += 1
+            self.stats["in_flight"] += 1
+            self.stats["max_in_flight"] = max(self.stats["max_in_flight"], self.stats["in_flight"])
+
+    def _leave(self):
+        with self.lock:
+            self.stats["in_flight"] -= 1
+
+    def _answer(self, request):
+        if self.latency:
+            time.sleep(self.latency)
+        with self.lock:
+            roll = self.random.random()
+        if roll < self.rate_limit_rate:
+            with self.lock:
+                self.stats["rate_limited"] += 1
+            return 429, {"error": {"message": "Rate limit reached", "type": "rate_limit_error"}}, \
+                {"Retry-After": str(self.retry_after)}
+        if roll < self.rate_limit_rate + self.fail_rate:
+            with self.lock:
+                self.stats["failed"] += 1
+            return 500, {"error": {"message": "Internal server error", "type": "server_error"}}, None
+
+        messages = request.get("messages", [])
+        prompt = "\n".join(str(m.get("content", "")) for m in messages)
+        content = self.response_text
+        if content is None:
+            user = "\n".join(str(m.get("content", "")) for m in messages if m.get("role") != "system")
+            content = json.dumps(canned_answer(user))
+        schema = json.dumps(request["response_format"]) if request.get("response_format") else ""
+        prompt_tokens = (len(prompt) + len(schema)) // 4
+        completion_tokens = len(content) // 4
+
+        # prompt caching: a system message (+ schema) seen before is reported as a cached prefix
+        prefix = None
+        if messages and messages[0].get("role") == "system":
+            prefix = schema + str(messages[0].get("content", ""))
+        cached_tokens = 0
+        with self.lock:
+            self.stats["ok"] += 1
+            if prefix is not None:
+                if prefix in self._prefixes and len(prefix) // 4 >= self.prefix_cache_min:
+                    cached_tokens = len(prefix) // 4 // 128 * 128
+                self._prefixes.add(prefix)
+        return 200, {
+            "id": "chatcmpl-fake",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "fake"),
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": content}}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens,
+                      "prompt_tokens_details": {"cached_tokens": cached_tokens}},
+        }, None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a fake OpenAI chat completions API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds per request.")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Fraction of HTTP 500 answers.")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of HTTP 429 answers.")
+    parser.add_argument("--retry-after", type=float, default=0.1, help="Retry-After seconds on 429.")
+    parser.add_argument("--response-file", help="Serve this file's contents as every completion.")
+    args = parser.parse_args()
+
+    response_text = None
+    if args.response_file:
+        with open(args.response_file, "r", encoding="utf-8") as f:
+            response_text = f.read()
+
+    server = FakeOpenAIServer(args.host, args.port, args.latency, args.fail_rate,
+                              args.rate_limit_rate, args.retry_after, response_text)
+    print(f"Fake OpenAI server listening on {server.base_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(json.dumps(server.stats))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,300 @@
+# extract/interactions.py
+# Deterministic pairwise interactions between medications and therapies.
+#
+# Instead of asking the model to cross-reference every medication / therapy
+# pair (O(n^2) output tokens per paper), each entity is looked up in a property
+# table (interaction_properties.tsv) and turned into a bitmask; every rule is
+# then checked against all pairs at once with numpy. The model is only asked
+# for interactions the paper itself reports, with a quote as evidence.
+#
+#   python -m extract.interactions validated_interactions.json
+
+import argparse
+import csv
+import json
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+
+import numpy as np
+
+from extract.normalize import normalize_text
+from extract.schema import INTERACTION_TYPES
+from extract.synonyms import default_index, strip_salts
+
+DEFAULT_PROPERTIES = os.getenv(
+    "INTERACTION_PROPERTIES", os.path.join(os.path.dirname(__file__), "interaction_properties.tsv")
+)
+
+# entity types the rules apply to
+INTERACTING_TYPES = ("medication", "treatment_type")
+
+PROPERTIES = [
+    "serotonergic", "noradrenergic", "maoi", "stimulant",
+    "lowers_seizure_threshold", "raises_seizure_threshold", "induces_seizures",
+    "cyp2d6_inhibitor", "cyp2d6_substrate", "cyp1a2_inhibitor", "cyp1a2_substrate",
+    "cyp2c19_inhibitor", "cyp2c19_substrate", "cyp3a4_inhibitor", "cyp3a4_substrate",
+    "sedating", "anticholinergic", "qt_prolonging", "cardiovascular",
+    "learning_based", "requires_alertness", "directive", "nondirective", "brain_stimulation",
+]
+BIT = {name: 1 << i for i, name in enumerate(PROPERTIES)}
+
+# drug classes usable in the property table as shorthand
+CLASSES = {
+    "ssri": {"serotonergic"},
+    "snri": {"serotonergic", "noradrenergic"},
+    "tca": {"serotonergic", "noradrenergic", "sedating", "anticholinergic", "lowers_seizure_threshold", "qt_prolonging"},
+    "maoi": {"maoi", "serotonergic", "noradrenergic"},
+    "benzodiazepine": {"sedating", "raises_seizure_threshold"},
+    "z_drug": {"sedating"},
+}
+# the class entities themselves (canonical names, as in the property table):
+# "SSRIs" next to "sertraline" is a class and its own member, not a drug pair
+CLASS_NAMES = {
+    "ssri": "selective serotonin reuptake inhibitors",
+    "snri": "serotonin-norepinephrine reuptake inhibitors",
+    "tca": "tricyclic antidepressants",
+    "maoi": "monoamine oxidase inhibitors",
+    "benzodiazepine": "benzodiazepines",
+    "z_drug": "z-drugs",
+}
+
+CAUTION, CONTRAINDICATED = INTERACTION_TYPES
+
+
+@dataclass(frozen=True)
+class Rule:
+    """Fires for a pair when one entity has any of `left` and the other any of `right`."""
+    name: str
+    category: str
+    left: tuple
+    right: tuple
+    interaction_type: str
+    mechanism: str
+
+
+RULES = [
+    # category A: pharmacologic clashes
+    Rule("maoi_serotonergic", "A", ("maoi",), ("serotonergic",), CONTRAINDICATED,
+         "serotonin syndrome with MAO inhibition"),
+    Rule("maoi_noradrenergic", "A", ("maoi",), ("noradrenergic", "stimulant"), CONTRAINDICATED,
+         "hypertensive crisis with MAO inhibition"),
+    Rule("serotonergic", "A", ("serotonergic",), ("serotonergic",), CAUTION,
+         "additive serotonergic effects (serotonin syndrome risk)"),
+    Rule("seizure_threshold", "A", ("lowers_seizure_threshold",), ("lowers_seizure_threshold",), CAUTION,
+         "additive lowering of the seizure threshold"),
+    Rule("cyp2d6", "A", ("cyp2d6_inhibitor",), ("cyp2d6_substrate",), CAUTION,
+         "CYP2D6 inhibition raising substrate levels"),
+    Rule("cyp1a2", "A", ("cyp1a2_inhibitor",), ("cyp1a2_substrate",), CAUTION,
+         "CYP1A2 inhibition raising substrate levels"),
+    Rule("cyp2c19", "A", ("cyp2c19_inhibitor",), ("cyp2c19_substrate",), CAUTION,
+         "CYP2C19 inhibition raising substrate levels"),
+    Rule("cyp3a4", "A", ("cyp3a4_inhibitor",), ("cyp3a4_substrate",), CAUTION,
+         "CYP3A4 inhibition raising substrate levels"),
+    Rule("sedation", "A", ("sedating",), ("sedating",), CAUTION,
+         "additive sedation / CNS depression"),
+    # category B: therapeutic friction
+    Rule("learning_interference", "B", ("sedating",), ("learning_based",), CAUTION,
+         "sedation impairing emotional learning and habituation in psychotherapy"),
+    Rule("alertness_clash", "B", ("sedating",), ("requires_alertness",), CAUTION,
+         "sedating medication during a therapy that requires an alert state"),
+    Rule("conflicting_modalities", "B", ("directive",), ("nondirective",), CAUTION,
+         "conflicting instructions from directive and non-directive therapies"),
+    Rule("somatic_overload", "B", ("brain_stimulation",), ("brain_stimulation",), CAUTION,
+         "concurrent brain stimulation with an unknown combined safety profile"),
+    Rule("seizure_therapy_blunted", "B", ("induces_seizures",), ("raises_seizure_threshold",), CAUTION,
+         "raised seizure threshold reducing seizure therapy efficacy"),
+    Rule("seizure_therapy_prolonged", "B", ("induces_seizures",), ("lowers_seizure_threshold",), CAUTION,
+         "prolonged or spontaneous seizures during seizure therapy"),
+    # category C: physiological burden
+    Rule("anticholinergic_load", "C", ("anticholinergic",), ("anticholinergic",), CAUTION,
+         "cumulative anticholinergic burden"),
+    Rule("qt_prolongation", "C", ("qt_prolonging",), ("qt_prolonging",), CAUTION,
+         "additive QT prolongation"),
+    Rule("stimulant_cardiovascular", "C", ("stimulant",), ("cardiovascular", "stimulant"), CAUTION,
+         "stimulant effects on heart rate and blood pressure"),
+]
+
+
+def mask(names) -> int:
+    bits = 0
+    for name in names:
+        bits |= BIT[name]
+    return bits
+
+
+def parse_properties(field) -> int:
+    bits = 0
+    for name in (p.strip() for p in field.split(",")):
+        if not name:
+            continue
+        if name in CLASSES:
+            bits |= mask(CLASSES[name])
+        elif name in BIT:
+            bits |= BIT[name]
+        else:
+            raise ValueError(f"unknown interaction property: {name!r}")
+    return bits
+
+
+def table_key(text) -> str:
+    return strip_salts(normalize_text(text or ""))
+
+
+class InteractionRules:
+    """
+    Property table + rule set. `pair_rules` is the vectorized core: for n
+    entities it builds one n x n matrix of fired-rule bitmasks, with one numpy
+    outer product per rule over the distinct property sets rather than a
+    Python loop per pair.
+
+    `classes` maps a table row to the drug classes it was listed with; pairs of
+    the same drug (brand and generic) or of a class and its own member are not
+    reported.
+    """
+
+    def __init__(self, table=None, rules=RULES, index=None, classes=None):
+        self.table = table or {}
+        self.rules = list(rules)
+        self.index = index
+        self.classes = classes or {}
+        self._class_rows = {table_key(name): cls for cls, name in CLASS_NAMES.items()}
+        self._left = np.array([mask(r.left) for r in self.rules], dtype=np.uint64)
+        self._right = np.array([mask(r.right) for r in self.rules], dtype=np.uint64)
+        self._contraindicated = np.uint64(
+            sum(1 << i for i, r in enumerate(self.rules) if r.interaction_type == CONTRAINDICATED)
+        )
+
+    @classmethod
+    def from_tsv(cls, path, **kwargs):
+        table, classes = {}, {}
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            for row in csv.reader(f, delimiter="\t"):
+                if not row or row[0].startswith("#") or len(row) < 2:
+                    continue
+                key = table_key(row[0])
+                table[key] = parse_properties(row[1])
+                classes[key] = frozenset(p.strip() for p in row[1].split(",") if p.strip() in CLASSES)
+        return cls(table, classes=classes, **kwargs)
+
+    def key(self, text) -> str | None:
+        """The table row an entity text resolves to (via the synonym index when one is set), None if unknown."""
+        key = table_key(text)
+        if key not in self.table and self.index is not None:
+            canonical = self.index.resolve(normalize_text(text or ""))
+            key = strip_salts(canonical) if canonical else None
+        return key if key in self.table else None
+
+    def lookup(self, text) -> int:
+        """Property bits for an entity text, 0 if unknown."""
+        key = self.key(text)
+        return self.table[key] if key is not None else 0
+
+    def same_drug(self, a, b) -> bool:
+        """Do table rows a and b name one drug, or a class and one of its members?"""
+        if a is None or b is None:
+            return False
+        if a == b:
+            return True
+        return (self._class_rows.get(a) in self.classes.get(b, ())
+                or self._class_rows.get(b) in self.classes.get(a, ()))
+
+    def properties(self, entities) -> np.ndarray:
+        return np.array([self.lookup(e.get("text")) if e.get("type") in INTERACTING_TYPES else 0
+                         for e in entities], dtype=np.uint64)
+
+    def pair_rules(self, props: np.ndarray) -> np.ndarray:
+        """n x n upper-triangular matrix; bit k of [i, j] is set when rule k fires for (i, j)."""
+        # entities share a handful of distinct property sets (every SSRI looks alike),
+        # so evaluate the rules between distinct sets and gather the n x n result
+        distinct, inverse = np.unique(props, return_inverse=True)
+        m = len(distinct)
+        fired = np.zeros((m, m), dtype=np.uint64)
+        for k, (left, right) in enumerate(zip(self._left, self._right)):
+            a = (distinct & left) != 0
+            b = (distinct & right) != 0
+            if not (a.any() and b.any()):
+                continue
+            hit = np.outer(a, b)
+            hit |= hit.T
+            fired[hit] |= np.uint64(1 << k)
+        return np.triu(fired[np.ix_(inverse, inverse)], 1)
+
+    def interactions(self, entities, start_id=1) -> list:
+        """Computed interactions in the extraction output format, in (i, j) entity order."""
+        props = self.properties(entities)
+        active = np.flatnonzero(props)  # only entities with known properties can interact
+        if len(active) < 2:
+            return []
+        fired = self.pair_rules(props[active])
+        rows, cols = np.nonzero(fired)
+        keys = [self.key(entities[i].get("text")) for i in active]
+        out = []
+        for i, j, bits in zip(rows.tolist(), cols.tolist(), fired[rows, cols].tolist()):
+            if self.same_drug(keys[i], keys[j]):
+                continue
+            a, b = entities[active[i]], entities[active[j]]
+            rules = [r for k, r in enumerate(self.rules) if bits >> k & 1]
+            mechanisms = "; ".join(r.mechanism for r in rules)
+            out.append({
+                "id": start_id + len(out),
+                "entity_ids": [a["id"], b["id"]],
+                "interaction_type": CONTRAINDICATED if bits & int(self._contraindicated) else CAUTION,
+                "note": f"{a['text']} + {b['text']}: {mechanisms}.",
+                "evidence": f"Standard clinical knowledge regarding {mechanisms}.",
+                "rules": [r.name for r in rules],
+                "categories": sorted({r.category for r in rules}),
+            })
+        return out
+
+
+@lru_cache(maxsize=None)
+def default_rules(path=DEFAULT_PROPERTIES) -> InteractionRules:
+    """The bundled property table (or $INTERACTION_PROPERTIES), with the default synonym index."""
+    return InteractionRules.from_tsv(path, index=default_index())
+
+
+def add_rule_interactions(result: dict, rules=None) -> dict:
+    """
+    Append computed interactions to an extraction result ({"entities", ..., "interactions"}).
+    Pairs the model already reported from the text keep the model's entry (text-grounded
+    evidence) and are tagged with the rules that also fire for them.
+    """
+    rules = rules or default_rules()
+    reported = result.get("interactions") or []
+    by_pair = {}
+    for interaction in reported:
+        by_pair.setdefault(frozenset(interaction.get("entity_ids") or []), interaction)
+    merged = list(reported)
+    next_id = max((i.get("id") or 0 for i in reported), default=0) + 1
+    for computed in rules.interactions(result.get("entities") or [], start_id=next_id):
+        known = by_pair.get(frozenset(computed["entity_ids"]))
+        if known is not None:
+            known["rules"] = computed["rules"]
+            continue
+        computed["id"] = next_id
+        next_id += 1
+        merged.append(computed)
+    result["interactions"] = merged
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compute rule-based interactions for an extraction result.")
+    parser.add_argument("path", help="Extraction JSON with an entities list.")
+    parser.add_argument("-o", "--output", help="Write the result here (default: print a summary).")
+    parser.add_argument("--properties", default=DEFAULT_PROPERTIES, help="Property table (TSV).")
+    args = parser.parse_args()
+
+    with open(args.path, "r", encoding="utf-8") as f:
+        result = json.load(f)
+    reported = len(result.get("interactions") or [])
+    add_rule_interactions(result, default_rules(args.properties))
+    print(f"{reported} reported + {len(result['interactions']) - reported} computed interactions")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+# extract/journal.py
+# Append-only per-chunk progress journal (JSONL) for resumable extraction runs.
+#
+# Every chunk whose response parsed is appended as one line:
+#   {"key", "source", "file", "chunk", "next_id", "data"}
+# where key identifies the request (model, temperature, prompt and chunk text,
+# as in extract.cache) and next_id, when the caller merges as it goes, is the
+# canonical ID counter after merging that chunk. Records parsed from a repaired or
+# truncated response (extract.response) also carry "parse": "repaired" / "salvaged".
+# A packed request (extract.packing) is one record whose "parts" list holds the
+# {"source", "file", "chunk", "data"} of each chunk it carried.
+# A restarted run replays journaled chunks in order instead of re-sending them,
+# and compaction rebuilds the combined output from the journal alone.
+#
+#   python -m extract.journal combined-final-CHATGPT.journal.jsonl -o combined-final-CHATGPT.json
+
+import argparse
+import json
+import os
+from itertools import tee
+
+from extract.artifact import write_combined
+from extract.cache import cache_key
+from extract.canonical import Canonicalizer
+from extract.engine import ChunkResult
+from extract.synonyms import DEFAULT_VOCABULARY, default_index
+
+
+def journal_path_for(output_path) -> str:
+    return os.path.splitext(output_path)[0] + ".journal.jsonl"
+
+
+def record_parts(record) -> list:
+    """The per-chunk entries of a journal record (a packed record has several)."""
+    return record.get("parts") or [record]
+
+
+def job_key(engine, job) -> str:
+    key = job.meta.get("journal_key")
+    if key is None:
+        key = job.meta["journal_key"] = cache_key(engine.model, engine.temperature, job.messages)
+    return key
+
+
+class ChunkJournal:
+    """Journaled chunk records keyed by request, loaded once and appended to as chunks finish."""
+
+    def __init__(self, path):
+        self.path = path
+        self.records = {}
+        self.replayed = 0
+        self.appended = 0
+        self.load()
+        self._f = open(path, "a", encoding="utf-8")
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        good = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    break
+                self.records[record["key"]] = record  # a later record for the same request wins
+                good += len(line)
+        if good < os.path.getsize(self.path):
+            # torn last line from a crash mid-write; drop it so new records append cleanly
+            os.truncate(self.path, good)
+
+    def __len__(self):
+        return len(self.records)
+
+    def append(self, record):
+        self._f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._f.flush()
+        os.fsync(self._f.fileno())
+        self.records[record["key"]] = record
+        self.appended += 1
+
+    def resume(self, engine, jobs):
+        """
+        Yield (job, record, result) for every job, in job order.
+
+        Jobs already in the journal come back with their record and no result;
+        only the others are sent to engine.imap, and come back with a ChunkResult
+        for the caller to parse and append(). A request repeated within the run
+        (identical chunks) is sent once and replayed from its first occurrence;
+        if that one failed, the repeat gets the same error.
+        """
+        sent = set()  # keys sent in this run
+
+        def decide():
+            # one decision per job, made before imap prefetches it and read back by the
+            # consumer: deciding twice disagrees once a record lands in between
+            for job in jobs:
+                key = job_key(engine, job)
+                job.meta["replay"] = key in self.records or key in sent
+                if not job.meta["replay"]:
+                    sent.add(key)
+                yield job
+
+        jobs_out, pending = tee(decide())
+        results = engine.imap(job for job in pending if not job.meta["replay"])
+        for job in jobs_out:
+            if not job.meta["replay"]:
+                yield job, None, next(results)
+                continue
+            record = self.records.get(job_key(engine, job))
+            if record is not None:
+                self.replayed += 1
+                yield job, record, None
+            else:
+                yield job, None, ChunkResult(job, error=RuntimeError("identical chunk failed earlier in this run"))
+
+    def compact(self, keys=None) -> list:
+        """
+        Rewrite the journal with one record per chunk and return the records in order.
+
+        With `keys` (the current run's requests, in job order) records for chunks
+        no longer in the input are dropped; without, the latest record for each
+        (source, chunk) is kept in journal order.
+        """
+        if keys is not None:
+            records = [self.records[k] for k in dict.fromkeys(keys) if k in self.records]
+        else:
+            latest = {}
+            for record in self.records.values():
+                chunks = tuple((part["source"], part["chunk"]) for part in record_parts(record))
+                latest.pop(chunks, None)
+                latest[chunks] = record
+            records = list(latest.values())
+        self._f.close()
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self.records = {r["key"]: r for r in records}
+        self._f = open(self.path, "a", encoding="utf-8")
+        return records
+
+    def close(self):
+        self._f.close()
+
+
+def merge_records(records, index=None) -> dict:
+    """Replay journaled chunks through one Canonicalizer; the same records always give the same IDs."""
+    canonicalizer = Canonicalizer(index)
+    for record in records:
+        for part in record_parts(record):
+            canonicalizer.add(part["data"], part["source"], part["chunk"])
+    return canonicalizer.result()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compact an extraction journal and rebuild the combined output.")
+    parser.add_argument("journal", help="Journal file (e.g. combined-final-CHATGPT.journal.jsonl).")
+    parser.add_argument("-o", "--output", default="combined-final-CHATGPT.json", help=".json or .ndjson output.")
+    parser.add_argument("--vocabulary", default=DEFAULT_VOCABULARY)
+    args = parser.parse_args()
+
+    journal = ChunkJournal(args.journal)
+    before = os.path.getsize(args.journal)
+    records = journal.compact()
+    journal.close()
+    result = merge_records(records, default_index(args.vocabulary))
+    write_combined(result, args.output)
+    print(f"{len(records)} chunks ({before:,} -> {os.path.getsize(args.journal):,} bytes): "
+          f"{len(result['entities'])} entities, {len(result['relationships'])} relationships -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
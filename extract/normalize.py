@@ -0,0 +1,106 @@
+# extract/normalize.py
+# Entity text normalization and canonicalization used for deduplication.
+#
+# The rules are the ones gemini.py has always applied, compiled once into two
+# combined patterns; entity surface forms repeat thousands of times across a
+# corpus, so normalize_text() is memoized.
+
+import re
+from functools import lru_cache
+
+# canonical map for common acronyms and major synonyms.
+# all keys and values must be run through normalize_text first for consistency
+CANONICAL_MAP = {
+    "ssris": "selective serotonin reuptake inhibitors",
+    "tcasa": "tricyclic antidepressants",
+    "vns": "vagus nerve stimulation",
+    "dbs": "deep brain stimulation",
+    "ect": "electroconvulsive therapy",
+    "cbt": "cognitive behavioral therapy", # Simplified CBT
+    "ip": "interpersonal therapy", # Assuming IP is Interpersonal Psychotherapy
+    "maois": "monoamine oxidase inhibitors"
+    }
+
+# Each pass runs only when its trigger substring is present, so most entity texts
+# skip straight to whitespace collapsing. Pass order matches the original
+# sequence of re.sub calls, so results are identical.
+_PARENTHETICAL = re.compile(r"\s*\([^)]*\)")
+_DROP_PASSES = [
+    (("sr", "xr", "release"), re.compile(r"[-\s]sr|[-\s]xr|sustained[-\s]release|extended[-\s]release")),
+    (("quick",), re.compile(r"quick\s+")),
+    (("self",), re.compile(r"self[-\s]report")),
+]
+# "... rating scale" -> "... scale", and the Hamilton scale collapses to its short name
+_REWRITE = re.compile(r"(?P<hamd>hamilton\s+depression\s+(?:rating\s+)?scale)|rating\s+scale")
+
+
+def _rewrite(match):
+    return "hamilton depression" if match.group("hamd") else "scale"
+
+
+def normalize_passage(s):
+    """Uncached normalization, for one-off strings such as relationship evidence."""
+    if not isinstance(s, str):
+        return ""
+    s = s.strip().lower().replace("\n", " ")
+    if "(" in s:
+        s = _PARENTHETICAL.sub("", s).strip()
+    for triggers, pattern in _DROP_PASSES:
+        if any(t in s for t in triggers):
+            s = pattern.sub("", s)
+    if "scale" in s:
+        s = _REWRITE.sub(_rewrite, s)
+    return " ".join(s.split())
+
+
+@lru_cache(maxsize=1 << 16)
+def _normalize_cached(s):
+    return normalize_passage(s)
+
+
+def normalize_text(s):
+    """Memoized normalization for entity texts and types (heavily repeated)."""
+    if not isinstance(s, str):
+        return ""
+    return _normalize_cached(s)
+
+
+def normalize_many(texts) -> list:
+    """Normalize a batch, computing each distinct string once."""
+    distinct = {t: normalize_text(t) for t in dict.fromkeys(t for t in texts if isinstance(t, str))}
+    return [distinct.get(t, "") if isinstance(t, str) else "" for t in texts]
+
+
+def canonical_text(raw_text):
+    normalized = normalize_text(raw_text)
+    return CANONICAL_MAP.get(normalized, normalized)
+
+
+# preprocess for deduplication
+def preprocess_entity(entity):
+    return canonical_text(entity.get("text")), normalize_text(entity.get("type"))
+
+
+def preprocess_entities(entities, index=None) -> list:
+    """
+    Batch form of preprocess_entity: one (canonical_text, type) key per entity.
+
+    With a synonym index (extract.synonyms), brand names, salt forms, codes and
+    near-miss spellings resolve to the vocabulary's canonical name first.
+    """
+    texts = normalize_many([e.get("text") for e in entities])
+    types = normalize_many([e.get("type") for e in entities])
+    keys = []
+    for entity, t, ty in zip(entities, texts, types):
+        canonical = index.resolve(t, entity.get("code_system"), entity.get("code")) if index else None
+        keys.append((canonical or CANONICAL_MAP.get(t, t), ty))
+    return keys
+
+
+def preprocess_relationship(relationship):
+    return (
+        relationship.get("head"),
+        relationship.get("tail"),
+        normalize_text(relationship.get("type")),
+        normalize_passage(relationship.get("evidence"))
+    )
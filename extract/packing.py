@@ -0,0 +1,74 @@
+# extract/packing.py
+# Request layout for chunk extraction.
+#
+# The static instructions go in the system message, byte-identical on every
+# request, so provider-side prompt caching can reuse them as a shared prefix;
+# the user message carries only the chunk. Optionally several small chunks
+# (short papers, abstracts, the tail of a paper) are packed into one request:
+#
+#   <section id="3-1">
+#   ...chunk text...
+#   </section>
+#
+# and the model answers {"sections": [{"section_id": "3-1", "entities": [...], ...}]}
+# (extract.schema.json_schema(packed=True)), which unpack() splits back into
+# one result per chunk.
+
+from extract.chunking import count_tokens
+
+PACKED_INSTRUCTIONS = """
+The text arrives as one or more sections, each wrapped in <section id="..."> ... </section>.
+Extract from every section separately and return one entry per section:
+{"sections": [{"section_id": "<id>", "entities": [...], "relationships": [...]}, ...]}
+Entity ids only need to be unique within a section, and relationships may only
+connect entities of the same section.
+"""
+
+
+def section_id(file_index, chunk_index) -> str:
+    return f"{file_index}-{chunk_index}"
+
+
+def system_prefix(instructions: str, packed=False) -> str:
+    return instructions + PACKED_INSTRUCTIONS if packed else instructions
+
+
+def chunk_messages(prefix: str, text: str) -> list:
+    return [{"role": "system", "content": prefix}, {"role": "user", "content": text}]
+
+
+def section_text(parts) -> str:
+    """parts: (section id, chunk text) pairs."""
+    return "\n\n".join(f'<section id="{sid}">\n{text}\n</section>' for sid, text in parts)
+
+
+def pack(chunks, budget, max_parts):
+    """
+    Group consecutive chunks into requests of at most `max_parts` chunks and
+    `budget` tokens of text. chunks: (file_index, chunk_index, source, text)
+    tuples, consumed lazily; yields lists of them. A chunk that fills the
+    budget on its own is always sent alone.
+    """
+    group, used = [], 0
+    for chunk in chunks:
+        tokens = count_tokens(chunk[3])
+        if group and (len(group) >= max_parts or used + tokens > budget):
+            yield group
+            group, used = [], 0
+        group.append(chunk)
+        used += tokens
+    if group:
+        yield group
+
+
+def unpack(data: dict, ids) -> dict:
+    """{section id: result} for the requested ids found in a packed response (unknown ids are ignored)."""
+    wanted = set(ids)
+    out = {}
+    for section in data.get("sections") or []:
+        if not isinstance(section, dict):
+            continue
+        sid = str(section.get("section_id", "")).strip()
+        if sid in wanted and sid not in out:
+            out[sid] = {k: v for k, v in section.items() if k != "section_id"}
+    return out
@@ -0,0 +1,185 @@
+# extract/pdf_ingest.py
+# PDF -> text ingestion with pluggable backends (pymupdf, pdfplumber, pypdf).
+#
+# Converts a whole directory on a process pool, streams page text straight to
+# disk (pages separated by chr(12), the form feed our extractors have always used)
+# and skips PDFs whose content hash already has a text file from the same backend.
+#
+#   python -m extract.pdf_ingest Research-papers-txt/ -o texts/ --backend pymupdf --workers 4
+
+import argparse
+import glob
+import hashlib
+import os
+import pathlib
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+from extract.trace import record
+
+PAGE_BREAK = chr(12)  # form feed between pages
+DEFAULT_BACKEND = os.getenv("PDF_BACKEND", "pymupdf")
+
+
+# backends: each yields the text of one page at a time; imports are local so
+# only the backend actually used has to be installed
+def _pymupdf_pages(pdf_path):
+    import pymupdf
+    with pymupdf.open(pdf_path) as doc:
+        for page in doc:
+            yield page.get_text()
+
+
+def _pdfplumber_pages(pdf_path):
+    import pdfplumber
+    with pdfplumber.open(pdf_path) as pdf:
+        for page in pdf.pages:
+            yield page.extract_text() or ""
+            page.flush_cache()
+
+
+def _pypdf_pages(pdf_path):
+    from pypdf import PdfReader
+    reader = PdfReader(pdf_path)
+    for page in reader.pages:
+        yield page.extract_text() or ""
+
+
+BACKENDS = {
+    "pymupdf": _pymupdf_pages,
+    "pdfplumber": _pdfplumber_pages,
+    "pypdf": _pypdf_pages,
+}
+
+
+def iter_pages(pdf_path, backend=DEFAULT_BACKEND):
+    """Yield page texts one at a time with the chosen backend."""
+    try:
+        pages = BACKENDS[backend]
+    except KeyError:
+        raise ValueError(f"Unknown PDF backend {backend!r}; choose from {', '.join(BACKENDS)}") from None
+    return pages(pdf_path)
+
+
+def write_pages(pages, txt_path) -> int:
+    """Stream pages to txt_path (atomically, via a temp file); returns the page count."""
+    tmp_path = f"{txt_path}.part"
+    count = 0
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for text in pages:
+                if count:
+                    f.write(PAGE_BREAK)
+                f.write(text)
+                count += 1
+        os.replace(tmp_path, txt_path)
+    except BaseException:
+        # a backend that fails halfway (or an interrupt) leaves no partial file behind
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return count
+
+
+def file_digest(path, length=16) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()[:length]
+
+
+def existing_output(out_dir, digest, backend):
+    # backends extract different text, so a conversion only counts for the backend that made it
+    matches = glob.glob(os.path.join(glob.escape(out_dir), f"*.{digest}.{backend}.txt"))
+    return matches[0] if matches else None
+
+
+@dataclass
+class IngestResult:
+    pdf_path: str
+    txt_path: str
+    pages: int = 0
+    seconds: float = 0.0
+    skipped: bool = False
+    error: str | None = None
+
+
+def convert_pdf(pdf_path, out_dir, backend=DEFAULT_BACKEND, force=False) -> IngestResult:
+    """
+    Convert one PDF to <out_dir>/<stem>.<content hash>.<backend>.txt unless that hash
+    is already converted with this backend.
+    """
+    digest = file_digest(pdf_path)
+    done = existing_output(out_dir, digest, backend)
+    if done and not force:
+        return IngestResult(pdf_path, done, skipped=True)
+
+    txt_path = os.path.join(out_dir, f"{pathlib.Path(pdf_path).stem}.{digest}.{backend}.txt")
+    start = time.perf_counter()
+    try:
+        pages = write_pages(iter_pages(pdf_path, backend), txt_path)
+    except Exception as e:
+        return IngestResult(pdf_path, txt_path, error=f"{type(e).__name__}: {e}")
+    return IngestResult(pdf_path, txt_path, pages, time.perf_counter() - start)
+
+
+def find_pdfs(src_dir):
+    return sorted(str(p) for p in pathlib.Path(src_dir).rglob("*") if p.suffix.lower() == ".pdf")
+
+
+def convert_directory(src_dir, out_dir, backend=DEFAULT_BACKEND, workers=None, force=False):
+    """Convert every PDF under src_dir on a process pool; yields IngestResults in path order."""
+    return convert_many(find_pdfs(src_dir), out_dir, backend, workers, force)
+
+
+def _traced(result, backend) -> IngestResult:
+    # conversions run in worker processes, so the span is recorded from the result
+    if not result.skipped:
+        record("pdf_to_text", result.seconds, error=result.error,
+               paper=os.path.basename(result.pdf_path), backend=backend, pages=result.pages)
+    return result
+
+
+def convert_many(pdfs, out_dir, backend=DEFAULT_BACKEND, workers=None, force=False):
+    """Convert a list of PDFs on a process pool; yields IngestResults in input order."""
+    os.makedirs(out_dir, exist_ok=True)
+    pdfs = list(pdfs)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(pdfs) <= 1:
+        for pdf in pdfs:
+            yield _traced(convert_pdf(pdf, out_dir, backend, force), backend)
+        return
+    with ProcessPoolExecutor(max_workers=min(workers, len(pdfs))) as pool:
+        futures = [pool.submit(convert_pdf, pdf, out_dir, backend, force) for pdf in pdfs]
+        for future in futures:
+            yield _traced(future.result(), backend)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert a directory of PDFs to text files.")
+    parser.add_argument("src", help="PDF file or directory of PDFs.")
+    parser.add_argument("-o", "--output", default="texts", help="Output directory (default: texts/).")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default=DEFAULT_BACKEND)
+    parser.add_argument("--workers", type=int, default=None, help="Processes (default: CPU count).")
+    parser.add_argument("--force", action="store_true", help="Re-convert even if the content hash exists for this backend.")
+    args = parser.parse_args()
+
+    if os.path.isfile(args.src):
+        os.makedirs(args.output, exist_ok=True)
+        results = [convert_pdf(args.src, args.output, args.backend, args.force)]
+    else:
+        results = convert_directory(args.src, args.output, args.backend, args.workers, args.force)
+
+    for r in results:
+        if r.error:
+            print(f"FAILED  {r.pdf_path}: {r.error}")
+        elif r.skipped:
+            print(f"skipped {r.pdf_path} (already converted: {r.txt_path})")
+        else:
+            print(f"wrote   {r.txt_path} ({r.pages} pages, {r.seconds:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,14 @@
 # extract/prompt.py
-# System prompt for entity + relationship extraction (JSON only)
+# System prompt for entity + relationship extraction (JSON only).
+# Type lists, coding rules and the output structure come from extract.schema.
+#
+# EXTRACT_INSTRUCTIONS is sent together with schema.response_format(), which
+# enforces the output structure; EXTRACT_PROMPT spells the structure out for
+# models / endpoints without structured outputs.
 
-EXTRACT_PROMPT = """
+from extract.schema import coding_rule_lines, entity_type_lines, output_example, relationship_type_lines
+
+EXTRACT_INSTRUCTIONS = f"""
 You are an information extraction system for clinical mental health research text.
 Your goal is to extract **entities and relationships specifically related to depression and anxiety**.
 Focus on meaningful medical, clinical, and treatment information that contributes to understanding
@@ -11,64 +18,30 @@ Do not extract generic or isolated numeric values (e.g., “10”, “5 mg”, 
 clearly part of a quantitative result directly describing an **outcome**, **treatment**, or **measure**.
 Ignore standalone numbers, sample sizes, and statistical values without context.
 
-Return **valid JSON only**.
-
 Entities to Extract (focus on depression/anxiety context):
-- medical_condition: a disorder or subtype related to depression or anxiety
-  (e.g., “major depressive disorder”, “generalized anxiety disorder”, “anxious depression”)
-- medication: a specific drug or class used to treat depression or anxiety
-   (e.g., “sertraline”, “SSRIs”, “benzodiazepines”)
-- treatment_type: a non-drug therapy for depression or anxiety
-   (e.g., “cognitive behavioral therapy”, “electroconvulsive therapy”)
-- outcome: a measurable result relevant to depression or anxiety
-  (e.g., “remission”, “response rate”, “treatment efficacy”, “symptom reduction”)
-- patient_group: a participant group related to depression or anxiety studies
-   (e.g., “adolescents with MDD”, “anxious outpatients”, “treatment-resistant patients”)
-- study: a study design or named trial involving depression or anxiety
-  (e.g., “randomized controlled trial”, “STAR*D”)
-- measure: a clinical assessment or rating scale related to depression or anxiety
- (e.g., “Hamilton Depression Rating Scale (HDRS)”, “Beck Anxiety Inventory”)
-- dosage: medication dosage info linked to depression/anxiety treatment
-- quantitative_result: **only include numeric results that describe outcomes or measures**
- (e.g., “65% remission”, “p = 0.03”, “n = 120”)
+{entity_type_lines()}
  → Do NOT extract standalone numbers, doses, or p-values without a clear outcome link.
 
 Text Consistency Rule: For entities that have both a full name and a common abbreviation (e.g., "Hamilton Depression Rating Scale (HDRS)"), prefer to output **only the full name** in the `text` field unless the source text only provides the abbreviation. **Do not include the abbreviation in parentheses** in the entity `text` field.
 
 Terminology Coding Rules:
 For every extracted entity, you must attempt to identify the corresponding standard clinical code.
-1.  **If the entity is a medication** (type: `medication` or `dosage`), set `code_system` to **"RXNORM"** and provide the RxNorm Concept Unique Identifier (CUI).
-2.  **If the entity is a medical condition** (type: `medical_condition`), set `code_system` to **"ICD-10"** and provide the relevant ICD-10 code. (Prefer codes related to MDD/Anxiety like F33.x).
-3.  **If the entity is a measure** (type: `measure`), set `code_system` to **"LOINC"** and provide the LOINC code.
-4.  **If the entity is a treatment_type** (e.g., ECT) or a procedure, set `code_system` to **"CPT"** and provide the CPT code.
-5.  If you cannot find a definitive, standard code, set both `code_system` and `code` to **null**. Do not invent codes.
+{coding_rule_lines()}
 
 Relationships to Extract:
-- treats: medication/treatment_type → medical_condition
-- has_outcome: medication/treatment_type/patient_group → outcome
-- affects: patient_group → outcome
-- compares: study → ≥2 medication/treatment_type
-- has_dosage: medication → dosage
-- measured_by: outcome → measure
-- reports: outcome/medication/treatment_type → quantitative_result
+{relationship_type_lines()}
 
 Output Instructions:
 1. Extract **only information directly tied to depression or anxiety**.
 2. Do **not** output entities or relationships unrelated to these topics.
 3. Do **not** include standalone numbers, values, or statistical terms as entities.
 4. Include the **supporting text** for each relationship in the `evidence` field.
-5. Return a JSON object with this structure:
+"""
+
+EXTRACT_PROMPT = EXTRACT_INSTRUCTIONS + f"""5. Return **valid JSON only**, a JSON object with this structure:
 
-{
-  "entities": [
-    {"id": 1, "text": "Entity A", "type": "Type1", "code_system": "RXNORM", "code": "8600"},
-    {"id": 2, "text": "Entity B", "type": "Type2", "code_system": null, "code": null} 
-  ],
-  "relationships": [
-    {"head": 1, "tail": 2, "type": "relates_to", "evidence": "Supporting text"}
-  ]
-}
+{output_example()}
 
 If no relevant entities or relationships are found, return:
-{"entities": [], "relationships": []}
+{{"entities": [], "relationships": []}}
 """
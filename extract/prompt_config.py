@@ -1,34 +1,21 @@
 # extract/prompt_config.py
-# System prompt for entity + relationship extraction (JSON only)
+# System prompt for entity + relationship extraction (JSON only).
+# Type lists and the output structure come from extract.schema.
 
-EXTRACTION_PROMPT = """
-You are an information extraction system. Your task is to identify and extract key entities and the relationships between them from clinical research text. Focus only on what is 
+from extract.schema import entity_type_lines, output_example, relationship_type_lines
+
+EXTRACTION_PROMPT = f"""
+You are an information extraction system. Your task is to identify and extract key entities and the relationships between them from clinical research text. Focus only on what is
 explicitly stated in the text. Do not infer or add extra information. The final output must be valid JSON and nothing else.
 
 Entities to Extract:
-- medical_condition: a mental health disorder or subtype (e.g., “major depressive disorder”, “anxious depression”)
-- medication: a specific drug or class of drugs (e.g., “sertraline”, “SSRIs”)
-- treatment_type: a non-drug treatment or therapy (e.g., “psychotherapy”, “electroconvulsive therapy”)
-- outcome: a measurable result (e.g., “efficacy”, “remission”, “side effects”, “dropout”)
-- patient_group: a group with shared traits (e.g., “adolescents”, “outpatients”, “anxious patients”)
-- study: a trial type or named study (e.g., “STAR*D”, “randomized controlled trial”)
-- measure: a clinical scale/metric (e.g., “Hamilton Depression Rating Scale (HDRS)”)
-- dosage: medication dosage info
+{entity_type_lines()}
 
 Relationships to Extract:
-- treats: medication/treatment_type → medical_condition
-- has_outcome: medication/treatment_type/patient_group → outcome
-- compares: study → ≥2 medication/treatment_type
-- affects: patient_group → outcome
-- has_dosage: medication → dosage
-- measured_by: outcome → measure
+{relationship_type_lines()}
 
 Output format:
 Return ONLY a single JSON object:
-{
-  "entities": [ { "id": int, "text": string, "type": string }, ... ],
-  "relationships": [ { "head": int, "tail": int, "type": string, "evidence": string }, ... ]
-}
-If nothing found, return: {"entities": [], "relationships": []}
+{output_example(codes=False)}
+If nothing found, return: {{"entities": [], "relationships": []}}
 """
-
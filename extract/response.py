@@ -0,0 +1,161 @@
+# extract/response.py
+# Turning a model response into an extraction dict.
+#
+# Fast path: drop markdown fences and any prose around the outermost object, then
+# parse it whole (orjson when installed, json otherwise). If that fails, a cheap
+# repair pass (trailing commas, // and /* */ comments, raw newlines in strings) is
+# tried; if that fails too - typically a response cut off at max_tokens - a
+# tolerant scan walks the "entities", "relationships" and "interactions" arrays
+# and keeps every complete object, dropping only the partial one at the cut.
+#
+#   result = parse_response(text)
+#   result.data      -> dict, or None when nothing could be recovered
+#   result.status    -> "ok" | "repaired" | "salvaged" | "failed"
+#   result.salvaged  -> {"entities": n, ...} objects recovered by the scan
+
+import json
+import re
+from dataclasses import dataclass, field
+
+try:
+    import orjson
+except ImportError:  # optional; the stdlib parser gives the same results, only slower
+    orjson = None
+
+JSON_BACKEND = "orjson" if orjson is not None else "json"
+_loads = orjson.loads if orjson is not None else json.loads
+
+SECTIONS = ("entities", "relationships", "interactions")
+STATUSES = ("ok", "repaired", "salvaged", "failed")
+
+# strict=False accepts raw control characters (newlines, tabs) inside strings
+_decoder = json.JSONDecoder(strict=False)
+
+# strings are matched (and kept) first so commas and slashes inside them are left alone
+_REPAIR = re.compile(r'("[^"\\]*(?:\\.[^"\\]*)*")|//[^\n]*|/\*.*?\*/|,(?=\s*[}\]])', re.S)
+_REPAIR_HINT = re.compile(r'/[/*]|,\s*[}\]]')
+_SECTION = re.compile(r'(?<!\\)"(' + "|".join(SECTIONS) + r')"\s*:\s*\[')
+_SKIP = re.compile(r'(?:\s|,|//[^\n]*|/\*.*?\*/)*', re.S)
+# an unterminated string runs to the end of the text (the response was cut inside it)
+_BRACES = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*(?:"|\Z)|[{}]', re.S)
+
+
+@dataclass
+class ParseResult:
+    data: dict | None
+    status: str
+    salvaged: dict = field(default_factory=dict)  # section -> complete objects kept by the scan
+    dropped: int = 0  # incomplete or malformed objects the scan skipped
+    error: str | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.data is not None
+
+
+def strip_wrapping(text: str) -> str:
+    """The response from its first "{" on: fences and leading prose removed, trailing text kept."""
+    start = text.find("{")
+    return text[start:] if start >= 0 else text.strip()
+
+
+def _outermost(text: str) -> str:
+    end = text.rfind("}")
+    return text[:end + 1] if end >= 0 else text
+
+
+def repair(text: str) -> str:
+    """Remove comments and trailing commas outside strings."""
+    if not _REPAIR_HINT.search(text):
+        return text
+    return _REPAIR.sub(r"\1", text)
+
+
+def _object_end(text: str, pos: int):
+    """Index just past the object opening at text[pos], or None if the text ends inside it."""
+    depth = 0
+    for m in _BRACES.finditer(text, pos):
+        token = m.group(0)
+        if token == "{":
+            depth += 1
+        elif token == "}":
+            depth -= 1
+            if depth == 0:
+                return m.end()
+    return None
+
+
+def salvage(text: str) -> ParseResult:
+    """Recover every complete object from the known arrays of a broken response."""
+    data, counts, dropped = {}, {}, 0
+    for m in _SECTION.finditer(text):
+        section = m.group(1)
+        items = data.setdefault(section, [])
+        pos = m.end()
+        while True:
+            pos = _SKIP.match(text, pos).end()
+            if pos >= len(text) or text[pos] != "{":
+                break  # end of the array, end of the text, or something we can't read
+            try:
+                obj, pos = _decoder.raw_decode(text, pos)
+            except ValueError:
+                end = _object_end(text, pos)
+                if end is None:
+                    dropped += 1  # cut off mid-object
+                    break
+                try:
+                    obj = _decoder.decode(repair(text[pos:end]))
+                except ValueError:
+                    obj = None
+                pos = end
+            if isinstance(obj, dict):
+                items.append(obj)
+            else:
+                dropped += 1
+        counts[section] = len(items)
+    if not data:
+        return ParseResult(None, "failed", error="no entities / relationships / interactions array found")
+    return ParseResult(data, "salvaged", salvaged=counts, dropped=dropped)
+
+
+def parse_response(text) -> ParseResult:
+    """Parse a model response, recovering what it can; never raises on bad input."""
+    if not isinstance(text, str) or not text.strip():
+        return ParseResult(None, "failed", error="empty response")
+    body = strip_wrapping(text)
+    whole = _outermost(body)
+    try:
+        data = _loads(whole)
+        status = "ok"
+    except ValueError:
+        try:
+            data = _decoder.decode(repair(whole))
+            status = "repaired"
+        except ValueError:
+            return salvage(body)
+    if not isinstance(data, dict):
+        return ParseResult(None, "failed", error=f"expected a JSON object, got {type(data).__name__}")
+    return ParseResult(data, status)
+
+
+class ParseStats:
+    """Running totals over many responses, for the end-of-run report."""
+
+    def __init__(self):
+        self.counts = dict.fromkeys(STATUSES, 0)
+        self.salvaged = dict.fromkeys(SECTIONS, 0)
+        self.dropped = 0
+
+    def add(self, result: ParseResult) -> ParseResult:
+        self.counts[result.status] += 1
+        for section, n in result.salvaged.items():
+            self.salvaged[section] += n
+        self.dropped += result.dropped
+        return result
+
+    def summary(self) -> str:
+        line = "Responses: " + ", ".join(f"{n} {status}" for status, n in self.counts.items())
+        if self.counts["salvaged"]:
+            line += (" (salvaged " + ", ".join(f"{n} {s}" for s, n in self.salvaged.items() if n)
+                     + f"; {self.dropped} partial objects dropped)")
+        return line
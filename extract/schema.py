@@ -0,0 +1,363 @@
+# extract/schema.py
+# The one definition of what extraction produces: entity types, relationship
+# types, code systems and interaction fields.
+#
+# Everything else is generated from it: the prompt sections in extract.prompt,
+# extract.prompt_config and chatgpt_extraction.py, the JSON schema sent as the
+# structured-output response_format, the response validator, and the graph
+# loader's label set (graph.schema) - so none of them can drift apart.
+#
+#   python -m extract.schema [--interactions] [--no-codes]   # print the JSON schema
+
+import argparse
+import json
+import re
+from collections import Counter
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class EntityType:
+    name: str
+    description: str
+    examples: tuple = ()
+    code_system: str | None = None  # terminology the model should code this type in
+
+
+@dataclass(frozen=True)
+class RelationshipType:
+    name: str
+    head: tuple  # entity types allowed at each end (documentation for the model)
+    tail: tuple
+    many: bool = False  # the head links to two or more tails
+
+
+CODE_SYSTEMS = {
+    "RXNORM": "the RxNorm Concept Unique Identifier (CUI)",
+    "ICD-10": "the relevant ICD-10 code (prefer codes related to MDD/Anxiety like F33.x)",
+    "LOINC": "the LOINC code",
+    "CPT": "the CPT code",
+}
+
+ENTITIES = [
+    EntityType("medical_condition", "a disorder or subtype related to depression or anxiety",
+               ("major depressive disorder", "generalized anxiety disorder", "anxious depression"), "ICD-10"),
+    EntityType("medication", "a specific drug or class used to treat depression or anxiety",
+               ("sertraline", "SSRIs", "benzodiazepines"), "RXNORM"),
+    EntityType("treatment_type", "a non-drug therapy for depression or anxiety",
+               ("cognitive behavioral therapy", "electroconvulsive therapy"), "CPT"),
+    EntityType("outcome", "a measurable result relevant to depression or anxiety",
+               ("remission", "response rate", "treatment efficacy", "symptom reduction")),
+    EntityType("patient_group", "a participant group related to depression or anxiety studies",
+               ("adolescents with MDD", "anxious outpatients", "treatment-resistant patients")),
+    EntityType("study", "a study design or named trial involving depression or anxiety",
+               ("randomized controlled trial", "STAR*D")),
+    EntityType("measure", "a clinical assessment or rating scale related to depression or anxiety",
+               ("Hamilton Depression Rating Scale", "Beck Anxiety Inventory"), "LOINC"),
+    EntityType("dosage", "medication dosage info linked to depression/anxiety treatment", (), "RXNORM"),
+    EntityType("quantitative_result", "only numeric results that describe outcomes or measures",
+               ("65% remission", "p = 0.03", "n = 120")),
+]
+
+RELATIONSHIPS = [
+    RelationshipType("treats", ("medication", "treatment_type"), ("medical_condition",)),
+    RelationshipType("has_outcome", ("medication", "treatment_type", "patient_group"), ("outcome",)),
+    RelationshipType("affects", ("patient_group",), ("outcome",)),
+    RelationshipType("compares", ("study",), ("medication", "treatment_type"), many=True),
+    RelationshipType("has_dosage", ("medication",), ("dosage",)),
+    RelationshipType("measured_by", ("outcome",), ("measure",)),
+    RelationshipType("reports", ("outcome", "medication", "treatment_type"), ("quantitative_result",)),
+]
+
+INTERACTION_TYPES = ["use_with_caution", "contraindicated"]
+
+ENTITY_TYPES = [e.name for e in ENTITIES]
+RELATIONSHIP_TYPES = [r.name for r in RELATIONSHIPS]
+SECTIONS = ("entities", "relationships", "interactions")
+
+
+# prompt sections
+
+def entity_type_lines(examples=True) -> str:
+    lines = []
+    for e in ENTITIES:
+        line = f"- {e.name}: {e.description}"
+        if examples and e.examples:
+            line += " (e.g., " + ", ".join(f"“{x}”" for x in e.examples) + ")"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def relationship_type_lines() -> str:
+    return "\n".join(
+        f"- {r.name}: {'/'.join(r.head)} → {'≥2 ' if r.many else ''}{'/'.join(r.tail)}" for r in RELATIONSHIPS
+    )
+
+
+def coding_rule_lines() -> str:
+    by_system = {}
+    for e in ENTITIES:
+        if e.code_system:
+            by_system.setdefault(e.code_system, []).append(e.name)
+    lines = [
+        f"{n}.  If the entity type is {' or '.join(f'`{t}`' for t in types)}, set `code_system` to "
+        f"**\"{system}\"** and provide {CODE_SYSTEMS[system]}."
+        for n, (system, types) in enumerate(by_system.items(), 1)
+    ]
+    lines.append(f"{len(lines) + 1}.  If you cannot find a definitive, standard code, set both `code_system` "
+                 "and `code` to **null**. Do not invent codes.")
+    return "\n".join(lines)
+
+
+def output_example(interactions=False, codes=True) -> str:
+    """The JSON structure, written out for prompts sent without a response_format."""
+    entity = '{"id": 1, "text": "sertraline", "type": "medication"'
+    entity += ', "code_system": "RXNORM", "code": "36437"}' if codes else "}"
+    lines = ["{", f'  "entities": [{entity}],',
+             '  "relationships": [{"head": 1, "tail": 2, "type": "treats", "evidence": "Supporting text"}]']
+    if interactions:
+        lines[-1] += ","
+        lines.append('  "interactions": [{"id": 1, "entity_ids": [1, 3], "interaction_type": "use_with_caution", '
+                     '"note": "Short explanation of the clash.", "evidence": "Quote from the text."}]')
+    lines.append("}")
+    return "\n".join(lines)
+
+
+# JSON schema (structured outputs)
+
+def _nullable(schema: dict) -> dict:
+    return {**schema, "type": [schema["type"], "null"]}
+
+
+def _object(properties: dict) -> dict:
+    # structured-output strict mode: every property required, nothing else allowed
+    return {"type": "object", "properties": properties, "required": list(properties),
+            "additionalProperties": False}
+
+
+def item_schemas(interactions=False, codes=True) -> dict:
+    entity = {
+        "id": {"type": "integer"},
+        "text": {"type": "string"},
+        "type": {"type": "string", "enum": ENTITY_TYPES},
+    }
+    if codes:
+        entity["code_system"] = {"type": ["string", "null"], "enum": [*CODE_SYSTEMS, None]}
+        entity["code"] = _nullable({"type": "string"})
+    items = {
+        "entities": _object(entity),
+        "relationships": _object({
+            "head": {"type": "integer"},
+            "tail": {"type": "integer"},
+            "type": {"type": "string", "enum": RELATIONSHIP_TYPES},
+            "evidence": {"type": "string"},
+        }),
+    }
+    if interactions:
+        items["interactions"] = _object({
+            "id": {"type": "integer"},
+            "entity_ids": {"type": "array", "items": {"type": "integer"}, "minItems": 2, "maxItems": 2},
+            "interaction_type": {"type": "string", "enum": INTERACTION_TYPES},
+            "note": {"type": "string"},
+            "evidence": {"type": "string"},
+        })
+    return items
+
+
+def json_schema(interactions=False, codes=True, packed=False) -> dict:
+    """
+    The response schema. packed=True is the multi-section form used by
+    extract.packing: {"sections": [{"section_id": ..., "entities": [...], ...}]}.
+    """
+    sections = {section: {"type": "array", "items": item}
+                for section, item in item_schemas(interactions, codes).items()}
+    if packed:
+        return _object({"sections": {"type": "array", "items": _object({"section_id": {"type": "string"}, **sections})}})
+    return _object(sections)
+
+
+def response_format(interactions=False, codes=True, packed=False) -> dict:
+    """`response_format` for chat.completions: the model can only emit JSON matching the schema."""
+    return {"type": "json_schema", "json_schema": {
+        "name": "knowledge_graph_extraction_sections" if packed else "knowledge_graph_extraction",
+        "strict": True,
+        "schema": json_schema(interactions, codes, packed),
+    }}
+
+
+# validation
+
+_JSON_TYPES = {
+    "object": dict, "array": list, "string": str, "integer": int, "number": (int, float),
+    "boolean": bool, "null": type(None),
+}
+
+
+def compile_validator(schema: dict):
+    """
+    Turn the subset of JSON Schema used here (type, enum, properties, required,
+    additionalProperties, items, minItems, maxItems) into a function
+    `check(value, path) -> list of error strings`. The schema is walked once;
+    checking is plain closures with no per-value schema interpretation.
+    """
+    checks = []
+
+    if "type" in schema:
+        names = schema["type"] if isinstance(schema["type"], list) else [schema["type"]]
+        types = tuple(t for n in names for t in (_JSON_TYPES[n] if isinstance(_JSON_TYPES[n], tuple)
+                                                 else (_JSON_TYPES[n],)))
+        no_bool = "boolean" not in names  # bool is an int subclass in Python
+
+        def check_type(value, path):
+            if not isinstance(value, types) or (no_bool and isinstance(value, bool)):
+                return [f"{path}: expected {'/'.join(names)}, got {type(value).__name__}"]
+            return []
+        checks.append(check_type)
+
+    if "enum" in schema:
+        allowed = frozenset(schema["enum"])
+
+        def check_enum(value, path):
+            return [] if value in allowed else [f"{path}: {value!r} is not one of the allowed values"]
+        checks.append(check_enum)
+
+    if "properties" in schema:
+        properties = {name: compile_validator(sub) for name, sub in schema["properties"].items()}
+        required = tuple(schema.get("required", ()))
+        closed = schema.get("additionalProperties", True) is False
+
+        def check_object(value, path):
+            if not isinstance(value, dict):
+                return []
+            errors = [f"{path}: missing {name!r}" for name in required if name not in value]
+            for name, item in value.items():
+                check = properties.get(name)
+                if check is not None:
+                    errors.extend(check(item, f"{path}.{name}"))
+                elif closed:
+                    errors.append(f"{path}: unexpected {name!r}")
+            return errors
+        checks.append(check_object)
+
+    if "items" in schema or "minItems" in schema or "maxItems" in schema:
+        item_check = compile_validator(schema["items"]) if "items" in schema else None
+        low, high = schema.get("minItems", 0), schema.get("maxItems")
+
+        def check_array(value, path):
+            if not isinstance(value, list):
+                return []
+            errors = []
+            if len(value) < low or (high is not None and len(value) > high):
+                errors.append(f"{path}: expected {low}..{high if high is not None else ''} items, got {len(value)}")
+            if item_check is not None:
+                for i, item in enumerate(value):
+                    errors.extend(item_check(item, f"{path}[{i}]"))
+            return errors
+        checks.append(check_array)
+
+    def check(value, path="$"):
+        errors = []
+        for c in checks:
+            errors.extend(c(value, path))
+        return errors
+    return check
+
+
+# code_system spellings seen in model output ("rxnorm", "ICD10", "ICD-10-CM", "Loinc")
+_CODE_SYSTEM_ALIASES = {re.sub(r"[^a-z0-9]", "", s.lower()): s for s in CODE_SYSTEMS}
+_CODE_SYSTEM_ALIASES.update({"icd10cm": "ICD-10", "rxcui": "RXNORM", "cpt4": "CPT"})
+
+
+def _snake(value):
+    return re.sub(r"[\s\-]+", "_", value.strip().lower()) if isinstance(value, str) else value
+
+
+def _as_int(value):
+    if isinstance(value, str) and value.strip().isdigit():
+        return int(value)
+    return value
+
+
+class ExtractionValidator:
+    """
+    Checks parsed responses against the schema, one item at a time.
+
+    Harmless drift is fixed first (type casing, code_system spellings, numeric
+    strings for IDs, numeric codes, extra keys, missing code fields); items that
+    still fail (e.g. an unknown relationship type) are dropped and counted rather
+    than failing the whole chunk. Keeps running totals for the end-of-run report.
+    """
+
+    def __init__(self, interactions=False, codes=True):
+        self.items = item_schemas(interactions, codes)
+        self._checks = {section: compile_validator(schema) for section, schema in self.items.items()}
+        self._fields = {section: tuple(schema["properties"]) for section, schema in self.items.items()}
+        self.checked = Counter()
+        self.fixed = Counter()
+        self.dropped = Counter()  # "<section>: <first error>" -> count
+
+    def _normalize(self, section, item):
+        if not isinstance(item, dict):
+            return item, False
+        fields = self._fields[section]
+        out = {name: item[name] for name in fields if name in item}
+        changed = len(out) != len(item)
+        for name in ("id", "head", "tail"):
+            if name in out:
+                out[name] = _as_int(out[name])
+        if "entity_ids" in out and isinstance(out["entity_ids"], list):
+            out["entity_ids"] = [_as_int(i) for i in out["entity_ids"]]
+        if section != "interactions" and "type" in out:
+            out["type"] = _snake(out["type"])
+        if section == "interactions" and "interaction_type" in out:
+            out["interaction_type"] = _snake(out["interaction_type"])
+        if "code_system" in fields:
+            for name in ("code_system", "code"):
+                out.setdefault(name, None)
+            system = out["code_system"]
+            if isinstance(system, str):
+                out["code_system"] = _CODE_SYSTEM_ALIASES.get(re.sub(r"[^a-z0-9]", "", system.lower()), system)
+            if isinstance(out["code"], (int, float)) and not isinstance(out["code"], bool):
+                out["code"] = str(out["code"])
+            if out["code"] is None:
+                out["code_system"] = None  # "set both to null"
+        return out, changed or out != item
+
+    def __call__(self, data: dict) -> dict:
+        """A copy of `data` holding only schema-valid items (sections the schema doesn't know are dropped)."""
+        clean = {}
+        for section, check in self._checks.items():
+            kept = clean[section] = []
+            for i, item in enumerate(data.get(section) or []):
+                self.checked[section] += 1
+                item, changed = self._normalize(section, item)
+                errors = check(item, f"{section}[{i}]")
+                if errors:
+                    self.dropped[f"{section}: {errors[0].split(': ', 1)[1]}"] += 1
+                    continue
+                if changed:
+                    self.fixed[section] += 1
+                kept.append(item)
+        return clean
+
+    def summary(self) -> str:
+        line = "Schema: " + (", ".join(
+            f"{self.checked[s]} {s} checked ({self.fixed[s]} fixed)" for s in self._checks if self.checked[s]
+        ) or "nothing checked")
+        if self.dropped:
+            line += f"; {sum(self.dropped.values())} dropped: " + "; ".join(
+                f"{reason} x{n}" for reason, n in self.dropped.most_common(5))
+        return line
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print the extraction JSON schema.")
+    parser.add_argument("--interactions", action="store_true", help="Include the interactions section.")
+    parser.add_argument("--no-codes", action="store_true", help="Leave out code_system / code.")
+    parser.add_argument("--packed", action="store_true", help="Multi-section form (gemini.py --pack).")
+    args = parser.parse_args()
+    print(json.dumps(response_format(args.interactions, not args.no_codes, args.packed), indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+# extract/search.py
+# Full-text search over supporting quotes (SQLite FTS5).
+#
+# One document per relationship / interaction of the combined extraction:
+# its evidence quote, its note (interactions), and the texts of the entities it
+# links, tokenized with case / diacritic folding and Porter stemming
+# ("syndromes" finds "syndrome"). Documents keep the entity IDs, source paper
+# and chunk, so a hit points straight at graph nodes and the chunk it came from.
+#
+# Documents are grouped in collections, one per extraction output file (entity
+# IDs are only meaningful within one). The index is updated per paper: update()
+# re-indexes only papers whose content hash changed since the last run and drops
+# papers that disappeared from the collection, so extraction runs keep it current
+# at the cost of the papers they touched.
+#
+#   python -m extract.search build combined-final-CHATGPT.json validated_interactions.json
+#   python -m extract.search query "serotonin syndrome sertraline"
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from extract.normalize import canonical_text
+from extract.trace import span
+
+DEFAULT_INDEX_PATH = os.getenv("EVIDENCE_INDEX_PATH", "evidence_index.sqlite")
+UNKNOWN_SOURCE = "unknown"
+# bm25 column weights: evidence quote, note, linked entity texts (kind is not indexed)
+WEIGHTS = (1.0, 0.5, 2.0, 0.0)
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def documents(combined: dict, default_source=UNKNOWN_SOURCE) -> dict:
+    """{source paper: [document]} for the relationships and interactions of a combined extraction."""
+    texts = {e["id"]: e.get("text") or "" for e in combined.get("entities") or []}
+    terms = {}  # entity id -> its searchable names, computed once per entity
+
+    def entity_terms(entity_id):
+        found = terms.get(entity_id)
+        if found is None:
+            text = texts.get(entity_id, "")
+            # the canonical form too, so "SSRIs" and "selective serotonin reuptake inhibitors" both hit
+            canonical = canonical_text(text)
+            found = terms[entity_id] = text if not canonical or canonical == text else f"{text} | {canonical}"
+        return found
+
+    papers = {}
+    for kind, section in (("relationship", "relationships"), ("interaction", "interactions")):
+        for record in combined.get(section) or []:
+            if kind == "relationship":
+                entity_ids, label = [record["head"], record["tail"]], record.get("type")
+            else:
+                entity_ids, label = list(record.get("entity_ids") or []), record.get("interaction_type")
+            papers.setdefault(record.get("source") or default_source, []).append({
+                "kind": kind,
+                "label": label,
+                "entity_ids": entity_ids,
+                "evidence": record.get("evidence") or "",
+                "note": record.get("note") or "",
+                "entities": " | ".join(t for t in map(entity_terms, entity_ids) if t),
+                "chunk": record.get("chunk"),
+            })
+    return papers
+
+
+def paper_hash(docs) -> str:
+    payload = json.dumps(docs, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def match_query(text, any_term=False) -> str | None:
+    """FTS5 MATCH expression for free text: every word (quoted, so no query syntax leaks) ANDed or ORed."""
+    words = _TOKEN.findall(text)
+    if not words:
+        return None
+    return (" OR " if any_term else " ").join(f'"{w}"' for w in words)
+
+
+class EvidenceIndex:
+    """
+    Evidence documents in `path`: a plain `docs` table (source, chunk, entity IDs,
+    original quote) and an FTS5 table over the same rowids. Safe to share across threads.
+    """
+
+    def __init__(self, path=DEFAULT_INDEX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS papers (
+                collection TEXT NOT NULL,
+                source TEXT NOT NULL,
+                hash TEXT NOT NULL,
+                indexed_at REAL NOT NULL,
+                PRIMARY KEY (collection, source)
+            );
+            CREATE TABLE IF NOT EXISTS docs (
+                id INTEGER PRIMARY KEY,
+                collection TEXT NOT NULL,
+                source TEXT NOT NULL,
+                chunk INTEGER,
+                kind TEXT NOT NULL,
+                label TEXT,
+                entity_ids TEXT NOT NULL,
+                evidence TEXT NOT NULL,
+                note TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS docs_paper ON docs(collection, source);
+            CREATE VIRTUAL TABLE IF NOT EXISTS docs_fts USING fts5(
+                evidence, note, entities, kind UNINDEXED, tokenize = 'porter unicode61 remove_diacritics 2'
+            );
+            """
+        )
+        self._conn.commit()
+
+    def _delete_paper(self, collection, source):
+        paper = (collection, source)
+        self._conn.execute(
+            "DELETE FROM docs_fts WHERE rowid IN (SELECT id FROM docs WHERE collection = ? AND source = ?)", paper)
+        self._conn.execute("DELETE FROM docs WHERE collection = ? AND source = ?", paper)
+        self._conn.execute("DELETE FROM papers WHERE collection = ? AND source = ?", paper)
+
+    def update(self, combined: dict, collection, prune=True, default_source=UNKNOWN_SOURCE) -> dict:
+        """
+        Bring one collection in line with a combined extraction, one transaction in all.
+        Unchanged papers are skipped; with prune=True papers missing from it are removed.
+        Records without a source paper are filed under `default_source`.
+        """
+        papers = documents(combined, default_source)
+        with self._lock, self._conn:
+            known = dict(self._conn.execute("SELECT source, hash FROM papers WHERE collection = ?", (collection,)))
+            stats = {"added": 0, "changed": 0, "removed": 0, "unchanged": 0, "documents": 0}
+            now = time.time()
+            for source, docs in papers.items():
+                digest = paper_hash(docs)
+                if known.get(source) == digest:
+                    stats["unchanged"] += 1
+                    continue
+                stats["changed" if source in known else "added"] += 1
+                self._delete_paper(collection, source)
+                for doc in docs:
+                    cur = self._conn.execute(
+                        "INSERT INTO docs (collection, source, chunk, kind, label, entity_ids, evidence, note) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        (collection, source, doc["chunk"], doc["kind"], doc["label"], json.dumps(doc["entity_ids"]),
+                         doc["evidence"], doc["note"]))
+                    self._conn.execute(
+                        "INSERT INTO docs_fts (rowid, evidence, note, entities, kind) VALUES (?, ?, ?, ?, ?)",
+                        (cur.lastrowid, doc["evidence"], doc["note"], doc["entities"], doc["kind"]))
+                stats["documents"] += len(docs)
+                self._conn.execute("INSERT INTO papers (collection, source, hash, indexed_at) VALUES (?, ?, ?, ?)",
+                                   (collection, source, digest, now))
+            if prune:
+                for source in set(known) - set(papers):
+                    self._delete_paper(collection, source)
+                    stats["removed"] += 1
+        return stats
+
+    def remove_paper(self, collection, source):
+        with self._lock, self._conn:
+            self._delete_paper(collection, source)
+
+    def search(self, text, limit=20, kind=None) -> list:
+        """
+        Best-ranked documents (bm25) for free text: documents containing every
+        word first, then, if fewer than `limit`, documents with any of them.
+        """
+        hits, seen = [], set()
+        for any_term in (False, True):
+            expression = match_query(text, any_term)
+            if expression is None or len(hits) >= limit:
+                break
+            # rank inside the FTS table, then join only the top rows
+            sql = (
+                "SELECT d.id, d.collection, d.kind, d.label, d.entity_ids, d.evidence, d.note, d.source, d.chunk, "
+                "f.score FROM ("
+                f"SELECT rowid, bm25(docs_fts, {', '.join(map(str, WEIGHTS))}) AS score "
+                "FROM docs_fts WHERE docs_fts MATCH ?" + (" AND kind = ?" if kind else "")
+                + " ORDER BY score LIMIT ?) f JOIN docs d ON d.id = f.rowid ORDER BY f.score"
+            )
+            params = [expression] + ([kind] if kind else []) + [limit + len(seen)]
+            with self._lock:
+                rows = self._conn.execute(sql, params).fetchall()
+            for doc_id, collection, doc_kind, label, entity_ids, evidence, note, source, chunk, score in rows:
+                if doc_id in seen or len(hits) >= limit:
+                    continue
+                seen.add(doc_id)
+                hits.append({"collection": collection, "kind": doc_kind, "label": label,
+                             "entity_ids": json.loads(entity_ids), "evidence": evidence, "note": note, "source": source, "chunk": chunk,
+                             "score": -score})
+        return hits
+
+    def stats(self) -> dict:
+        with self._lock:
+            papers = self._conn.execute("SELECT COUNT(*) FROM papers").fetchone()[0]
+            docs = self._conn.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+        return {"papers": papers, "documents": docs}
+
+    def close(self):
+        self._conn.close()
+
+
+def collection_name(output_path) -> str:
+    """Collection of an extraction output file (its name; .json and .ndjson forms share it)."""
+    return os.path.splitext(os.path.basename(output_path))[0]
+
+
+def update_index(combined: dict, output_path, path=DEFAULT_INDEX_PATH, default_source=UNKNOWN_SOURCE) -> dict:
+    """Refresh the evidence index at `path` from a finished extraction written to output_path."""
+    with span("index_evidence") as s:
+        index = EvidenceIndex(path)
+        try:
+            stats = index.update(combined, collection_name(output_path), default_source=default_source)
+        finally:
+            index.close()
+        s.add("documents", stats["documents"])
+    return stats
+
+
+def add_search_arguments(parser):
+    """--search-index / --no-search-index, shared by the extraction scripts."""
+    parser.add_argument("--search-index", default=DEFAULT_INDEX_PATH,
+                        help="SQLite FTS5 evidence index updated with this run's papers "
+                             "(query with python -m extract.search query ...).")
+    parser.add_argument("--no-search-index", action="store_true", help="Do not update the evidence index.")
+
+
+def index_from_args(args, combined: dict, output_path, default_source=UNKNOWN_SOURCE):
+    """update_index per the shared arguments; prints and returns its stats (None when disabled)."""
+    if args.no_search_index or not output_path:
+        return None
+    stats = update_index(combined, output_path, args.search_index, default_source)
+    print(f"Evidence index {args.search_index}: {format_stats(stats)}")
+    return stats
+
+
+def format_stats(stats) -> str:
+    return (f"{stats['added']} added, {stats['changed']} changed, {stats['removed']} removed, "
+            f"{stats['unchanged']} unchanged papers ({stats['documents']} documents indexed)")
+
+
+def main():
+    from extract.artifact import read_combined
+
+    parser = argparse.ArgumentParser(description="Full-text search over relationship and interaction evidence.")
+    parser.add_argument("--index", default=DEFAULT_INDEX_PATH, help="SQLite index file.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="Index (or re-index changed papers of) combined extraction files.")
+    build.add_argument("inputs", nargs="+", help="Combined extractions (.json or .ndjson).")
+    query = sub.add_parser("query", help="Ranked search.")
+    query.add_argument("text")
+    query.add_argument("--limit", type=int, default=10)
+    query.add_argument("--kind", choices=["relationship", "interaction"])
+    args = parser.parse_args()
+
+    index = EvidenceIndex(args.index)
+    if args.command == "build":
+        for path in args.inputs:
+            stats = index.update(read_combined(path), collection_name(path))
+            print(f"{path}: {format_stats(stats)}")
+        print(f"{args.index}: {index.stats()}")
+        return
+    start = time.perf_counter()
+    hits = index.search(args.text, args.limit, args.kind)
+    ms = (time.perf_counter() - start) * 1000
+    for hit in hits:
+        print(f"{hit['score']:6.2f}  {hit['kind']:<12} {hit['label'] or '':<17} entities {hit['entity_ids']}  "
+              f"{hit['collection']}:{hit['source']}#{hit['chunk']}")
+        print(f"        {hit['evidence']}" + (f"  [{hit['note']}]" if hit["note"] else ""))
+    print(f"{len(hits)} hits in {ms:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+# extract/synonyms.py
+# Synonym / abbreviation index for entity canonicalization.
+#
+# Maps brand names, abbreviations, salt forms and (with a fuzzy fallback)
+# misspellings onto one canonical name, and resolves RXNORM / ICD-10 / LOINC
+# codes the model returns onto the vocabulary entry that owns them.
+#
+# Vocabulary files are tab-separated:
+#   code_system <TAB> code <TAB> canonical name <TAB> synonym|synonym|...
+# A full RxNorm export can be loaded with SynonymIndex.from_rxnconso(RXNCONSO.RRF).
+
+import csv
+import os
+from collections import defaultdict
+from functools import lru_cache
+
+from extract.normalize import normalize_text
+
+DEFAULT_VOCABULARY = os.getenv(
+    "SYNONYM_VOCABULARY", os.path.join(os.path.dirname(__file__), "vocabulary.tsv")
+)
+
+# salt / formulation words that never change which drug is meant
+SALT_WORDS = frozenset({
+    "hydrochloride", "hcl", "hydrobromide", "hbr", "oxalate", "succinate", "sodium", "maleate",
+    "fumarate", "mesylate", "citrate", "tartrate", "besylate", "sulfate", "acetate", "tablet",
+    "tablets", "capsule", "capsules", "oral",
+})
+
+
+def strip_salts(term: str) -> str:
+    words = [w for w in term.split() if w not in SALT_WORDS]
+    return " ".join(words) if words else term
+
+
+def trigrams(term: str):
+    padded = f"  {term} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def within_edits(a: str, b: str, limit: int) -> bool:
+    """Levenshtein distance(a, b) <= limit, giving up as soon as every path exceeds it."""
+    if abs(len(a) - len(b)) > limit:
+        return False
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return False
+        previous = current
+    return previous[-1] <= limit
+
+
+class SynonymIndex:
+    """
+    normalized term -> canonical name, plus (code_system, code) -> canonical name.
+
+    Exact lookups are one dict probe. Misses fall back to a character-trigram
+    inverted index: candidates sharing many trigrams are verified with a bounded
+    edit distance (1 edit per 10 characters), so typos merge but distinct drugs
+    such as citalopram / escitalopram do not. Results are memoized per index.
+    """
+
+    def __init__(self, min_fuzzy_length=6, min_dice=0.8):
+        self.terms = {}
+        self.codes = {}
+        self.min_fuzzy_length = min_fuzzy_length
+        self.min_dice = min_dice
+        self.conflicts = 0
+        self._term_list = []
+        self._grams = defaultdict(list)
+        self._resolved = {}
+
+    def __len__(self):
+        return len(self.terms)
+
+    def _add_term(self, term, canonical):
+        key = strip_salts(normalize_text(term))
+        if not key:
+            return
+        known = self.terms.get(key)
+        if known is None:
+            self.terms[key] = canonical
+            term_id = len(self._term_list)
+            self._term_list.append(key)
+            for gram in trigrams(key):
+                self._grams[gram].append(term_id)
+        elif known != canonical:
+            self.conflicts += 1  # first vocabulary entry wins
+
+    def add(self, canonical, synonyms=(), code_system=None, code=None):
+        canonical = normalize_text(canonical)
+        if not canonical:
+            return
+        self._add_term(canonical, canonical)
+        for synonym in synonyms:
+            self._add_term(synonym, canonical)
+        if code_system and code:
+            self.codes.setdefault((code_system.upper(), str(code).strip()), canonical)
+        self._resolved.clear()
+
+    @classmethod
+    def from_tsv(cls, path, **kwargs):
+        index = cls(**kwargs)
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            for row in csv.reader(f, delimiter="\t"):
+                if not row or row[0].startswith("#") or len(row) < 3:
+                    continue
+                code_system, code, canonical = row[0], row[1], row[2]
+                synonyms = row[3].split("|") if len(row) > 3 and row[3] else []
+                index.add(canonical, synonyms, code_system or None, code or None)
+        return index
+
+    @classmethod
+    def from_rxnconso(cls, path, index=None, **kwargs):
+        """
+        Add every RXNORM-sourced English atom of an RXNCONSO.RRF export.
+        The preferred ingredient name (TTY=IN) becomes the canonical name of its RXCUI.
+        """
+        index = index or cls(**kwargs)
+        names = defaultdict(list)
+        preferred = {}
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                fields = line.split("|")
+                rxcui, lat, sab, tty, name = fields[0], fields[1], fields[11], fields[12], fields[14]
+                if lat != "ENG" or sab != "RXNORM":
+                    continue
+                names[rxcui].append(name)
+                if tty == "IN" or (tty in ("PIN", "BN") and rxcui not in preferred):
+                    preferred[rxcui] = name
+        for rxcui, atoms in names.items():
+            index.add(preferred.get(rxcui, atoms[0]), atoms, "RXNORM", rxcui)
+        return index
+
+    def fuzzy(self, key):
+        """Best near-match for a salt-stripped normalized term, or None."""
+        if len(key) < self.min_fuzzy_length:
+            return None
+        grams = trigrams(key)
+        limit = max(1, len(key) // 10)
+        # one edit touches at most 3 trigrams, so a match within `limit` edits must
+        # contain at least one of any 3 * limit + 1 of our trigrams: take the rarest
+        postings = sorted((self._grams.get(g, ()) for g in grams), key=len)[:3 * limit + 1]
+        best, best_dice = None, self.min_dice
+        for term_id in set().union(*postings):
+            term = self._term_list[term_id]
+            if abs(len(term) - len(key)) > limit:
+                continue
+            term_grams = trigrams(term)
+            dice = 2 * len(grams & term_grams) / (len(grams) + len(term_grams))
+            if dice >= best_dice and within_edits(key, term, limit):
+                best, best_dice = term, dice
+        return self.terms[best] if best else None
+
+    def resolve(self, normalized_text, code_system=None, code=None):
+        """
+        Canonical name for an already-normalized entity text, or None if unknown.
+
+        A known name wins over the model-supplied code (codes are sometimes
+        hallucinated); the code is used for surface forms the vocabulary lacks,
+        and fuzzy matching only when neither is found.
+        """
+        memo_key = (normalized_text, code_system, code)
+        if memo_key in self._resolved:
+            return self._resolved[memo_key]
+        key = strip_salts(normalized_text) if normalized_text else ""
+        canonical = self.terms.get(key) if key else None
+        if canonical is None and code_system and code:
+            canonical = self.codes.get((str(code_system).upper(), str(code).strip()))
+        if canonical is None and key:
+            canonical = self.fuzzy(key)
+        self._resolved[memo_key] = canonical
+        return canonical
+
+
+@lru_cache(maxsize=None)
+def default_index(path=DEFAULT_VOCABULARY) -> SynonymIndex:
+    """The bundled vocabulary (or $SYNONYM_VOCABULARY), loaded once per process."""
+    return SynonymIndex.from_tsv(path)
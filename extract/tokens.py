@@ -0,0 +1,153 @@
+# extract/tokens.py
+# Per-paper token accounting for extraction runs.
+#
+# Every completed request's usage (prompt, cached prefix, completion tokens as
+# reported by the API) is attributed to the papers it covered; a packed request
+# is split between its chunks in proportion to their text length. Answers from
+# the local response cache are counted separately, since they cost nothing.
+#
+#   python gemini.py --token-report tokens-after.json ...
+#   python -m extract.tokens compare tokens-before.json tokens-after.json
+
+import argparse
+import json
+import os
+
+FIELDS = ("requests", "chunks", "prompt", "cached", "completion")
+
+# USD per 1M tokens: (prompt, cached prompt, completion); LLM_PRICE="0.15,0.075,0.60"
+# overrides the table for whatever model is in use
+PRICES = {
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+    "gpt-4o": (2.50, 1.25, 10.00),
+}
+
+
+def usage_counts(usage) -> tuple:
+    """(prompt, cached, completion) tokens from a chat.completions usage dict."""
+    usage = usage or {}
+    details = usage.get("prompt_tokens_details") or {}
+    return usage.get("prompt_tokens") or 0, details.get("cached_tokens") or 0, usage.get("completion_tokens") or 0
+
+
+def price(model) -> tuple | None:
+    override = os.getenv("LLM_PRICE")
+    if override:
+        return tuple(float(x) for x in override.split(","))
+    return PRICES.get(model)
+
+
+def cost(model, usage) -> float:
+    """USD for one request's usage (0.0 for models without a known price)."""
+    rates = price(model)
+    if rates is None:
+        return 0.0
+    prompt, cached, completion = usage_counts(usage)
+    return ((prompt - cached) * rates[0] + cached * rates[1] + completion * rates[2]) / 1e6
+
+
+class TokenLedger:
+    def __init__(self, label=""):
+        self.label = label
+        self.papers = {}
+        self.requests = 0
+        self.cache_hits = 0
+
+    def _row(self, source):
+        return self.papers.setdefault(source, dict.fromkeys(FIELDS, 0))
+
+    def add(self, usage, parts, cached=False):
+        """
+        One request. parts: (source, weight) per chunk it carried, weight being
+        the chunk's share of the request (e.g. its text length).
+        """
+        if cached:
+            self.cache_hits += 1
+            return
+        self.requests += 1
+        prompt, prefix, completion = usage_counts(usage)
+        total = sum(w for _, w in parts) or len(parts)
+        for source in dict.fromkeys(s for s, _ in parts):
+            self._row(source)["requests"] += 1
+        for source, weight in parts:
+            share = (weight or (total / len(parts))) / total
+            row = self._row(source)
+            row["chunks"] += 1
+            row["prompt"] += prompt * share
+            row["cached"] += prefix * share
+            row["completion"] += completion * share
+
+    def totals(self) -> dict:
+        out = dict.fromkeys(FIELDS, 0)
+        for row in self.papers.values():
+            for k in FIELDS:
+                out[k] += row[k]
+        out["requests"] = self.requests  # a packed request covers several papers
+        return out
+
+    def report(self) -> str:
+        width = max([len(s) for s in self.papers] + [5])
+        lines = [f"  {'paper':<{width}} {'requests':>8} {'chunks':>6} {'prompt':>10} {'cached':>10} "
+                 f"{'completion':>10} {'prompt/compl':>12}"]
+        for source, row in [*self.papers.items(), ("total", self.totals())]:
+            ratio = row["prompt"] / row["completion"] if row["completion"] else 0
+            lines.append(f"  {source:<{width}} {row['requests']:>8} {row['chunks']:>6} {row['prompt']:>10,.0f} "
+                         f"{row['cached']:>10,.0f} {row['completion']:>10,.0f} {ratio:>12.1f}")
+        if self.cache_hits:
+            lines.append(f"  ({self.cache_hits} requests answered from the response cache, not counted)")
+        return "\n".join(lines)
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"label": self.label, "papers": self.papers, "requests": self.requests,
+                       "cache_hits": self.cache_hits}, f, indent=2)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        ledger = cls(data.get("label", path))
+        ledger.papers = data["papers"]
+        ledger.requests = data.get("requests", 0)
+        ledger.cache_hits = data.get("cache_hits", 0)
+        return ledger
+
+
+def compare(before: TokenLedger, after: TokenLedger) -> str:
+    """Per-paper prompt and completion tokens of two runs over the same papers."""
+    papers = list(dict.fromkeys([*before.papers, *after.papers]))
+    width = max([len(s) for s in papers] + [5])
+    empty = dict.fromkeys(FIELDS, 0)
+    lines = [f"  {'paper':<{width}} {'prompt before':>13} {'after':>10} {'uncached after':>14} "
+             f"{'completion before':>17} {'after':>10} {'requests':>9}"]
+    rows = [(s, before.papers.get(s, empty), after.papers.get(s, empty)) for s in papers]
+    rows.append(("total", before.totals(), after.totals()))
+    for source, b, a in rows:
+        lines.append(f"  {source:<{width}} {b['prompt']:>13,.0f} {a['prompt']:>10,.0f} "
+                     f"{a['prompt'] - a['cached']:>14,.0f} {b['completion']:>17,.0f} {a['completion']:>10,.0f} "
+                     f"{b['requests']:>4} -> {a['requests']:<4}")
+    b, a = before.totals(), after.totals()
+    if b["prompt"]:
+        lines.append(f"  prompt tokens {100 * (a['prompt'] / b['prompt'] - 1):+.1f}%, "
+                     f"uncached prompt tokens {100 * ((a['prompt'] - a['cached']) / b['prompt'] - 1):+.1f}%")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare token reports written by gemini.py --token-report.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    show = sub.add_parser("show", help="Print one report.")
+    show.add_argument("report")
+    cmp_ = sub.add_parser("compare", help="Per-paper before / after table.")
+    cmp_.add_argument("before")
+    cmp_.add_argument("after")
+    args = parser.parse_args()
+
+    if args.command == "show":
+        print(TokenLedger.load(args.report).report())
+    else:
+        print(compare(TokenLedger.load(args.before), TokenLedger.load(args.after)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,331 @@
+# extract/trace.py
+# Lightweight spans for the extraction-to-graph pipeline.
+#
+#   from extract.trace import span, traced, traced_iter
+#
+#   with span("pdf_to_text", paper=source) as s:
+#       text = ...
+#       s.add("pages", n)                  # counters: tokens, retries, rows, ...
+#
+#   @traced("parse_response")              # decorator form
+#   chunks = traced_iter("chunk_text", iter_chunks(...), paper=source)  # lazy generators
+#
+# Every span records wall time, its attributes and counters, and its parent
+# span (per thread). Spans are always aggregated in memory for the end-of-run
+# summary(); with a trace file (set_trace_file() or $TRACE_FILE) each one is
+# also appended as a JSONL line, so two runs can be compared afterwards:
+#
+#   python -m extract.trace summary trace.jsonl
+#   python -m extract.trace compare before.jsonl after.jsonl
+
+import argparse
+import functools
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+TRACE_FILE = os.getenv("TRACE_FILE")
+MAX_SAMPLES = 10000  # durations kept per span name for percentiles
+
+
+class Span:
+    __slots__ = ("name", "id", "parent", "attrs", "counters", "start", "seconds", "error")
+
+    def __init__(self, name, span_id, parent, attrs):
+        self.name = name
+        self.id = span_id
+        self.parent = parent
+        self.attrs = attrs
+        self.counters = Counter()
+        self.start = time.time()
+        self.seconds = 0.0
+        self.error = None
+
+    def add(self, key, n=1):
+        self.counters[key] += n
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def record(self) -> dict:
+        out = {"name": self.name, "span": self.id, "parent": self.parent, "start": round(self.start, 6),
+               "seconds": round(self.seconds, 6), **self.attrs, **self.counters}
+        if self.error:
+            out["error"] = self.error
+        return out
+
+
+class _Stats:
+    __slots__ = ("count", "seconds", "max", "samples", "errors", "counters")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.max = 0.0
+        self.samples = []
+        self.errors = 0
+        self.counters = Counter()
+
+    def add(self, seconds, counters, error):
+        self.count += 1
+        self.seconds += seconds
+        self.max = max(self.max, seconds)
+        if len(self.samples) < MAX_SAMPLES:
+            self.samples.append(seconds)
+        self.errors += error is not None
+        self.counters.update(counters)
+
+    def percentile(self, q):
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class Tracer:
+    """Thread-safe span collector; one per process (see the module-level functions)."""
+
+    def __init__(self, path=None):
+        self.run = uuid.uuid4().hex[:12]
+        self.started = time.perf_counter()
+        self.stats = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._file = None
+        if path:
+            self.open(path)
+
+    def open(self, path):
+        self.close()
+        self._file = open(path, "a", encoding="utf-8")
+        self._write({"name": "run", "run": self.run, "start": round(time.time(), 6), "argv": sys.argv})
+
+    def _write(self, record):
+        line = json.dumps({"run": self.run, **record}, ensure_ascii=False, default=str)
+        with self._lock:
+            if self._file is not None:
+                self._file.write(line + "\n")
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def begin(self, name, **attrs) -> Span:
+        stack = self._stack()
+        span = Span(name, next(self._ids), stack[-1].id if stack else None, attrs)
+        stack.append(span)
+        span.seconds = time.perf_counter()  # start mark until end()
+        return span
+
+    def end(self, span, error=None):
+        span.seconds = time.perf_counter() - span.seconds
+        if error is not None:
+            span.error = f"{type(error).__name__}: {error}"
+        stack = self._stack()
+        if stack and stack[-1] is span:
+            stack.pop()
+        with self._lock:
+            stats = self.stats.get(span.name)
+            if stats is None:
+                stats = self.stats[span.name] = _Stats()
+            stats.add(span.seconds, span.counters, span.error)
+        if self._file is not None:
+            self._write(span.record())
+
+    def record(self, name, seconds, error=None, **fields):
+        """A span timed elsewhere (e.g. in a worker process): numeric fields are counters, the rest attributes."""
+        span = Span(name, next(self._ids), None, {})
+        span.error = error
+        for key, value in fields.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                span.counters[key] += value
+            else:
+                span.attrs[key] = value
+        span.seconds = seconds
+        with self._lock:
+            self.stats.setdefault(name, _Stats()).add(seconds, span.counters, error)
+        if self._file is not None:
+            self._write(span.record())
+
+    def span(self, name, **attrs):
+        return _SpanContext(self, name, attrs)
+
+    def summary(self) -> str:
+        with self._lock:
+            items = sorted(self.stats.items(), key=lambda kv: -kv[1].seconds)
+        return format_summary(
+            [(name, s.count, s.seconds, s.seconds / s.count, s.percentile(0.95), s.max, s.errors, s.counters)
+             for name, s in items],
+            time.perf_counter() - self.started,
+        )
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class _SpanContext:
+    __slots__ = ("tracer", "name", "attrs", "span")
+
+    def __init__(self, tracer, name, attrs):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = attrs
+
+    def __enter__(self) -> Span:
+        self.span = self.tracer.begin(self.name, **self.attrs)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        self.tracer.end(self.span, exc)
+        return False
+
+
+def _number(v) -> str:
+    return f"{v:,.0f}" if abs(v) >= 100 or v == int(v) else f"{v:.3g}"
+
+
+def format_summary(rows, wall=None) -> str:
+    """rows: (name, count, total s, mean s, p95 s, max s, errors, counters)."""
+    width = max([len(r[0]) for r in rows] + [4])
+    lines = [f"  {'span':<{width}} {'count':>7} {'total s':>9} {'mean ms':>9} {'p95 ms':>9} {'max ms':>9} "
+             f"{'errors':>6}  counters (per second of span time)"]
+    for name, count, total, mean, p95, worst, errors, counters in rows:
+        extra = ", ".join(f"{k} {_number(v)}" + (f" ({_number(v / total)}/s)" if total and k != "cost_usd" else "")
+                          for k, v in sorted(counters.items()))
+        lines.append(f"  {name:<{width}} {count:>7} {total:>9.2f} {mean * 1e3:>9.1f} {p95 * 1e3:>9.1f} "
+                     f"{worst * 1e3:>9.1f} {errors:>6}  {extra}")
+    if wall is not None:
+        lines.append(f"  wall time {wall:.2f}s (spans overlap when work runs concurrently)")
+    return "\n".join(lines)
+
+
+TRACER = Tracer(TRACE_FILE)
+
+
+def set_trace_file(path):
+    """Also append every span to `path` (JSONL); None keeps in-memory stats only."""
+    if path:
+        TRACER.open(path)
+
+
+def span(name, **attrs):
+    return TRACER.span(name, **attrs)
+
+
+def record(name, seconds, error=None, **fields):
+    TRACER.record(name, seconds, error, **fields)
+
+
+def summary() -> str:
+    return TRACER.summary()
+
+
+def traced(name=None, **attrs):
+    """Decorator: run the function inside a span (named after the function by default)."""
+    def wrap(fn):
+        span_name = name or fn.__name__
+
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            with TRACER.span(span_name, **attrs):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+
+def traced_iter(name, iterable, counter="items", **attrs):
+    """
+    Yield from `iterable`, timing only the work done inside it (not the
+    consumer's) and recording one span with an item count when it is exhausted.
+    """
+    it = iter(iterable)
+    span = Span(name, next(TRACER._ids), None, attrs)
+    elapsed = 0.0
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(it)
+            except StopIteration:
+                elapsed += time.perf_counter() - start
+                break
+            elapsed += time.perf_counter() - start
+            span.counters[counter] += 1
+            yield item
+    finally:
+        span.seconds = elapsed
+        with TRACER._lock:
+            TRACER.stats.setdefault(name, _Stats()).add(elapsed, span.counters, None)
+        if TRACER._file is not None:
+            TRACER._write(span.record())
+
+
+# trace files
+
+def load_trace(path) -> dict:
+    """{span name: _Stats} over every span line of a trace file (all runs in it)."""
+    stats = {}
+    skip = {"name", "run", "span", "parent", "start", "seconds", "error", "argv"}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            rec = json.loads(line)
+            if rec.get("name") == "run":
+                continue
+            counters = {k: v for k, v in rec.items()
+                        if k not in skip and isinstance(v, (int, float)) and not isinstance(v, bool)}
+            stats.setdefault(rec["name"], _Stats()).add(rec.get("seconds", 0.0), counters, rec.get("error"))
+    return stats
+
+
+def _rows(stats):
+    return [(name, s.count, s.seconds, s.seconds / s.count, s.percentile(0.95), s.max, s.errors, s.counters)
+            for name, s in sorted(stats.items(), key=lambda kv: -kv[1].seconds)]
+
+
+def compare_traces(before: dict, after: dict) -> str:
+    names = list(dict.fromkeys([*before, *after]))
+    width = max([len(n) for n in names] + [4])
+    lines = [f"  {'span':<{width}} {'count':>13} {'mean ms':>19} {'p95 ms':>19} {'change':>8}"]
+    for name in names:
+        b, a = before.get(name), after.get(name)
+        bm = b.seconds / b.count if b else 0.0
+        am = a.seconds / a.count if a else 0.0
+        change = f"{100 * (am / bm - 1):+.0f}%" if b and a and bm else ""
+        lines.append(f"  {name:<{width}} {b.count if b else 0:>6}->{a.count if a else 0:<6} "
+                     f"{bm * 1e3:>9.1f}->{am * 1e3:<9.1f} "
+                     f"{(b.percentile(0.95) if b else 0) * 1e3:>9.1f}->{(a.percentile(0.95) if a else 0) * 1e3:<9.1f} "
+                     f"{change:>8}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize or compare pipeline trace files (JSONL).")
+    sub = parser.add_subparsers(dest="command", required=True)
+    show = sub.add_parser("summary", help="Per-span table for one trace file.")
+    show.add_argument("trace")
+    cmp_ = sub.add_parser("compare", help="Per-span mean / p95 latency of two trace files.")
+    cmp_.add_argument("before")
+    cmp_.add_argument("after")
+    args = parser.parse_args()
+
+    if args.command == "summary":
+        print(format_summary(_rows(load_trace(args.trace))))
+    else:
+        print(compare_traces(load_trace(args.before), load_trace(args.after)))
+
+
+if __name__ == "__main__":
+    main()
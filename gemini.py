@@ -1,178 +1,262 @@
 import os
-import json
-from dotenv import load_dotenv
-from openai import OpenAI
-import re  
-from extract.prompt import EXTRACT_PROMPT
-
-
-load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-
-# input files 
-file_paths = ["output_text.txt", "output2_text.txt"]
-texts = []
-for path in file_paths:
-    if os.path.exists(path):
-        with open(path, 'r', encoding='utf-8') as f:
-            texts.append(f.read())
-    else:
-        print(f"Warning: Input file not found: {path}. Skipping.")
-
-# split text into fixed-size chunks 
-def chunk_text(text, chunk_size=1000):
-    words = text.split()
-    return [' '.join(words[i:i + chunk_size]) for i in range(0, len(words), chunk_size)]
-
-# canonical map for common acronyms and major synonyms.
-# all keys and values must be run through normalize_text first for consistency
-CANONICAL_MAP = {
-    "ssris": "selective serotonin reuptake inhibitors",
-    "tcasa": "tricyclic antidepressants",
-    "vns": "vagus nerve stimulation",
-    "dbs": "deep brain stimulation",
-    "ect": "electroconvulsive therapy",
-    "cbt": "cognitive behavioral therapy", # Simplified CBT
-    "ip": "interpersonal therapy", # Assuming IP is Interpersonal Psychotherapy
-    "maois": "monoamine oxidase inhibitors"
-    }
-
-# normalize text 
-def normalize_text(s):
-    if not isinstance(s, str):
-        return ""
-    
-    s = s.strip().lower().replace("\n", " ")
-    s = re.sub(r'\s*\([^)]*\)', '', s).strip()
-    s = re.sub(r'[-\s]sr|[-\s]xr|sustained[-\s]release|extended[-\s]release', '', s)
-    s = re.sub(r'quick\s+', '', s) 
-    s = re.sub(r'self[-\s]report', '', s) 
-    s = re.sub(r'rating\s+scale', 'scale', s) 
-    s = re.sub(r'hamilton\s+depression\s+scale', 'hamilton depression', s)
-    s = re.sub(r'\s+', ' ', s).strip()
-    
-    return s
-
-# preprocess for deduplication 
-def preprocess_entity(entity):
-    raw_text = entity.get("text")
-    entity_type = entity.get("type")
-    normalized_text = normalize_text(raw_text)
-    canonical_text = CANONICAL_MAP.get(normalized_text, normalized_text)
-    
-    return canonical_text, normalize_text(entity_type)
-
-def preprocess_relationship(relationship):
-    return (
-        relationship.get("head"),
-        relationship.get("tail"),
-        normalize_text(relationship.get("type")),
-        normalize_text(relationship.get("evidence"))
-    )
-
-# initialize canonicalization data 
-entity_to_canonical_id = {}
-canonical_entities = []
-current_id = 1
-combined_relationships = []
-
-# process each file and chunk 
-for i, text in enumerate(texts, 1):
-    chunks = chunk_text(text)
-    for j, chunk in enumerate(chunks, 1):
-        full_prompt = f"""
-    {EXTRACT_PROMPT}
-    Text section {j} of file {i}:
-    {chunk}
-
-    Please respond ONLY with a valid JSON object containing all extracted entities and relationships.
+import argparse
+from extract.prompt import EXTRACT_INSTRUCTIONS, EXTRACT_PROMPT
+from extract.schema import ExtractionValidator, response_format
+from extract.canonical import Canonicalizer
+from extract.journal import ChunkJournal, job_key, journal_path_for, merge_records, record_parts
+from extract.artifact import ArtifactWriter, is_ndjson, read_combined, write_combined
+from extract.synonyms import DEFAULT_VOCABULARY, default_index
+from extract.engine import ChunkJob, ExtractionEngine
+from extract.response import ParseStats, parse_response
+from extract.cache import add_cache_arguments, cache_from_args
+from extract.packing import chunk_messages, pack, section_id, section_text, system_prefix, unpack
+from extract.tokens import TokenLedger
+from extract.trace import set_trace_file, summary, traced_iter
+from extract.dedup import DEFAULT_THRESHOLD, dedup, summary as dedup_summary
+from extract.search import add_search_arguments, index_from_args
+from extract.chunking import DEFAULT_CHUNK_TOKENS, DEFAULT_OVERLAP_TOKENS, iter_chunks, iter_file_pages, token_budget
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Extract entities and relationships from text files.")
+    parser.add_argument("files", nargs="*", default=["output_text.txt", "output2_text.txt"],
+                        help="Input text files (default: output_text.txt output2_text.txt).")
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv("EXTRACT_CONCURRENCY", "4")),
+                        help="Maximum number of in-flight completion requests.")
+    parser.add_argument("--max-retries", type=int, default=5,
+                        help="Retries per chunk on rate limits and transient errors.")
+    parser.add_argument("--chunk-tokens", type=int, default=DEFAULT_CHUNK_TOKENS,
+                        help="Target tokens of paper text per request (capped by the context window).")
+    parser.add_argument("--overlap-tokens", type=int, default=DEFAULT_OVERLAP_TOKENS,
+                        help="Tokens of trailing sentences repeated at the start of the next chunk.")
+    parser.add_argument("--vocabulary", default=DEFAULT_VOCABULARY,
+                        help="Synonym vocabulary (TSV) used to merge brand names, abbreviations and codes.")
+    parser.add_argument("-o", "--output", default="combined-final-CHATGPT.json",
+                        help="Combined output; a .ndjson name streams entities and relationships as chunks finish.")
+    parser.add_argument("--journal", default=None,
+                        help="Per-chunk progress journal (default: <output>.journal.jsonl); a rerun after a crash resumes from it.")
+    parser.add_argument("--restart", action="store_true",
+                        help="Discard the journal and extract every chunk again.")
+    parser.add_argument("--no-schema", action="store_true",
+                        help="Describe the output format in the prompt instead of sending a JSON schema "
+                             "(for endpoints without structured outputs).")
+    parser.add_argument("--pack", type=int, default=1, metavar="N",
+                        help="Pack up to N small chunks (short papers, abstracts) into one request, "
+                             "within --chunk-tokens of text (default 1: no packing).")
+    parser.add_argument("--token-report", default=None,
+                        help="Write per-paper token usage (JSON); compare runs with python -m extract.tokens compare.")
+    parser.add_argument("--dedup", type=float, nargs="?", const=DEFAULT_THRESHOLD, default=None, metavar="THRESHOLD",
+                        help=f"Merge near-duplicate entities in the output (default threshold {DEFAULT_THRESHOLD}).")
+    parser.add_argument("--trace", default=os.getenv("TRACE_FILE"),
+                        help="Append per-stage timing spans (JSONL); compare runs with python -m extract.trace compare.")
+    add_cache_arguments(parser)
+    add_search_arguments(parser)
+    return parser
+
+
+def make_engine(args) -> ExtractionEngine:
+    # no client here: the shared one (extract.clients) is created on the first request and
+    # reused by every later run in this process. Retries are handled by the engine so 429s
+    # can pause every worker at once
+    return ExtractionEngine(model="gpt-4o-mini", temperature=0.2,
+                            max_concurrency=args.concurrency, max_retries=args.max_retries,
+                            cache=cache_from_args(args), refresh=args.refresh,
+                            response_format=None if args.no_schema else response_format(packed=args.pack > 1))
+
+
+def run(args, engine=None) -> dict:
+    """
+    Extract args.files into args.output and return the combined extraction.
+    A long-lived caller can pass the same engine (and its response cache) to every run.
     """
+    own_engine = engine is None
+    engine = engine or make_engine(args)
+    packed = args.pack > 1
+    synonym_index = default_index(args.vocabulary)
+
+    # static instructions form a system prefix that is identical on every request, so
+    # provider-side prompt caching can reuse it; the user message is only the chunk.
+    # With a schema the output format is enforced by the API and left out of the prompt.
+    instructions = EXTRACT_INSTRUCTIONS
+    if args.no_schema:
+        instructions = EXTRACT_PROMPT + (
+            "\nPlease respond ONLY with a valid JSON object containing all extracted entities and relationships.\n")
+    prefix = system_prefix(instructions, packed)
+    validator = ExtractionValidator()
+    ledger = TokenLedger(label=f"pack={args.pack}" + (", no schema" if args.no_schema else ""))
+
+    # input files (streamed page by page when chunked, never read whole)
+    file_paths = []
+    sources = []  # source paper for each input file, tagged onto entities and relationships
+    for path in args.files:
+        if os.path.exists(path):
+            file_paths.append(path)
+            sources.append(os.path.basename(path))
+        else:
+            print(f"Warning: Input file not found: {path}. Skipping.")
+
+    # chunk budget: what's left of the context window after the prompt, capped at --chunk-tokens
+    chunk_tokens = token_budget(prefix, target=args.chunk_tokens)
+
+    # split text into sentence-aligned chunks that fit the token budget 
+    def chunk_text(path):
+        chunks = iter_chunks(iter_file_pages(path), chunk_tokens, args.overlap_tokens)
+        return traced_iter("chunk_text", chunks, counter="chunks", paper=os.path.basename(path))
+
+    # streamed output: records are written as they are merged, readable while we run
+    writer = ArtifactWriter(args.output) if is_ndjson(args.output) else None
+
+    try:
+        # canonical ID space shared by every file and chunk 
+        canonicalizer = Canonicalizer(synonym_index, sink=writer.write if writer else None)
+
+        # progress journal: chunks finished by an earlier (crashed) run are replayed, not re-sent
+        args.journal = args.journal or journal_path_for(args.output)
+        if args.restart and os.path.exists(args.journal):
+            os.remove(args.journal)
+        journal = ChunkJournal(args.journal)
+        if len(journal):
+            print(f"Resuming from {args.journal}: {len(journal)} chunks already extracted")
+        completed_keys = []  # journal keys of this run's chunks, in (file, chunk) order
+        parse_stats = ParseStats()
+
+        # every chunk of every file, in (file, chunk) order
+        def iter_all_chunks():
+            for i, path in enumerate(file_paths, 1):
+                for j, chunk in enumerate(chunk_text(path), 1):
+                    yield i, j, sources[i - 1], chunk
+
+        # build one job per chunk, or per pack of small chunks with --pack
+        def build_jobs():
+            if not packed:
+                for i, j, source, chunk in iter_all_chunks():
+                    messages = chunk_messages(prefix, f"Text section {j} of file {i}:\n\n{chunk}")
+                    yield ChunkJob(i, j, messages, {"source": source, "parts": [(i, j, source, len(chunk))]})
+                return
+            for group in pack(iter_all_chunks(), chunk_tokens, args.pack):
+                messages = chunk_messages(prefix, section_text((section_id(i, j), chunk) for i, j, _, chunk in group))
+                parts = [(i, j, source, len(chunk)) for i, j, source, chunk in group]
+                yield ChunkJob(parts[0][0], parts[0][1], messages, {"source": parts[0][2], "parts": parts})
+
+        def describe(parts):
+            if len(parts) == 1:
+                return f"file {parts[0][0]}, chunk {parts[0][1]}"
+            return "sections " + ", ".join(section_id(i, j) for i, j, _, _ in parts)
+
+        # process each request; results arrive in (file, chunk) order so IDs are stable
+        for job, record, result in journal.resume(engine, build_jobs()):
+            parts = job.meta["parts"]
+
+            if record is not None:
+                for part in record_parts(record):
+                    canonicalizer.add(part["data"], part["source"], part["chunk"])
+                completed_keys.append(record["key"])
+                if writer:
+                    writer.flush()
+                continue
+
+            label = describe(parts)
+            print(f"Processing {label} ...")
+            if result.error is not None:
+                print(f"General Error in {label} after {result.attempts} attempt(s): {result.error}")
+                continue
+            ledger.add(result.usage, [(source, weight) for _, _, source, weight in parts], result.cached)
+
+            # truncated or malformed responses keep every complete entity / relationship
+            parsed = parse_stats.add(parse_response(result.content))
+            if parsed.data is None:
+                print(f"JSON Error in {label}: {parsed.error}. Content: {(result.content or '')[:100]}...")
+                continue
+            if parsed.status == "salvaged":
+                print(f"Incomplete response in {label}: salvaged {parsed.salvaged}, "
+                      f"{parsed.dropped} partial objects dropped")
+
+            if packed:
+                # salvage cannot tell which section an object came from; such packs are re-sent on the next run
+                ids = [section_id(i, j) for i, j, _, _ in parts]
+                by_id = unpack(parsed.data, ids) if parsed.status != "salvaged" else {}
+                missing = [sid for sid in ids if sid not in by_id]
+                if missing:
+                    print(f"Packed response for {label} is missing sections {', '.join(missing)}; not journaled")
+                    continue
+            else:
+                by_id = {section_id(*parts[0][:2]): parsed.data}
+
+            try:
+                entries = []
+                for i, j, source, _ in parts:
+                    # drop items outside the schema (unknown types, missing fields) before they reach the graph
+                    data = validator(by_id[section_id(i, j)])
+                    for skipped in canonicalizer.add(data, source, j):
+                        print(f"Skipped relationship in file {i}, chunk {j}: missing entity mapping -> {skipped}")
+                    entries.append({"source": source, "file": i, "chunk": j, "data": data})
+
+                key = job_key(engine, job)
+                record = {"key": key, **entries[0]} if len(entries) == 1 else {"key": key, "parts": entries}
+                record["next_id"] = canonicalizer.current_id
+                if parsed.status != "ok":
+                    record["parse"] = parsed.status
+                journal.append(record)
+                completed_keys.append(key)
+                if writer:
+                    writer.flush()
+
+            except Exception as e:
+                print(f"General Error in {label}: {e}")
+                continue
+
+        # compaction: drop superseded / stale journal entries and rebuild the output from the journal
+        records = journal.compact(completed_keys)
+        journal.close()
+        final_combined = merge_records(records, synonym_index)
+        if final_combined["entities"] != canonicalizer.entities:
+            print("Warning: journal replay produced different entity IDs than this run")
+        print(f"Journal: {journal.replayed} chunks replayed, {journal.appended} extracted, {len(records)} kept in {args.journal}")
+        print(parse_stats.summary())
+        print(validator.summary())
+        print("Token usage (this run's requests):")
+        print(ledger.report())
+        if args.token_report:
+            ledger.save(args.token_report)
+
+        if writer:
+            writer.close()
+        else:
+            write_combined(final_combined, args.output)
+    finally:
+        if writer:
+            # no-op after a normal close; otherwise marks the artifact as aborted so a
+            # follower (generate_graph.py --follow) stops instead of waiting for more
+            writer.close(error="extraction stopped before the output was complete")
+
+    # near-duplicate merging needs every entity at once, so it rewrites the finished output
+    if args.dedup is not None:
+        final_combined, dedup_stats = dedup(read_combined(args.output), args.dedup)
+        write_combined(final_combined, args.output)
+        print(dedup_summary(dedup_stats))
+
+    # only papers whose relationships changed since the last run are re-indexed
+    index_from_args(args, final_combined, args.output)
+
+    if engine.cache is not None:
+        print(f"Response cache: {engine.cache.hits} hits, {engine.cache.misses} misses")
+        if own_engine:
+            engine.cache.close()
+
+    print("Stage timings:")
+    print(summary())
+    print(f"FIXED JSON output saved to {args.output}")
+    return final_combined
+
+
+def main(argv=None):
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    args = build_parser().parse_args(argv)
+    set_trace_file(args.trace)
+    run(args)
+
 
-        print(f"Processing file {i}, chunk {j}/{len(chunks)} ...")
-
-        try:
-            # call ChatGPT (replace Gemini) 
-            response = client.chat.completions.create(
-                model="gpt-4o-mini",  
-                messages=[{"role": "user", "content": full_prompt}],
-                temperature=0.2,
-            )
-
-            cleaned_text = response.choices[0].message.content.strip()
-            if cleaned_text.startswith("```json"):
-                cleaned_text = cleaned_text[len("```json"):].strip()
-            if cleaned_text.endswith("```"):
-                cleaned_text = cleaned_text[:-3].strip()
-
-            data = json.loads(cleaned_text)
-
-            # canonicalize entities 
-            local_id_to_key_map = {}
-            for entity in data.get("entities", []):
-                # use the new preprocessing function
-                key = preprocess_entity(entity) 
-                old_id = entity.get("id")
-                if old_id is not None:
-                    local_id_to_key_map[old_id] = key
-
-                if key not in entity_to_canonical_id:
-                    new_id = current_id
-                    entity_to_canonical_id[key] = new_id
-                    canonical_entities.append({
-                        "id": new_id,
-                        "text": entity["text"],
-                        "type": entity["type"],
-                        "code_system": entity.get("code_system"),
-                        "code": entity.get("code")
-                    })
-                    current_id += 1
-
-            # canonicalize relationships 
-            for relationship in data.get("relationships", []):
-                head_key = local_id_to_key_map.get(relationship.get("head"))
-                tail_key = local_id_to_key_map.get(relationship.get("tail"))
-                
-                # check if keys exist before fetching canonical IDs
-                if head_key and tail_key:
-                    canonical_head_id = entity_to_canonical_id.get(head_key)
-                    canonical_tail_id = entity_to_canonical_id.get(tail_key)
-                else:
-                    canonical_head_id, canonical_tail_id = None, None
-
-                if canonical_head_id and canonical_tail_id:
-                    combined_relationships.append({
-                        "head": canonical_head_id,
-                        "tail": canonical_tail_id,
-                        "type": relationship.get("type"),
-                        "evidence": normalize_text(relationship.get("evidence"))
-                    })
-                else:
-                    print(f"Skipped relationship in file {i}, chunk {j}: missing entity mapping -> {relationship}")
-
-        except json.JSONDecodeError as e:
-            print(f"JSON Error in file {i}, chunk {j}: {e}. Content: {cleaned_text[:100]}...")
-            continue
-        except Exception as e:
-            print(f"General Error in file {i}, chunk {j}: {e}")
-            continue
-
-# deduplicate relationships 
-final_relationships = []
-unique_relationships = set()
-for r in combined_relationships:
-    # Use a key that includes the evidence to preserve unique relationships with the same head/tail/type but different context
-    key = (r['head'], r['tail'], r['type'], r['evidence']) 
-    if key not in unique_relationships:
-        unique_relationships.add(key)
-        final_relationships.append(r)
-
-# save final combined JSON 
-final_combined = {
-    "entities": canonical_entities,
-    "relationships": final_relationships
-}
-
-with open("combined-final-CHATGPT.json", "w", encoding="utf-8") as f:
-    json.dump(final_combined, f, ensure_ascii=False, indent=2)
-
-print("FIXED JSON output saved to combined-final-CHATGPT.json")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -1,151 +1,136 @@
 import os
-import json
-import re
-from neo4j import GraphDatabase
-from typing import Optional, Tuple
-
-NEO4J_URI = os.getenv("NEO4J_URI", "bolt://neo4j:7687")
-NEO4J_USER = os.getenv("NEO4J_USER", "neo4j")
-# Replace with actual password, match compose env
-NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD", "test1234") 
-
-# Load JSON File
-with open('./combined-final-CHATGPT.json', 'r') as f:
-    data = json.load(f)
-
-entities = data["entities"]
-relationships = data["relationships"]
-
-# load Neo4j Driver
-driver = GraphDatabase.driver(NEO4J_URI, auth=None)  
-
-# Create Entities
-def insert_entities(tx, entities):
-    for ent in entities:
-        label = ent["type"]
-        props = {k: v for k, v in ent.items() if k != "type"}
-
-        cy_child = f"""
-        MERGE (n:{label} {{id: $id}})
-        SET n += $props,
-            n.level = coalesce(n.level, 'child')
-        """
-        tx.run(cy_child, id=props["id"], props=props)
-
-# Create Relationships
-def insert_relationships(tx, relationships, entities):
-    ent_dict = {e['id']: (e['type'], e['text']) for e in entities}
-    for rel in relationships:
-        head_id = rel["head"]
-        tail_id = rel["tail"]
-        rel_type = rel["type"].upper()
-        evidence = rel.get("evidence", "")
-        # Get labels for match
-        head_label = ent_dict[head_id][0]
-        tail_label = ent_dict[tail_id][0]
-
-        cypher = f"""
-        MATCH (a:{head_label} {{id: $head_id}}), (b:{tail_label} {{id: $tail_id}})
-        MERGE (a)-[r:{rel_type}]->(b)
-        // If relationship is new, set evidence to incoming value (may be empty)
-        ON CREATE SET r.evidence = $evidence
-        // If it exists, append only if this evidence isn't already present and isn't empty
-        ON MATCH SET r.evidence =
-            CASE
-                WHEN $evidence = '' THEN r.evidence
-                WHEN r.evidence IS NULL OR r.evidence = '' THEN $evidence
-                WHEN r.evidence CONTAINS $evidence THEN r.evidence
-                ELSE r.evidence + '\n' + $evidence
-            END
-        """
-        tx.run(cypher, head_id=head_id, tail_id=tail_id, evidence=evidence)
+import argparse
+import time
+
+from extract.artifact import DEFAULT_FOLLOW_TIMEOUT, is_ndjson, iter_records, read_combined
+from graph.driver import neo4j_driver
+from graph.loader import DEFAULT_BATCH_SIZE, stream_graph
+from graph.schema import ensure_label, ensure_schema, format_timings
+from graph.incremental import DEFAULT_MANIFEST_PATH, SliceHasher, save_manifest, sync_graph, withdraw
+from extract.trace import set_trace_file, summary
+from graph.export import export_csv
+from graph.rollup import RollupBuilder, build_rollup, format_rollup, write_rollup
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Load the combined extraction JSON into Neo4j.")
+    parser.add_argument("--input", default="./combined-final-CHATGPT.json",
+                        help="Combined extraction (.json, or a streamed .ndjson artifact).")
+    parser.add_argument("--follow", action="store_true",
+                        help="Load an .ndjson artifact while it is still being written, until extraction ends.")
+    parser.add_argument("--follow-timeout", type=float, default=DEFAULT_FOLLOW_TIMEOUT,
+                        help="With --follow, give up after this many seconds without new records (0: never).")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help="Rows per UNWIND batch (and per transaction).")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only update papers whose content changed since the last import (no wipe).")
+    parser.add_argument("--withdraw", metavar="PAPER", help="Remove one source paper from the graph and exit.")
+    parser.add_argument("--manifest", default=DEFAULT_MANIFEST_PATH,
+                        help="Per-paper content hashes from the last import.")
+    parser.add_argument("--mode", choices=["transactional", "bulk"], default=os.getenv("LOADER_MODE", "transactional"),
+                        help="bulk: write neo4j-admin import files to --import-dir instead of loading (full rebuilds).")
+    parser.add_argument("--import-dir", default=os.getenv("IMPORT_DIR", "./import"),
+                        help="Output directory for --mode bulk (also where neo4j-admin reads it).")
+    parser.add_argument("--schema-only", action="store_true",
+                        help="Only create constraints / indexes (e.g. after a bulk import) and exit.")
+    parser.add_argument("--trace", default=os.getenv("TRACE_FILE"),
+                        help="Append per-batch write spans (JSONL); compare runs with python -m extract.trace compare.")
+    return parser
+
+
+def export_bulk(args):
+    # no database connection: neo4j-admin builds a fresh store from these files
+    start = time.perf_counter()
+    hasher = SliceHasher()
+
+    def records():
+        for kind, record in iter_records(args.input, follow=args.follow, timeout=args.follow_timeout):
+            hasher.add(kind, record)
+            yield kind, record
+
+    counts = export_csv(records(), args.import_dir)
+    save_manifest(hasher.hashes(), args.manifest)
+    print(f"Exported {counts['nodes']} entities, {counts['relationships']} relationships and "
+          f"{counts['evidence']} evidence nodes to {args.import_dir} in {time.perf_counter() - start:.2f}s")
+    print("Export timings:\n" + summary())
+    print(f"Stop Neo4j, run {os.path.join(args.import_dir, 'import.sh')}, start it again and "
+          f"run this script with --schema-only.")
+    return counts
 
 
 def reset_graph(tx):
     tx.run("MATCH (n) DETACH DELETE n")  # Clear existing graph data
-        
-
-with driver.session() as session:
-    session.execute_write(reset_graph)
-    session.execute_write(insert_entities, entities)
-    session.execute_write(insert_relationships, relationships, entities)
-
-driver.close()
-print("Graph successfully imported!")
-
-
-'''
-# Create high level rules manually for now
-PARENT_RULES = [
-    (re.compile(r'\bdepress', re.I), ("Depression", "group:depression")),
-    (re.compile(r'\banx', re.I), ("Anxiety disorders", "group:anxiety")),
-    (re.compile(r'\bbipolar', re.I), ("Bipolar disorder", "group:bipolar")),
-    # add more rules as needed
-]
-
-# Takes in an entity, and sees tries to match with high level parent
-def infer_parent(ent: dict) -> Tuple[Optional[str], Optional[str]]:
-    """
-    Returns (parent_name, parent_id) for an entity, or (None, None) if no parent.
-    You can also drive this from ICD code prefixes, e.g., 'F33.*' -> Depression.
-    """
-    # only test with medical conditions for now
-    if ent.get("type") != "medical_condition":
-        return (None, None)
-
-    text = (ent.get("text") or "").strip()
-    if not text:
-        return (None, None)
-
-     Only implementing parent if we have time to implement later
-    for pattern, (pname, pid) in PARENT_RULES:
-        # Reverse string (Anxious depression) is a type of depression, not anxiety
-        temp_list = text.split()
-        temp_list.reverse()
-        rev_text = " ".join(temp_list)
-
-        if pattern.search(rev_text):
-            return (pname, pid)
-
-    return (None, None)
-    
-
-    # Create Nodes
-def insert_entities(tx, entities):
-    for ent in entities:
-        label = ent["type"]
-        props = {k: v for k, v in ent.items() if k != "type"}
-
-        # 1) MERGE the child node (your existing behavior)
-        #    We also tag child nodes with level='child' for clarity (optional).
-        cy_child = f"""
-        MERGE (n:{label} {{id: $id}})
-        SET n += $props,
-            n.level = coalesce(n.level, 'child')
-        """
-        tx.run(cy_child, id=props["id"], props=props)
-
-        # 2) Infer parent group (name, id)
-        parent_name, parent_id = infer_parent(ent)
-        if not parent_name:
-            continue
-
-        # 3) MERGE the parent node (same label, distinct id), tag it as level='parent'
-        cy_parent = f"""
-        MERGE (p:{label} {{id: $parent_id}})
-        ON CREATE SET p.name = $parent_name, p.level = 'parent'
-        """
-        tx.run(cy_parent, parent_id=parent_id, parent_name=parent_name)
-
-        # 4) MERGE the relationship: (child)-[:IS_A]->(parent)
-        cy_edge = f"""
-        MATCH (n:{label} {{id: $id}}), (p:{label} {{id: $parent_id}})
-        MERGE (n)-[:IS_A]->(p)
-        """
-        tx.run(cy_edge, id=props["id"], parent_id=parent_id)
-        """
-        prop_str = ', '.join([f'{k}: ${k}' for k in props])
-        cypher = f"MERGE (n:{label} {{id: $id}}) SET n += {{{prop_str}}}"
-        tx.run(cypher, **props)
-
-'''
\ No newline at end of file
+
+
+def load(args, driver=None):
+    """Run one import (full, incremental, withdraw or schema-only) with `driver` (default: the shared one)."""
+    driver = driver or neo4j_driver()
+    with driver.session() as session:
+        # constraints/indexes first, so no MERGE below ever runs as a label scan
+        # (labels outside the schema get theirs when the stream first reaches them)
+        schema_timings = ensure_schema(session)
+        print("Schema ready:\n" + format_timings(schema_timings))
+
+        start = time.perf_counter()
+        if args.schema_only:
+            pass
+        elif args.withdraw:
+            withdraw(session, args.withdraw, args.manifest)
+            print(f"Withdrew {args.withdraw} from the graph.")
+        elif args.incremental:
+            # diffing per-paper slices needs the whole extraction in memory
+            data = read_combined(args.input)
+            entities, relationships = data["entities"], data["relationships"]
+            ensure_schema(session, {e["type"] for e in entities})
+            synced = sync_graph(session, entities, relationships, args.manifest, args.batch_size)
+            print(f"Incremental import: {len(synced['added'])} added, {len(synced['changed'])} changed, "
+                  f"{len(synced['removed'])} removed, {synced['unchanged']} unchanged papers "
+                  f"({synced['entity_rows']} entity rows, {synced['relationship_rows']} relationship rows written).")
+            rollup = build_rollup(entities, relationships)
+            write_rollup(session, rollup, args.batch_size)
+            print("Parent groups:\n" + format_rollup(rollup))
+        else:
+            session.execute_write(reset_graph)
+            # one streaming pass: batches are written as they fill, hashes accumulate for the manifest
+            hasher = SliceHasher()
+            rollup_builder = RollupBuilder()
+
+            def records():
+                for kind, record in iter_records(args.input, follow=args.follow, timeout=args.follow_timeout):
+                    hasher.add(kind, record)
+                    rollup_builder.add(kind, record)
+                    yield kind, record
+
+            entity_count, relationship_count = stream_graph(
+                session, records(), args.batch_size, on_label=lambda label: ensure_label(session, label))
+            # parent groups and their aggregates, computed once over the whole stream
+            rollup = rollup_builder.result()
+            write_rollup(session, rollup, args.batch_size)
+            save_manifest(hasher.hashes(), args.manifest)
+            print(f"Loaded {entity_count} entities and {relationship_count} relationships.")
+            print("Parent groups:\n" + format_rollup(rollup))
+        print(f"Load time: {time.perf_counter() - start:.2f}s")
+        print("Write timings:\n" + summary())
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    set_trace_file(args.trace)
+
+    if args.follow and not is_ndjson(args.input):
+        parser.error("--follow needs an .ndjson input")
+
+    if args.mode == "bulk":
+        if args.incremental or args.withdraw or args.schema_only:
+            parser.error("--mode bulk always exports the full graph")
+        export_bulk(args)
+        return
+
+    # the driver (and its connection pool) is closed at exit by graph.driver
+    load(args)
+    print("Graph successfully imported!")
+
+
+if __name__ == "__main__":
+    main()
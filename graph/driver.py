@@ -0,0 +1,47 @@
+# graph/driver.py
+# One Neo4j driver per process (per URI / credentials), created on first use and
+# closed at exit. A driver owns the Bolt connection pool; building one per import
+# (or per call) pays the neo4j import and the connection handshakes every time.
+
+import atexit
+import os
+import threading
+
+NEO4J_URI = os.getenv("NEO4J_URI", "bolt://neo4j:7687")
+# same convention as the neo4j image: "none" (docker-compose), or "user/password"
+NEO4J_AUTH = os.getenv("NEO4J_AUTH", "none")
+NEO4J_USER = os.getenv("NEO4J_USER", "neo4j")
+NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD", "test1234")
+
+_lock = threading.Lock()
+_drivers = {}
+
+
+def default_auth():
+    """None when NEO4J_AUTH is "none", else (user, password) from NEO4J_AUTH or NEO4J_USER / NEO4J_PASSWORD."""
+    if NEO4J_AUTH.lower() == "none":
+        return None
+    if "/" in NEO4J_AUTH:
+        return tuple(NEO4J_AUTH.split("/", 1))
+    return NEO4J_USER, NEO4J_PASSWORD
+
+
+def neo4j_driver(uri=None, auth=None):
+    """The shared driver for `uri` (default NEO4J_URI); auth defaults to default_auth()."""
+    key = (uri or NEO4J_URI, auth or default_auth())
+    with _lock:
+        driver = _drivers.get(key)
+        if driver is None:
+            from neo4j import GraphDatabase
+
+            driver = _drivers[key] = GraphDatabase.driver(key[0], auth=key[1])
+    return driver
+
+
+@atexit.register
+def close_drivers():
+    with _lock:
+        drivers = list(_drivers.values())
+        _drivers.clear()
+    for driver in drivers:
+        driver.close()
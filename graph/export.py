@@ -0,0 +1,362 @@
+# graph/export.py
+# Offline bulk import: write the combined extraction as CSV files in the header
+# format `neo4j-admin database import full` expects, plus an import.sh that runs
+# the importer on them. For full rebuilds this replaces the transactional loader.
+#
+#   python -m graph.export combined-final-CHATGPT.ndjson ./import
+#   # neo4j stopped, same /data volume:
+#   sh ./import/import.sh
+#
+# Output (one file per label / relationship type):
+#   nodes-<label>.csv    :ID(Entity), id:long, <props>, level, sources:string[]
+#   rels-<TYPE>.csv      :START_ID(Entity), :END_ID(Entity), sources:string[]
+#   nodes-Evidence.csv   one row per (edge, quote, paper), like graph.loader
+#   nodes-groups.csv, rels-IS_A.csv, rels-TREATS_GROUP.csv   graph.rollup
+#
+# The graph matches what graph.loader writes: entity lines repeated across papers
+# are merged (sources unioned), each (head, TYPE, tail) becomes one edge tagged
+# with every paper asserting it. Merging needs the rows grouped, so records are
+# spilled to disk as sorted runs of at most `run_rows` and merged back with
+# heapq.merge: memory stays flat however large the input.
+
+import argparse
+import csv
+import heapq
+import json
+import os
+import pickle
+import re
+import shlex
+import tempfile
+import time
+from itertools import groupby
+
+from extract.trace import span
+from graph.loader import EVIDENCE_LABEL, UNKNOWN_SOURCE, evidence_id
+from graph.rollup import CONDITION, IS_A, TREATS_GROUP, RollupBuilder
+
+# every entity (and rollup group, keyed "group:...") shares one string ID space,
+# so relationship files need no labels; the integer id is its own property
+ID_SPACE = "Entity"
+ARRAY_DELIMITER = "|"
+DEFAULT_RUN_ROWS = int(os.getenv("EXPORT_RUN_ROWS", "200000"))
+DEFAULT_DATABASE = "neo4j"
+# (pickle batch size inside a spilled run; bounds merge memory to runs x batch)
+_SPILL_BATCH = 2000
+_EVIDENCE_COLUMNS = [("id", "string"), ("text", "string"), ("head", "long"), ("tail", "long"),
+                     ("rel_type", "string"), ("source", "string"), ("chunk", "long")]
+
+
+class SortedSpill:
+    """Collect (key, value) pairs; iterate them back sorted by key, spilling runs to a temp dir."""
+
+    def __init__(self, directory, run_rows=DEFAULT_RUN_ROWS):
+        self.directory = directory
+        self.run_rows = run_rows
+        self.buffer = []
+        self.runs = []
+        self.rows = 0
+
+    def add(self, key, value):
+        self.buffer.append((key, value))
+        self.rows += 1
+        if len(self.buffer) >= self.run_rows:
+            self._spill()
+
+    def _spill(self):
+        self.buffer.sort(key=_first)
+        fd, path = tempfile.mkstemp(suffix=".run", dir=self.directory)
+        with os.fdopen(fd, "wb") as f:
+            for i in range(0, len(self.buffer), _SPILL_BATCH):
+                pickle.dump(self.buffer[i:i + _SPILL_BATCH], f, pickle.HIGHEST_PROTOCOL)
+        self.runs.append(path)
+        self.buffer = []
+
+    @staticmethod
+    def _read(path):
+        with open(path, "rb") as f:
+            while True:
+                try:
+                    yield from pickle.load(f)
+                except EOFError:
+                    break
+        os.remove(path)
+
+    def __iter__(self):
+        self.buffer.sort(key=_first)  # the last run stays in memory
+        streams = [self._read(path) for path in self.runs] + [self.buffer]
+        return heapq.merge(*streams, key=_first)
+
+
+def _first(pair):
+    return pair[0]
+
+
+def safe_name(name) -> str:
+    """File-name-safe form of a label or relationship type."""
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", str(name))
+
+
+def _kind(value):
+    if isinstance(value, bool):
+        return "boolean"
+    if isinstance(value, int):
+        return "long"
+    if isinstance(value, float):
+        return "double"
+    if isinstance(value, (list, tuple)):
+        return "string[]"
+    return "string"
+
+
+def column_type(kinds: set) -> str:
+    """neo4j-admin type for a property seen with these value kinds (None = missing)."""
+    kinds = kinds - {None}
+    if kinds == {"long", "double"}:
+        return "double"
+    if len(kinds) == 1:
+        return next(iter(kinds))
+    return "string"
+
+
+def format_value(value, kind):
+    if value is None:
+        return None
+    if kind == "string[]":
+        items = value if isinstance(value, (list, tuple)) else [value]
+        # neo4j-admin has no escape for the array delimiter
+        return ARRAY_DELIMITER.join(str(v).replace(ARRAY_DELIMITER, "/") for v in items)
+    if kind == "boolean":
+        return "true" if value else "false"
+    if kind == "string" and isinstance(value, (dict, list, tuple)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+class _CsvFile:
+    """One CSV file with a typed neo4j-admin header; notes whether any field spans lines."""
+
+    def __init__(self, path, header):
+        self.path = path
+        self.rows = 0
+        self.multiline = False
+        self._f = open(path, "w", encoding="utf-8", newline="")
+        self._writer = csv.writer(self._f, lineterminator="\n")
+        self._writer.writerow(header)
+
+    def write(self, row):
+        if not self.multiline:
+            self.multiline = any(isinstance(v, str) and ("\n" in v or "\r" in v) for v in row)
+        self._writer.writerow(row)
+        self.rows += 1
+
+    def close(self):
+        self._f.close()
+
+
+def _merge_entity(lines):
+    """One node from the lines of one entity id (sources unioned, later fields win)."""
+    merged, sources = {}, []
+    for record in lines:
+        merged.update(record)
+        sources.extend(s for s in record.get("sources") or [] if s not in sources)
+    merged["sources"] = sources or [UNKNOWN_SOURCE]
+    return merged
+
+
+class CsvExporter:
+    """
+    Feed (kind, record) pairs with add(), then finish() writes the CSV files.
+
+    Only the per-label property kinds are kept in memory; records wait in
+    sorted spill runs under `work_dir` (default: a temp dir inside out_dir).
+    """
+
+    def __init__(self, out_dir, run_rows=DEFAULT_RUN_ROWS, work_dir=None, rollup=True):
+        self.out_dir = out_dir
+        self.rollup = RollupBuilder() if rollup else None
+        os.makedirs(out_dir, exist_ok=True)
+        self._tmp = tempfile.TemporaryDirectory(prefix=".export-", dir=work_dir or out_dir)
+        self.entities = SortedSpill(self._tmp.name, run_rows)
+        self.relationships = SortedSpill(self._tmp.name, run_rows)
+        self.properties = {}  # label -> {property: {kinds}}
+        self.files = {"nodes": [], "relationships": []}
+        self.counts = {"nodes": 0, "relationships": 0, "evidence": 0}
+
+    def add(self, kind, record):
+        if self.rollup is not None:
+            self.rollup.add(kind, record)
+        if kind == "entity":
+            label = record["type"]
+            props = {k: v for k, v in record.items() if k != "type"}
+            columns = self.properties.setdefault(label, {})
+            for key, value in props.items():
+                if key not in ("id", "sources", "level"):
+                    columns.setdefault(key, set()).add(None if value is None else _kind(value))
+            self.entities.add((label, record["id"]), props)
+        elif kind == "relationship":
+            self.relationships.add(
+                (record["type"].upper(), record["head"], record["tail"]),
+                (record.get("source") or UNKNOWN_SOURCE, record.get("evidence") or "", record.get("chunk")))
+
+    def _write_nodes(self):
+        current, label, columns = None, None, []
+        for (ent_label, _), pairs in groupby(self.entities, key=_first):
+            if ent_label != label:
+                if current is not None:
+                    current.close()
+                label = ent_label
+                kinds = self.properties[label]
+                columns = [(key, column_type(kinds[key])) for key in sorted(kinds)]
+                header = [f":ID({ID_SPACE})", "id:long"] + [f"{key}:{kind}" for key, kind in columns]
+                header += ["level", "sources:string[]"]
+                current = _CsvFile(os.path.join(self.out_dir, f"nodes-{safe_name(label)}.csv"), header)
+                self.files["nodes"].append((label, current))
+            ent = _merge_entity(value for _, value in pairs)
+            current.write([ent["id"], ent["id"]] + [format_value(ent.get(key), kind) for key, kind in columns]
+                          + ["child", format_value(ent["sources"], "string[]")])
+            self.counts["nodes"] += 1
+        if current is not None:
+            current.close()
+
+    def _write_relationships(self):
+        evidence = _CsvFile(os.path.join(self.out_dir, f"nodes-{EVIDENCE_LABEL}.csv"),
+                            [f"{key}:{kind}" for key, kind in _EVIDENCE_COLUMNS])
+        current, rel_type = None, None
+        for (group_type, head, tail), pairs in groupby(self.relationships, key=_first):
+            if group_type != rel_type:
+                if current is not None:
+                    current.close()
+                rel_type = group_type
+                header = [f":START_ID({ID_SPACE})", f":END_ID({ID_SPACE})", "sources:string[]"]
+                current = _CsvFile(os.path.join(self.out_dir, f"rels-{safe_name(rel_type)}.csv"), header)
+                self.files["relationships"].append((rel_type, current))
+            sources, quotes = [], set()
+            for _, (source, text, chunk) in pairs:
+                if source not in sources:
+                    sources.append(source)
+                if not text:
+                    continue
+                eid = evidence_id(head, tail, rel_type, text, source)
+                if eid not in quotes:
+                    quotes.add(eid)
+                    evidence.write([eid, text, head, tail, rel_type, source, chunk])
+            current.write([head, tail, format_value(sources, "string[]")])
+            self.counts["relationships"] += 1
+        if current is not None:
+            current.close()
+        evidence.close()
+        self.counts["evidence"] = evidence.rows
+        if evidence.rows:
+            self.files["nodes"].append((EVIDENCE_LABEL, evidence))
+        else:
+            os.remove(evidence.path)
+
+    def _write_rollup(self, rollup):
+        start, end = f":START_ID({ID_SPACE})", f":END_ID({ID_SPACE})"
+        counters = [key for key in rollup["groups"][0]["props"] if key.endswith("_count")]
+        groups = _CsvFile(os.path.join(self.out_dir, "nodes-groups.csv"),
+                          [f":ID({ID_SPACE})", "id:string", "name", "text", "level", *(f"{k}:long" for k in counters)])
+        for group in rollup["groups"]:
+            props = group["props"]
+            groups.write([group["id"], group["id"], props["name"], props["text"], props["level"],
+                          *(props[k] for k in counters)])
+        is_a = _CsvFile(os.path.join(self.out_dir, f"rels-{IS_A}.csv"), [start, end])
+        for row in rollup["is_a"]:
+            is_a.write([row["child"], row["parent"]])
+        treats = _CsvFile(os.path.join(self.out_dir, f"rels-{TREATS_GROUP}.csv"),
+                          [start, end, "conditions:long", "mentions:long", "sources:string[]"])
+        for row in rollup["treats_group"]:
+            treats.write([row["head"], row["parent"], row["conditions"], row["mentions"],
+                          format_value(row["sources"], "string[]")])
+        for f in (groups, is_a, treats):
+            f.close()
+        self.files["nodes"].append((CONDITION, groups))
+        self.files["relationships"] += [(IS_A, is_a), (TREATS_GROUP, treats)]
+        self.counts["groups"] = groups.rows
+
+    def finish(self, database=DEFAULT_DATABASE, import_dir=None) -> dict:
+        """Write the CSVs and import.sh; returns counts. `import_dir` is out_dir as the importer sees it."""
+        with span("export_nodes") as s:
+            self._write_nodes()
+            s.add("rows", self.counts["nodes"])
+        with span("export_relationships") as s:
+            self._write_relationships()
+            s.add("rows", self.counts["relationships"])
+            s.add("evidence_rows", self.counts["evidence"])
+        if self.rollup is not None:
+            with span("export_rollup") as s:
+                rollup = self.rollup.result()
+                if rollup["groups"]:
+                    self._write_rollup(rollup)
+                s.add("rows", len(rollup["is_a"]) + len(rollup["treats_group"]))
+        self._tmp.cleanup()
+        write_import_script(self.out_dir, self.files, database, import_dir)
+        return dict(self.counts)
+
+
+def import_command(out_dir, files, database=DEFAULT_DATABASE, import_dir=None) -> list:
+    """
+    The neo4j-admin argv for exported files ({"nodes": [(label, file)], "relationships": [...]}).
+    Paths are under `import_dir` (out_dir as the importer sees it), default out_dir's absolute path.
+    """
+    base = (import_dir or os.path.abspath(out_dir)).rstrip("/")
+
+    def where(csv_file):
+        return f"{base}/{os.path.basename(csv_file.path)}"
+
+    argv = ["neo4j-admin", "database", "import", "full",
+            "--overwrite-destination=true",
+            f"--array-delimiter={ARRAY_DELIMITER}",
+            # edges to entities that were never emitted are dropped, like graph.loader does
+            "--skip-bad-relationships=true",
+            "--skip-duplicate-nodes=true"]
+    if any(f.multiline for _, f in files["nodes"] + files["relationships"]):
+        argv.append("--multiline-fields=true")
+    argv.append(f"--report-file={base}/import.report")
+    argv += [f"--nodes={label}={where(f)}" for label, f in files["nodes"]]
+    argv += [f"--relationships={rel_type}={where(f)}" for rel_type, f in files["relationships"]]
+    argv.append(database)
+    return argv
+
+
+def write_import_script(out_dir, files, database=DEFAULT_DATABASE, import_dir=None):
+    path = os.path.join(out_dir, "import.sh")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("#!/bin/sh\n# generated by graph.export; run with the database stopped\nset -e\n")
+        f.write(" \\\n  ".join(shlex.quote(arg) for arg in import_command(out_dir, files, database, import_dir)) + "\n")
+    os.chmod(path, 0o755)
+    return path
+
+
+def export_csv(records, out_dir, run_rows=DEFAULT_RUN_ROWS, database=DEFAULT_DATABASE, import_dir=None) -> dict:
+    """Export a (kind, record) stream (extract.artifact.iter_records) to out_dir; returns counts."""
+    exporter = CsvExporter(out_dir, run_rows)
+    with span("export_spill") as s:
+        for kind, record in records:
+            exporter.add(kind, record)
+        s.add("rows", exporter.entities.rows + exporter.relationships.rows)
+    return exporter.finish(database, import_dir)
+
+
+def main():
+    from extract.artifact import iter_records
+
+    parser = argparse.ArgumentParser(description="Export the combined extraction for neo4j-admin database import.")
+    parser.add_argument("input", help="Combined extraction (.json or .ndjson).")
+    parser.add_argument("out_dir")
+    parser.add_argument("--database", default=DEFAULT_DATABASE)
+    parser.add_argument("--import-dir", help="Where out_dir is mounted for neo4j-admin (default: its local path).")
+    parser.add_argument("--run-rows", type=int, default=DEFAULT_RUN_ROWS,
+                        help="Rows held in memory before a sorted run is spilled to disk.")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    counts = export_csv(iter_records(args.input), args.out_dir, args.run_rows, args.database, args.import_dir)
+    print(f"Exported {counts['nodes']} entities, {counts['relationships']} relationships and "
+          f"{counts['evidence']} evidence nodes to {args.out_dir} in {time.perf_counter() - start:.2f}s")
+    print(f"Import with: sh {os.path.join(args.out_dir, 'import.sh')}")
+
+
+if __name__ == "__main__":
+    main()
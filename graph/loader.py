@@ -0,0 +1,264 @@
+# graph/loader.py
+# Batched Neo4j writes: rows are grouped by label / relationship type and sent
+# as `UNWIND $rows` batches through a small set of cached, parameterized statements.
+
+import hashlib
+import os
+from functools import lru_cache
+
+from extract.trace import span
+
+DEFAULT_BATCH_SIZE = int(os.getenv("GRAPH_BATCH_SIZE", "1000"))
+# source tag for rows from extraction files that predate per-paper tagging
+UNKNOWN_SOURCE = "unknown"
+# supporting quotes live on their own nodes instead of a growing string on the edge
+EVIDENCE_LABEL = "Evidence"
+
+
+def quote_name(name: str) -> str:
+    """Backtick-quote a label or relationship type (they cannot be query parameters)."""
+    return "`" + str(name).replace("`", "``") + "`"
+
+
+@lru_cache(maxsize=None)
+def entity_statement(label: str) -> str:
+    return f"""
+    UNWIND $rows AS row
+    MERGE (n:{quote_name(label)} {{id: row.id}})
+    SET n += row.props,
+        n.level = coalesce(n.level, 'child'),
+        n.sources = reduce(acc = coalesce(n.sources, []), s IN row.sources |
+                           CASE WHEN s IN acc THEN acc ELSE acc + s END)
+    """
+
+
+@lru_cache(maxsize=None)
+def relationship_statement(head_label: str, rel_type: str, tail_label: str) -> str:
+    return f"""
+    UNWIND $rows AS row
+    MATCH (a:{quote_name(head_label)} {{id: row.head_id}}), (b:{quote_name(tail_label)} {{id: row.tail_id}})
+    MERGE (a)-[r:{quote_name(rel_type)}]->(b)
+    // Tag the edge with every paper that asserts it
+    SET r.sources = CASE
+            WHEN row.source IN coalesce(r.sources, []) THEN r.sources
+            ELSE coalesce(r.sources, []) + row.source
+        END
+    """
+
+
+# One node per (edge, quote, paper), keyed by content hash: re-loading the same
+# quote is a single index lookup no matter how much evidence the edge has.
+# Fetch an edge's quotes with
+#   MATCH (e:Evidence {head: $head_id, tail: $tail_id, rel_type: 'TREATS'}) RETURN e.text, e.source, e.chunk
+EVIDENCE_STATEMENT = f"""
+UNWIND $rows AS row
+MERGE (e:{EVIDENCE_LABEL} {{id: row.id}})
+ON CREATE SET e += row.props
+"""
+
+
+def evidence_id(head, tail, rel_type, text, source) -> str:
+    key = "\x1f".join([str(head), str(tail), rel_type, text, source])
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def grouped_batches(items, key_fn, row_fn, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Yield (group_key, rows) with at most `batch_size` rows each.
+
+    Consumes `items` lazily: a group is flushed as soon as it fills up, so
+    only one partial batch per group is held in memory.
+    """
+    buffers = {}
+    for item in items:
+        key = key_fn(item)
+        if key is None:
+            continue
+        rows = buffers.setdefault(key, [])
+        rows.append(row_fn(item))
+        if len(rows) >= batch_size:
+            yield key, rows
+            buffers[key] = []
+    for key, rows in buffers.items():
+        if rows:
+            yield key, rows
+
+
+def entity_row(ent: dict) -> dict:
+    props = {k: v for k, v in ent.items() if k not in ("type", "sources")}
+    return {"id": props["id"], "props": props, "sources": ent.get("sources") or [UNKNOWN_SOURCE]}
+
+
+def entity_batches(entities, batch_size=DEFAULT_BATCH_SIZE):
+    return grouped_batches(entities, lambda e: e["type"], entity_row, batch_size)
+
+
+def relationship_group(rel: dict, labels: dict):
+    """(head label, REL_TYPE, tail label), or None when either end is unknown."""
+    head_label = labels.get(rel["head"])
+    tail_label = labels.get(rel["tail"])
+    if head_label is None or tail_label is None:
+        return None
+    return head_label, rel["type"].upper(), tail_label
+
+
+def relationship_row(rel: dict) -> dict:
+    return {"head_id": rel["head"], "tail_id": rel["tail"], "evidence": rel.get("evidence") or "",
+            "source": rel.get("source") or UNKNOWN_SOURCE, "chunk": rel.get("chunk")}
+
+
+def relationship_batches(relationships, labels: dict, batch_size=DEFAULT_BATCH_SIZE):
+    """`labels` maps entity id -> label; relationships to unknown ids are skipped."""
+    return grouped_batches(relationships, lambda rel: relationship_group(rel, labels), relationship_row, batch_size)
+
+
+def record_batches(records, labels=None, batch_size=DEFAULT_BATCH_SIZE, max_pending=None):
+    """
+    Batches from one interleaved stream of (kind, record) pairs (extract.artifact).
+
+    Yields ("entity", label, rows) and ("relationship", group, rows). Pending
+    entity batches are always flushed before a relationship batch, so every
+    edge's endpoints exist when it is written. Besides the id -> label map, at
+    most `max_pending` rows (default 100 batches) wait in partial batches; past
+    that the fullest relationship group is flushed early. Other kinds are ignored.
+    """
+    labels = {} if labels is None else labels
+    max_pending = max_pending or 100 * batch_size
+    entity_buffers, relationship_buffers = {}, {}
+    pending = 0
+
+    def flush_entities():
+        nonlocal pending
+        for label, rows in entity_buffers.items():
+            if rows:
+                pending -= len(rows)
+                yield "entity", label, rows
+        entity_buffers.clear()
+
+    def flush_relationships(group):
+        nonlocal pending
+        yield from flush_entities()
+        rows = relationship_buffers.pop(group)
+        pending -= len(rows)
+        yield "relationship", group, rows
+
+    for kind, record in records:
+        if kind == "entity":
+            label = record["type"]
+            labels[record["id"]] = label
+            rows = entity_buffers.setdefault(label, [])
+            rows.append(entity_row(record))
+            pending += 1
+            if len(rows) >= batch_size:
+                pending -= len(rows)
+                yield "entity", label, rows
+                entity_buffers[label] = []
+        elif kind == "relationship":
+            group = relationship_group(record, labels)
+            if group is None:
+                continue
+            rows = relationship_buffers.setdefault(group, [])
+            rows.append(relationship_row(record))
+            pending += 1
+            if len(rows) >= batch_size:
+                yield from flush_relationships(group)
+        if pending >= max_pending and relationship_buffers:
+            yield from flush_relationships(max(relationship_buffers, key=lambda g: len(relationship_buffers[g])))
+    yield from flush_entities()
+    for group in list(relationship_buffers):
+        yield from flush_relationships(group)
+
+
+def evidence_rows(rel_type, rows):
+    """Evidence node rows for one relationship batch, deduplicated within the batch."""
+    out = {}
+    for row in rows:
+        text = row["evidence"]
+        if not text:
+            continue
+        eid = evidence_id(row["head_id"], row["tail_id"], rel_type, text, row["source"])
+        out[eid] = {"id": eid, "props": {
+            "text": text,
+            "head": row["head_id"],
+            "tail": row["tail_id"],
+            "rel_type": rel_type,
+            "source": row["source"],
+            "chunk": row["chunk"],
+        }}
+    return list(out.values())
+
+
+# one span per batch attempt: a transaction the driver retries shows up twice
+def write_entity_batch(tx, label, rows):
+    with span("insert_entities", label=label) as s:
+        tx.run(entity_statement(label), rows=rows).consume()
+        s.add("rows", len(rows))
+
+
+def write_relationship_batch(tx, group, rows):
+    with span("insert_relationships", rel_type=group[1]) as s:
+        tx.run(relationship_statement(*group), rows=rows).consume()
+        evidence = evidence_rows(group[1], rows)
+        if evidence:
+            tx.run(EVIDENCE_STATEMENT, rows=evidence).consume()
+        s.add("rows", len(rows))
+        s.add("evidence_rows", len(evidence))
+
+
+# Create Entities
+def insert_entities(tx, entities, batch_size=DEFAULT_BATCH_SIZE):
+    count = 0
+    for label, rows in entity_batches(entities, batch_size):
+        write_entity_batch(tx, label, rows)
+        count += len(rows)
+    return count
+
+
+# Create Relationships
+def insert_relationships(tx, relationships, entities, batch_size=DEFAULT_BATCH_SIZE):
+    labels = {e["id"]: e["type"] for e in entities}
+    count = 0
+    for group, rows in relationship_batches(relationships, labels, batch_size):
+        write_relationship_batch(tx, group, rows)
+        count += len(rows)
+    return count
+
+
+def load_graph(session, entities, relationships, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Write entities then relationships, one transaction per batch so a large
+    import never builds a single huge transaction state on the server.
+    Returns (entity_rows, relationship_rows).
+    """
+    labels = {}
+    entity_count = 0
+    for label, rows in entity_batches(entities, batch_size):
+        session.execute_write(write_entity_batch, label, rows)
+        labels.update((row["id"], label) for row in rows)
+        entity_count += len(rows)
+
+    relationship_count = 0
+    for group, rows in relationship_batches(relationships, labels, batch_size):
+        session.execute_write(write_relationship_batch, group, rows)
+        relationship_count += len(rows)
+    return entity_count, relationship_count
+
+
+def stream_graph(session, records, batch_size=DEFAULT_BATCH_SIZE, on_label=None):
+    """
+    load_graph for a (kind, record) stream: one pass, flat memory, one transaction
+    per batch. `on_label(label)` is called before the first write to a new label
+    (e.g. to create its constraint). Returns (entity_rows, relationship_rows).
+    """
+    seen = set()
+    counts = {"entity": 0, "relationship": 0}
+    for kind, group, rows in record_batches(records, batch_size=batch_size):
+        if kind == "entity":
+            if group not in seen and on_label is not None:
+                on_label(group)
+            seen.add(group)
+            session.execute_write(write_entity_batch, group, rows)
+        else:
+            session.execute_write(write_relationship_batch, group, rows)
+        counts[kind] += len(rows)
+    return counts["entity"], counts["relationship"]
@@ -0,0 +1,392 @@
+# graph/query.py
+# In-process read API over the knowledge graph.
+#
+# The combined extraction (or the Neo4j graph itself) is loaded once into
+# array-backed structures:
+#
+#   - entities get dense indices 0..N-1 (ids / types / texts arrays)
+#   - per relationship type, CSR adjacency in both directions: the distinct
+#     neighbors of entity i are indices[indptr[i]:indptr[i + 1]], and a second
+#     CSR level maps each (head, tail) pair to the relationship records behind
+#     it (evidence, source paper)
+#   - canonical text (extract.normalize.canonical_text) -> entity indices, so
+#     "SSRIs", "ssri" and "SSRI" find the same node
+#
+# Neighbor, 2-hop and path queries are array slices, and QueryService keeps an
+# LRU cache of results on top. The cache is dropped whenever the graph manifest
+# (graph_manifest.json, rewritten by generate_graph.py at the end of every full,
+# incremental or withdraw import) changes, and the index is rebuilt on next use.
+#
+#   service = QueryService(combined_loader("combined-final-CHATGPT.json"))
+#   service.neighbors("anxious depression", "treats", direction="in")   # what treats it
+#   service.treatment_outcomes("anxious depression")                    # medication -> condition -> outcome
+#
+#   python -m graph.query --input combined-final-CHATGPT.json in treats "anxious depression"
+
+import argparse
+import bisect
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from extract.artifact import read_combined
+from extract.normalize import canonical_text, normalize_text
+from graph.incremental import DEFAULT_MANIFEST_PATH
+from graph.loader import EVIDENCE_LABEL
+
+DEFAULT_CACHE_SIZE = int(os.getenv("GRAPH_QUERY_CACHE_SIZE", "4096"))
+DIRECTIONS = ("out", "in", "both")
+_EMPTY = np.zeros(0, dtype=np.int64)
+
+
+def _csr(rows, cols, n):
+    """(indptr, indices, order) for n rows; order maps CSR slots back to the input positions."""
+    order = np.argsort(rows, kind="stable")
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n), out=indptr[1:])
+    return indptr, cols[order], order
+
+
+class Adjacency:
+    """One relationship type: distinct neighbors per entity in both directions, plus the edges per pair."""
+
+    def __init__(self, heads, tails, n):
+        # distinct (head, tail) pairs; pair_edges groups the relationship records of each pair
+        keys = heads * n + tails
+        pairs, inverse = np.unique(keys, return_inverse=True)
+        self.pair_ptr, self.pair_edges, _ = _csr(inverse, np.arange(len(keys), dtype=np.int64), len(pairs))
+        pair_heads, pair_tails = pairs // n, pairs % n
+        self.out_ptr, self.out_idx, out_order = _csr(pair_heads, pair_tails, n)
+        self.in_ptr, self.in_idx, _ = _csr(pair_tails, pair_heads, n)
+        self.out_pair = out_order  # CSR slot (out direction) -> pair number
+        self.pairs = len(pairs)
+
+    def neighbors(self, i, direction="out"):
+        if direction == "out":
+            return self.out_idx[self.out_ptr[i]:self.out_ptr[i + 1]]
+        if direction == "in":
+            return self.in_idx[self.in_ptr[i]:self.in_ptr[i + 1]]
+        return np.union1d(self.neighbors(i, "out"), self.neighbors(i, "in"))
+
+    def edges(self, head, tail):
+        """Edge numbers (in the order the type's relationships were given) of every record for head -> tail."""
+        start, end = self.out_ptr[head], self.out_ptr[head + 1]
+        slot = start + np.searchsorted(self.out_idx[start:end], tail)
+        if slot >= end or self.out_idx[slot] != tail:
+            return _EMPTY
+        pair = self.out_pair[slot]
+        return self.pair_edges[self.pair_ptr[pair]:self.pair_ptr[pair + 1]]
+
+
+class GraphIndex:
+    """Read-only, array-backed snapshot of the graph (see the module comment)."""
+
+    def __init__(self, entities, relationships):
+        self.ids = [e["id"] for e in entities]
+        self.index_of = {eid: i for i, eid in enumerate(self.ids)}
+        self.texts = [e.get("text") or "" for e in entities]
+        raw_types = [e.get("type") for e in entities]
+        normalized = {t: normalize_text(t) for t in set(raw_types)}
+        self.type_names = sorted(set(normalized.values()))
+        type_code = {raw: self.type_names.index(t) for raw, t in normalized.items()}
+        self.types = np.fromiter((type_code[t] for t in raw_types), dtype=np.int16, count=len(raw_types))
+        self.entities = entities
+        n = len(entities)
+
+        by_text = {}
+        for i, text in enumerate(self.texts):
+            by_text.setdefault(canonical_text(text), []).append(i)
+        self.by_text = {k: np.array(v, dtype=np.int64) for k, v in by_text.items()}
+        self._text_keys = sorted(self.by_text)
+
+        # relationships to unknown entities are dropped, like the loader does
+        self.relationships = relationships
+        count = len(relationships)
+        index_of = self.index_of
+        heads = np.fromiter((index_of.get(r.get("head"), -1) for r in relationships), dtype=np.int64, count=count)
+        tails = np.fromiter((index_of.get(r.get("tail"), -1) for r in relationships), dtype=np.int64, count=count)
+        codes = {}
+        rel_codes = np.fromiter((codes.setdefault(r.get("type"), len(codes)) for r in relationships),
+                                dtype=np.int32, count=count)
+        valid = (heads >= 0) & (tails >= 0)
+        by_type = {}
+        for raw, code in codes.items():
+            by_type.setdefault(str(raw or "").lower(), []).append(code)
+        self.positions = {}  # rel type -> positions in self.relationships, in Adjacency edge order
+        self.adjacency = {}
+        for rel_type, type_codes in by_type.items():
+            positions = np.flatnonzero(valid & np.isin(rel_codes, type_codes))
+            if len(positions):
+                self.positions[rel_type] = positions
+                self.adjacency[rel_type] = Adjacency(heads[positions], tails[positions], n)
+
+    @classmethod
+    def from_combined(cls, data: dict):
+        return cls(data.get("entities") or [], data.get("relationships") or [])
+
+    @classmethod
+    def from_neo4j(cls, session):
+        """
+        Snapshot of a loaded graph. Evidence nodes and graph.rollup parent groups
+        (with their IS_A / TREATS_GROUP edges) are excluded; edge evidence is not fetched.
+        """
+        entities = [dict(r) for r in session.run(
+            f"MATCH (n) WHERE n.id IS NOT NULL AND NOT n:{EVIDENCE_LABEL} AND coalesce(n.level, '') <> 'parent' "
+            "RETURN n.id AS id, labels(n)[0] AS type, n.text AS text")]
+        relationships = [dict(r) for r in session.run(
+            f"MATCH (a)-[r]->(b) WHERE NOT a:{EVIDENCE_LABEL} AND NOT b:{EVIDENCE_LABEL} "
+            "AND coalesce(b.level, '') <> 'parent' "
+            "RETURN a.id AS head, b.id AS tail, toLower(type(r)) AS type, r.sources AS sources")]
+        return cls(entities, relationships)
+
+    def __len__(self):
+        return len(self.ids)
+
+    # lookups
+
+    def resolve(self, entity, entity_type=None):
+        """Entity indices for an entity id or a text (every entity with that canonical text)."""
+        if isinstance(entity, str) and entity not in self.index_of:
+            found = self.by_text.get(canonical_text(entity), _EMPTY)
+        else:
+            i = self.index_of.get(entity)
+            found = _EMPTY if i is None else np.array([i], dtype=np.int64)
+        if entity_type is not None and len(found):
+            code = self.type_names.index(entity_type) if entity_type in self.type_names else -1
+            found = found[self.types[found] == code]
+        return found
+
+    def search(self, prefix, limit=20) -> list:
+        """Canonical texts starting with `prefix`, in sorted order."""
+        prefix = canonical_text(prefix)
+        start = bisect.bisect_left(self._text_keys, prefix)
+        out = []
+        for key in self._text_keys[start:start + limit]:
+            if not key.startswith(prefix):
+                break
+            out.append(key)
+        return out
+
+    def entity(self, i) -> dict:
+        return self.entities[i]
+
+    # traversal (entity indices in, entity indices out)
+
+    def _step(self, nodes, rel_types, direction):
+        parts = []
+        for rel_type in rel_types or self.adjacency:
+            adjacency = self.adjacency.get(rel_type)
+            if adjacency is None:
+                continue
+            parts.extend(adjacency.neighbors(i, direction) for i in nodes)
+        if not parts:
+            return _EMPTY
+        return parts[0] if len(parts) == 1 else np.unique(np.concatenate(parts))
+
+    def neighbors(self, entity, rel_type=None, direction="out"):
+        rel_types = [rel_type] if isinstance(rel_type, str) else rel_type
+        return self._step(self.resolve(entity), rel_types, direction)
+
+    def two_hop(self, entity, rel_types=None, direction="both"):
+        """Entities exactly two hops away (not the start, not its direct neighbors)."""
+        start = self.resolve(entity)
+        first = self._step(start, rel_types, direction)
+        second = self._step(first, rel_types, direction)
+        return np.setdiff1d(second, np.union1d(first, start))
+
+    def paths(self, entity, hops):
+        """
+        Every path from `entity` along `hops`, a list of (rel_type, direction),
+        as an (n_paths, len(hops) + 1) array of entity indices.
+        """
+        frontier = self.resolve(entity)[:, None]
+        for rel_type, direction in hops:
+            adjacency = self.adjacency.get(rel_type)
+            if adjacency is None or not len(frontier):
+                return np.zeros((0, len(hops) + 1), dtype=np.int64)
+            nexts = [adjacency.neighbors(i, direction) for i in frontier[:, -1]]
+            counts = np.fromiter((len(x) for x in nexts), dtype=np.int64, count=len(nexts))
+            if not counts.sum():
+                return np.zeros((0, len(hops) + 1), dtype=np.int64)
+            frontier = np.column_stack([np.repeat(frontier, counts, axis=0), np.concatenate(nexts)])
+        return frontier
+
+    def treatment_outcomes(self, condition):
+        """(treatment, condition, outcome) index rows: treatment treats condition and has that outcome."""
+        return self.paths(condition, [("treats", "in"), ("has_outcome", "out")])[:, [1, 0, 2]]
+
+    def evidence(self, head, rel_type, tail) -> list:
+        """Relationship records (evidence, source paper, chunk) behind head -[rel_type]-> tail."""
+        adjacency = self.adjacency.get(rel_type)
+        if adjacency is None:
+            return []
+        positions = self.positions[rel_type]
+        return [self.relationships[positions[k]]
+                for h in self.resolve(head) for t in self.resolve(tail) for k in adjacency.edges(h, t)]
+
+
+def import_stamp(path):
+    """Identity of the manifest generate_graph.py rewrites after every import (None if there is none)."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_ino, st.st_size
+
+
+class QueryService:
+    """
+    Cached queries over a GraphIndex built by `load()`.
+
+    Results are tuples of entity ids (or of id tuples for paths), kept in an
+    LRU of `cache_size` entries. At most every `check_interval` seconds the
+    import manifest is stat'ed; if an import rewrote it since the index was
+    built, the cache is dropped and the index rebuilt. invalidate() does the
+    same on demand.
+    """
+
+    def __init__(self, load, manifest_path=DEFAULT_MANIFEST_PATH, cache_size=DEFAULT_CACHE_SIZE,
+                 check_interval=1.0):
+        self.load = load
+        self.manifest_path = manifest_path
+        self.cache_size = cache_size
+        self.check_interval = check_interval
+        self.hits = 0
+        self.misses = 0
+        self.rebuilds = 0
+        self._cache = OrderedDict()
+        self._lock = threading.RLock()
+        self._index = None
+        self._stamp = None
+        self._checked = 0.0
+
+    @property
+    def index(self) -> GraphIndex:
+        now = time.monotonic()
+        if self._index is not None and now - self._checked < self.check_interval:
+            return self._index
+        with self._lock:
+            stamp = import_stamp(self.manifest_path)
+            if self._index is None or stamp != self._stamp:
+                self._cache.clear()
+                self._index = self.load()
+                self._stamp = stamp
+                self.rebuilds += 1
+            self._checked = now
+            return self._index
+
+    def invalidate(self):
+        with self._lock:
+            self._cache.clear()
+            self._index = None
+
+    def _cached(self, key, compute):
+        index = self.index
+        with self._lock:
+            hit = self._cache.get(key)
+            if hit is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return hit
+        value = compute(index)
+        with self._lock:
+            if self._index is index:  # not invalidated meanwhile
+                self._cache[key] = value
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+            self.misses += 1
+        return value
+
+    @staticmethod
+    def _ids(index, found):
+        return tuple(index.ids[i] for i in found)
+
+    def lookup(self, text, entity_type=None) -> tuple:
+        return self._cached(("lookup", text, entity_type),
+                            lambda g: self._ids(g, g.resolve(text, entity_type)))
+
+    def neighbors(self, entity, rel_type=None, direction="out") -> tuple:
+        if direction not in DIRECTIONS:
+            raise ValueError(f"direction must be one of {DIRECTIONS}")
+        return self._cached(("neighbors", entity, rel_type, direction),
+                            lambda g: self._ids(g, g.neighbors(entity, rel_type, direction)))
+
+    def two_hop(self, entity, rel_types=None, direction="both") -> tuple:
+        rel_types = tuple(rel_types) if rel_types else None
+        return self._cached(("two_hop", entity, rel_types, direction),
+                            lambda g: self._ids(g, g.two_hop(entity, rel_types, direction)))
+
+    def treatment_outcomes(self, condition) -> tuple:
+        return self._cached(("treatment_outcomes", condition),
+                            lambda g: tuple(self._ids(g, row) for row in g.treatment_outcomes(condition)))
+
+    def entity(self, entity_id) -> dict | None:
+        index = self.index
+        i = index.index_of.get(entity_id)
+        return None if i is None else index.entity(i)
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "cached": len(self._cache), "rebuilds": self.rebuilds}
+
+
+def combined_loader(path):
+    """load() for QueryService from a combined extraction (.json or .ndjson)."""
+    return lambda: GraphIndex.from_combined(read_combined(path))
+
+
+def neo4j_loader(driver, database=None):
+    """load() for QueryService from a running graph."""
+    def load():
+        with driver.session(database=database) as session:
+            return GraphIndex.from_neo4j(session)
+    return load
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the knowledge graph from a combined extraction.")
+    parser.add_argument("--input", default="combined-final-CHATGPT.json",
+                        help="Combined extraction (.json or .ndjson).")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name, help_text in (("out", "Entities the given entity points to."),
+                            ("in", "Entities pointing to the given entity."),
+                            ("two-hop", "Entities two hops away (either direction).")):
+        p = sub.add_parser(name, help=help_text)
+        p.add_argument("rel_type", help="Relationship type (e.g. treats), or 'any'.")
+        p.add_argument("entity", help="Entity text or id.")
+    p = sub.add_parser("outcomes", help="Treatments of a condition with their outcomes.")
+    p.add_argument("entity", help="Condition text or id.")
+    p = sub.add_parser("search", help="Entity texts starting with a prefix.")
+    p.add_argument("prefix")
+    args = parser.parse_args()
+
+    index = GraphIndex.from_combined(read_combined(args.input))
+    entity = getattr(args, "entity", None)
+    if entity is not None and entity.isdigit():
+        entity = int(entity)
+
+    def describe(i):
+        e = index.entity(i)
+        return f"{e['text']} ({e['type']}, id {e['id']})"
+
+    if args.command == "search":
+        for text in index.search(args.prefix):
+            print(text)
+        return
+    if args.command == "outcomes":
+        for treatment, condition, outcome in index.treatment_outcomes(entity):
+            print(f"{describe(treatment)} -> {describe(condition)} -> {describe(outcome)}")
+        return
+    rel_type = None if args.rel_type == "any" else args.rel_type
+    if args.command == "two-hop":
+        found = index.two_hop(entity, [rel_type] if rel_type else None)
+    else:
+        found = index.neighbors(entity, rel_type, args.command)
+    for i in found:
+        print(describe(i))
+
+
+if __name__ == "__main__":
+    main()
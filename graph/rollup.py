@@ -0,0 +1,300 @@
+# graph/rollup.py
+# Parent groups for medical conditions ("anxious depression" IS_A Depression,
+# F41.1 IS_A Anxiety disorders) and aggregates materialized on them, computed
+# once per import instead of by variable-length traversals at query time:
+#
+#   (:medical_condition {level: 'parent', id: 'group:anxiety', name: 'Anxiety disorders',
+#                        member_count, medication_count, treatment_count, outcome_count, treats_count})
+#   (child:medical_condition)-[:IS_A]->(group)
+#   (medication | treatment_type)-[:TREATS_GROUP {conditions, mentions, sources}]->(group)
+#
+# "All treatments for any anxiety disorder" is then one hop:
+#   MATCH (t)-[r:TREATS_GROUP]->(:medical_condition {id: 'group:anxiety'})
+#   RETURN t.text, r.conditions, r.mentions ORDER BY r.mentions DESC
+#
+# Classification is one pass for all conditions: an ICD-10 code prefix wins,
+# otherwise one combined regex runs over all condition texts joined together and
+# the rightmost match in the head phrase decides ("anxious depression" is a kind
+# of depression, not of anxiety). Aggregates are numpy group-bys over the edges.
+#
+#   python -m graph.rollup --input combined-final-CHATGPT.json [group]
+
+import argparse
+import re
+from array import array
+
+import numpy as np
+
+from extract.trace import span
+from graph.loader import DEFAULT_BATCH_SIZE, UNKNOWN_SOURCE, grouped_batches, quote_name
+
+CONDITION = "medical_condition"
+IS_A = "IS_A"
+TREATS_GROUP = "TREATS_GROUP"
+
+# (name, group id, text pattern, ICD-10 prefixes)
+PARENT_RULES = [
+    ("Depression", "group:depression", r"\bdepress|\bdysthymi|\bmdd\b", ("F32", "F33", "F34.1")),
+    ("Anxiety disorders", "group:anxiety", r"\banx|\bpanic|\bphobi|\bgad\b", ("F40", "F41")),
+    ("Bipolar disorder", "group:bipolar", r"\bbipolar|\bmani[ac]", ("F31",)),
+    ("Post-traumatic stress disorder", "group:ptsd", r"\bpost-?traumatic|\bptsd\b", ("F43.1",)),
+    ("Obsessive-compulsive disorder", "group:ocd", r"\bobsessive|\bocd\b", ("F42",)),
+]
+
+_RULE_PATTERN = re.compile("|".join(f"(?P<g{i}>{rule[2]})" for i, rule in enumerate(PARENT_RULES)), re.I)
+_ICD_PREFIXES = {prefix.upper(): i for i, rule in enumerate(PARENT_RULES) for prefix in rule[3]}
+# "depression with anxious distress": only the head phrase decides
+_QUALIFIER = re.compile(r"\s+(?:with|without|in|among|after|during|due to)\s.*$", re.I)
+
+# relationship kinds the aggregates need; everything else is not stored
+_REL_CODES = {"treats": 0, "has_outcome": 1, "affects": 2}
+_TREATERS = ("medication", "treatment_type")
+
+
+def icd_group(code) -> int:
+    """Rule index for an ICD-10 code by its longest known prefix, or -1."""
+    if not code:
+        return -1
+    code = str(code).strip().upper()
+    for length in (5, 3):
+        i = _ICD_PREFIXES.get(code[:length])
+        if i is not None:
+            return i
+    return -1
+
+
+def classify(texts, codes=None) -> np.ndarray:
+    """Rule index per condition (-1 = no parent): ICD prefix first, else the rightmost text match."""
+    n = len(texts)
+    groups = np.full(n, -1, dtype=np.int64)
+    if not n:
+        return groups
+    heads = [_QUALIFIER.sub("", (t or "").replace("\n", " ")) for t in texts]
+    starts = np.cumsum([0] + [len(h) + 1 for h in heads[:-1]])
+    matches = [(m.start(), int(m.lastgroup[1:])) for m in _RULE_PATTERN.finditer("\n".join(heads))]
+    if matches:
+        positions, rules = np.array(matches, dtype=np.int64).T
+        owner = np.searchsorted(starts, positions, side="right") - 1
+        # last match per condition = first in the reversed arrays
+        _, last = np.unique(owner[::-1], return_index=True)
+        groups[owner[::-1][last]] = rules[::-1][last]
+    if codes is not None:
+        by_code = np.fromiter((icd_group(c) for c in codes), dtype=np.int64, count=n)
+        groups = np.where(by_code >= 0, by_code, groups)
+    return groups
+
+
+class RollupBuilder:
+    """
+    Collects what the rollup needs from a (kind, record) stream, like
+    graph.incremental.SliceHasher: the condition texts / codes, every entity's
+    type, and treats / has_outcome / affects edges as packed integer arrays.
+    Entity ids must be integers (as extraction produces them).
+    """
+
+    def __init__(self):
+        self.conditions = {}  # id -> (text, code); later lines win, as in read_combined
+        self.types = {}       # entity type -> code
+        self._ent_ids, self._ent_types = array("q"), array("b")
+        self._heads, self._tails, self._kinds, self._sources = array("q"), array("q"), array("b"), array("q")
+        self.sources = {}     # source paper -> code
+
+    def add(self, kind, record):
+        if kind == "entity":
+            entity_type = record["type"]
+            self._ent_ids.append(record["id"])
+            self._ent_types.append(self.types.setdefault(entity_type, len(self.types)))
+            if entity_type == CONDITION:
+                known = self.conditions.get(record["id"], (None, None))
+                self.conditions[record["id"]] = (record.get("text", known[0]), record.get("code", known[1]))
+        elif kind == "relationship":
+            code = _REL_CODES.get(record["type"].lower())
+            if code is None:
+                return
+            self._heads.append(record["head"])
+            self._tails.append(record["tail"])
+            self._kinds.append(code)
+            self._sources.append(self.sources.setdefault(record.get("source") or UNKNOWN_SOURCE, len(self.sources)))
+
+    def result(self) -> dict:
+        """{"groups": [...], "is_a": [...], "treats_group": [...]} rows, ready for write_rollup."""
+        cond_ids = np.fromiter(self.conditions, dtype=np.int64, count=len(self.conditions))
+        rule_of = classify([t for t, _ in self.conditions.values()], [c for _, c in self.conditions.values()])
+        keep = rule_of >= 0
+        cond_ids, rule_of = cond_ids[keep], rule_of[keep]
+        order = np.argsort(cond_ids)
+        cond_ids, rule_of = cond_ids[order], rule_of[order]
+
+        ent_ids = np.frombuffer(self._ent_ids, dtype=np.int64)
+        ent_types = np.frombuffer(self._ent_types, dtype=np.int8)
+        order = np.argsort(ent_ids, kind="stable")
+        ent_ids, ent_types = ent_ids[order], ent_types[order]
+        type_names = {code: name for name, code in self.types.items()}
+
+        def lookup(keys, values, ids, missing=-1):
+            pos = np.searchsorted(keys, ids)
+            pos_ok = np.minimum(pos, max(len(keys) - 1, 0))
+            found = (pos < len(keys)) & (keys[pos_ok] == ids) if len(keys) else np.zeros(len(ids), bool)
+            return np.where(found, values[pos_ok] if len(keys) else missing, missing)
+
+        heads = np.frombuffer(self._heads, dtype=np.int64)
+        tails = np.frombuffer(self._tails, dtype=np.int64)
+        kinds = np.frombuffer(self._kinds, dtype=np.int8)
+        sources = np.frombuffer(self._sources, dtype=np.int64)
+        head_types = lookup(ent_ids, ent_types, heads)
+        tail_group = lookup(cond_ids, rule_of, tails)
+        head_group = lookup(cond_ids, rule_of, heads)
+
+        # treats into a member: (group, treater, condition, source)
+        t = (kinds == _REL_CODES["treats"]) & (tail_group >= 0)
+        tg, th, tt, ts, tk = tail_group[t], heads[t], tails[t], sources[t], head_types[t]
+        pairs, pair_of, mentions = np.unique(np.stack([tg, th]), axis=1, return_inverse=True, return_counts=True)
+        conditions = np.bincount(np.unique(np.stack([pair_of, tt]), axis=1)[0], minlength=pairs.shape[1])
+        pair_sources = np.unique(np.stack([pair_of, ts]), axis=1)
+        source_names = list(self.sources)
+        pair_types = np.zeros(pairs.shape[1], dtype=np.int64)
+        pair_types[pair_of] = tk
+
+        # outcomes: member -[has_outcome|affects]-> o, and treater -[has_outcome]-> o for the group's treaters
+        outcome_code = self.types.get("outcome", -2)
+        o = (kinds != _REL_CODES["treats"]) & (head_group >= 0)
+        direct = np.stack([head_group[o], tails[o]])
+        ho = kinds == _REL_CODES["has_outcome"]
+        ho_heads, ho_tails = heads[ho], tails[ho]
+        ho_order = np.argsort(ho_heads, kind="stable")
+        ho_heads, ho_tails = ho_heads[ho_order], ho_tails[ho_order]
+        lo = np.searchsorted(ho_heads, pairs[1], side="left")
+        hi = np.searchsorted(ho_heads, pairs[1], side="right")
+        counts = hi - lo
+        offsets = np.repeat(lo - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+        via = np.stack([np.repeat(pairs[0], counts), ho_tails[offsets]])
+        outcomes = np.unique(np.concatenate([direct, via], axis=1), axis=1)
+        outcomes = outcomes[:, lookup(ent_ids, ent_types, outcomes[1]) == outcome_code]
+
+        n_rules = len(PARENT_RULES)
+        member_count = np.bincount(rule_of, minlength=n_rules)
+        treater_counts = {
+            name: np.bincount(pairs[0][pair_types == self.types[name]], minlength=n_rules)
+            if name in self.types else np.zeros(n_rules, dtype=np.int64)
+            for name in _TREATERS
+        }
+        outcome_count = np.bincount(outcomes[0], minlength=n_rules)
+        treats_count = np.bincount(tg, minlength=n_rules)
+
+        groups = [
+            {"id": rule[1], "props": {
+                "name": rule[0], "text": rule[0], "level": "parent",
+                "member_count": int(member_count[i]),
+                "medication_count": int(treater_counts["medication"][i]),
+                "treatment_count": int(treater_counts["treatment_type"][i]),
+                "outcome_count": int(outcome_count[i]),
+                "treats_count": int(treats_count[i]),
+            }}
+            for i, rule in enumerate(PARENT_RULES) if member_count[i]
+        ]
+        is_a = [{"child": int(c), "parent": PARENT_RULES[r][1]} for c, r in zip(cond_ids, rule_of)]
+        starts = np.searchsorted(pair_sources[0], np.arange(pairs.shape[1] + 1))
+        treats_group = [
+            {"head": int(pairs[1, k]), "head_label": type_names.get(int(pair_types[k])),
+             "parent": PARENT_RULES[pairs[0, k]][1], "conditions": int(conditions[k]), "mentions": int(mentions[k]),
+             "sources": [source_names[s] for s in pair_sources[1, starts[k]:starts[k + 1]]]}
+            for k in range(pairs.shape[1])
+        ]
+        return {"groups": groups, "is_a": is_a, "treats_group": [r for r in treats_group if r["head_label"]]}
+
+
+def build_rollup(entities, relationships) -> dict:
+    builder = RollupBuilder()
+    for ent in entities:
+        builder.add("entity", ent)
+    for rel in relationships:
+        builder.add("relationship", rel)
+    return builder.result()
+
+
+CLEAR_STATEMENT = f"MATCH (g:{quote_name(CONDITION)} {{level: 'parent'}}) DETACH DELETE g"
+
+GROUP_STATEMENT = f"""
+UNWIND $rows AS row
+MERGE (g:{quote_name(CONDITION)} {{id: row.id}})
+SET g += row.props
+"""
+
+IS_A_STATEMENT = f"""
+UNWIND $rows AS row
+MATCH (c:{quote_name(CONDITION)} {{id: row.child}}), (g:{quote_name(CONDITION)} {{id: row.parent}})
+MERGE (c)-[:{IS_A}]->(g)
+"""
+
+
+def treats_group_statement(head_label: str) -> str:
+    return f"""
+    UNWIND $rows AS row
+    MATCH (t:{quote_name(head_label)} {{id: row.head}}), (g:{quote_name(CONDITION)} {{id: row.parent}})
+    MERGE (t)-[r:{TREATS_GROUP}]->(g)
+    SET r.conditions = row.conditions, r.mentions = row.mentions, r.sources = row.sources
+    """
+
+
+def _write_rows(tx, statement, rows):
+    tx.run(statement, rows=rows).consume()
+
+
+def write_rollup(session, rollup, batch_size=DEFAULT_BATCH_SIZE) -> dict:
+    """Replace the parent groups, IS_A and TREATS_GROUP edges; one transaction per batch."""
+    with span("write_rollup") as s:
+        session.execute_write(_write_rows, CLEAR_STATEMENT, [])
+        if rollup["groups"]:
+            session.execute_write(_write_rows, GROUP_STATEMENT, rollup["groups"])
+        for start in range(0, len(rollup["is_a"]), batch_size):
+            session.execute_write(_write_rows, IS_A_STATEMENT, rollup["is_a"][start:start + batch_size])
+        for label, rows in grouped_batches(rollup["treats_group"], lambda r: r["head_label"], lambda r: r,
+                                           batch_size):
+            session.execute_write(_write_rows, treats_group_statement(label), rows)
+        counts = {key: len(rows) for key, rows in rollup.items()}
+        for key, n in counts.items():
+            s.add(key, n)
+    return counts
+
+
+def format_rollup(rollup) -> str:
+    lines = []
+    for group in rollup["groups"]:
+        p = group["props"]
+        lines.append(f"  {p['name']:<32} {p['member_count']:>6} conditions  {p['medication_count']:>6} medications  "
+                     f"{p['treatment_count']:>6} treatments  {p['outcome_count']:>6} outcomes")
+    return "\n".join(lines)
+
+
+def main():
+    from extract.artifact import iter_records
+
+    parser = argparse.ArgumentParser(description="Parent groups of medical conditions and their aggregates.")
+    parser.add_argument("--input", default="combined-final-CHATGPT.json",
+                        help="Combined extraction (.json or .ndjson).")
+    parser.add_argument("group", nargs="?", help="Group id or name: list its members and treatments.")
+    args = parser.parse_args()
+
+    builder = RollupBuilder()
+    texts = {}
+    for kind, record in iter_records(args.input):
+        builder.add(kind, record)
+        if kind == "entity":
+            texts[record["id"]] = record.get("text")
+    rollup = builder.result()
+    if not args.group:
+        print(format_rollup(rollup))
+        return
+    wanted = {g["id"] for g in rollup["groups"]
+              if args.group.lower() in (g["id"], g["props"]["name"].lower(), g["id"].split(":", 1)[1])}
+    if not wanted:
+        parser.error(f"unknown group {args.group!r}")
+    print("members: " + ", ".join(texts.get(r["child"]) or str(r["child"])
+                                  for r in rollup["is_a"] if r["parent"] in wanted))
+    for r in sorted((r for r in rollup["treats_group"] if r["parent"] in wanted), key=lambda r: -r["mentions"]):
+        print(f"  {texts.get(r['head']) or r['head']:<50} {r['head_label']:<15} "
+              f"{r['conditions']} conditions, {r['mentions']} mentions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# graph/schema.py
+# Uniqueness constraints on `id` for every entity label, created before any data
+# is written so MERGE / MATCH on id are index seeks instead of label scans.
+
+import time
+
+from extract.schema import ENTITY_TYPES
+from graph.loader import EVIDENCE_LABEL, quote_name
+
+# Evidence lookups: by content hash (MERGE), by edge, and by paper (withdrawal)
+EVIDENCE_STATEMENTS = [
+    f"CREATE CONSTRAINT evidence_id_unique IF NOT EXISTS FOR (e:{EVIDENCE_LABEL}) REQUIRE e.id IS UNIQUE",
+    f"CREATE INDEX evidence_edge IF NOT EXISTS FOR (e:{EVIDENCE_LABEL}) ON (e.head, e.tail, e.rel_type)",
+    f"CREATE INDEX evidence_source IF NOT EXISTS FOR (e:{EVIDENCE_LABEL}) ON (e.source)",
+]
+
+
+def constraint_name(label: str) -> str:
+    return f"{label}_id_unique"
+
+
+def schema_statements(labels):
+    for label in labels:
+        yield label, (
+            f"CREATE CONSTRAINT {quote_name(constraint_name(label))} IF NOT EXISTS "
+            f"FOR (n:{quote_name(label)}) REQUIRE n.id IS UNIQUE"
+        )
+
+
+def ensure_schema(session, extra_labels=()) -> dict:
+    """
+    Idempotently create a uniqueness constraint (which brings its own index) on
+    `id` for every known entity type plus any extra labels seen in the data,
+    then wait for the indexes to come online. Returns {label: seconds}.
+    """
+    labels = list(dict.fromkeys([*ENTITY_TYPES, *extra_labels]))
+    timings = {}
+    for label, statement in schema_statements(labels):
+        start = time.perf_counter()
+        session.run(statement).consume()
+        timings[label] = time.perf_counter() - start
+    start = time.perf_counter()
+    for statement in EVIDENCE_STATEMENTS:
+        session.run(statement).consume()
+    timings[EVIDENCE_LABEL] = time.perf_counter() - start
+    start = time.perf_counter()
+    session.run("CALL db.awaitIndexes(300)").consume()
+    timings["(await indexes)"] = time.perf_counter() - start
+    return timings
+
+
+def ensure_label(session, label):
+    """Constraint for one label first seen mid-import (no-op if it already exists)."""
+    for _, statement in schema_statements([label]):
+        session.run(statement).consume()
+
+
+def entity_labels(session) -> list:
+    """
+    Every entity label this pipeline has loaded: the known types plus each label that
+    got an id constraint from ensure_schema / ensure_label (Evidence excluded).
+    """
+    labels = dict.fromkeys(ENTITY_TYPES)
+    for record in session.run("SHOW CONSTRAINTS YIELD name, labelsOrTypes"):
+        for label in record["labelsOrTypes"] or []:
+            if label != EVIDENCE_LABEL and record["name"] == constraint_name(label):
+                labels[label] = None
+    return list(labels)
+
+
+def drop_schema(session, extra_labels=()):
+    labels = list(dict.fromkeys([*ENTITY_TYPES, *extra_labels]))
+    for label in labels:
+        session.run(f"DROP CONSTRAINT {quote_name(constraint_name(label))} IF EXISTS").consume()
+    session.run("DROP CONSTRAINT evidence_id_unique IF EXISTS").consume()
+    session.run("DROP INDEX evidence_edge IF EXISTS").consume()
+    session.run("DROP INDEX evidence_source IF EXISTS").consume()
+
+
+def format_timings(timings: dict) -> str:
+    width = max(len(k) for k in timings)
+    lines = [f"  {label:<{width}}  {seconds * 1000:8.1f} ms" for label, seconds in timings.items()]
+    lines.append(f"  {'total':<{width}}  {sum(timings.values()) * 1000:8.1f} ms")
+    return "\n".join(lines)
@@ -1,18 +1,12 @@
-import pdfplumber
-import pathlib
+import sys
+from extract.pdf_ingest import iter_pages, write_pages
 
 def pdf_to_txt(pdf_path, txt_path):
-    all_text = []
-    with pdfplumber.open(pdf_path) as pdf:
-        for page in pdf.pages:
-            text = page.extract_text()
-            if text:
-                all_text.append(text)
-    output_text = chr(12).join(all_text)  # add page breaks
-    pathlib.Path(txt_path).write_text(output_text, encoding="utf-8")
+    # pages are streamed to disk with chr(12) page breaks
+    write_pages(iter_pages(pdf_path, "pdfplumber"), txt_path)
     print(f"Saved extracted text to {txt_path}")
 
 if __name__ == "__main__":
-    pdf_file = "/Users/krrishkohli/Desktop/Text_extraction/WJCC-9-9350.pdf"
-    output_file = "/Users/krrishkohli/Desktop/Text_extraction/output_text.txt"
-    pdf_to_txt(pdf_file, output_file)
+    if len(sys.argv) != 3:
+        sys.exit("usage: python pdfplumber_extraction.py <input.pdf> <output.txt>")
+    pdf_to_txt(sys.argv[1], sys.argv[2])